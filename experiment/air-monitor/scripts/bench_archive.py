@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式归档基准：多个月原始数据的分析读取
+生成跨 --days 天的原始数据，归档已结束的每一天（KITCHEN_ARCHIVE），然后用三种方式计算
+“每个设备每天的平均温度”，核对结果一致并比较耗时：
+  1. /api/history JSON（limit 取全部行，客户端解析后聚合）—— 分析人员目前的做法
+  2. 直接在在线数据库上执行 GROUP BY
+  3. 用 pyarrow 只读取归档文件的 ts、device_id、temperature 三列后聚合
+另外检查 /api/export 列表与下载、archive.py 按设备合并导出的行数，以及补录到已归档日期的数据在下一轮合并进归档文件
+需要 pyarrow；用法：python scripts/bench_archive.py --rows 1000000 --days 90 --format parquet
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列式归档基准')
+    parser.add_argument('--rows', type=int, default=1000000, help='原始数据行数')
+    parser.add_argument('--days', type=int, default=90, help='数据跨越的天数')
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet', help='归档格式')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_archive_')
+    os.environ.update(KITCHEN_DB_PATH=os.path.join(workdir, 'kitchen.db'), KITCHEN_ARCHIVE=args.format,
+                      KITCHEN_LINE_PORT='0')
+    os.environ.pop('KITCHEN_PARTITIONS', None)  # SQL 对照组直接查询主库中的原始表
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.init_database()
+    if server.archive is None:
+        print("需要 pyarrow：pip install pyarrow")
+        raise SystemExit(1)
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from archive import export_files, iter_file_batches
+
+    now_ms = int(time.time() * 1000)
+    step = args.days * 86400000 // args.rows
+    chunk = 20000
+    for start in range(0, args.rows, chunk):
+        server.save_batch_to_database([
+            server.reading_to_row({
+                'temperature': 20.0 + i % 100 / 10, 'humidity': 55.5, 'co': 12.3, 'air_quality': 87.0,
+                'sound': 33.3, 'timestamp': i, 'device_id': f'kitchen_{i % 4:02d}'
+            }, now_ms - (args.rows - i) * step)
+            for i in range(start, min(start + chunk, args.rows))
+        ])
+    with server.db_pool.connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    db_bytes = os.path.getsize(server.DB_PATH)
+
+    began = time.perf_counter()
+    report = server.archive.run_once()
+    archive_seconds = time.perf_counter() - began
+    until = server.archive.archived_until
+    print(f"{args.rows} 行，跨 {args.days} 天，数据库 {db_bytes / 1e6:.1f} MB")
+    print(f"归档 {len(report['files'])} 个 {args.format} 文件，{report['rows']} 行，{report['bytes'] / 1e6:.1f} MB，"
+          f"用时 {archive_seconds:.2f} 秒（{report['rows'] / archive_seconds:.0f} 行/秒）")
+
+    def via_history_api():
+        response = server.app.test_client().get(
+            f'/api/history?limit={args.rows}&range_type=days&range_value={args.days + 1}')
+        sums = defaultdict(lambda: [0.0, 0])
+        for item in json.loads(response.data):
+            ts = item['created_at_local_ms']
+            if ts < until:
+                acc = sums[(item['device_id'], ts // 86400000)]
+                acc[0] += item['temperature']
+                acc[1] += 1
+        return {key: total / count for key, (total, count) in sums.items()}
+
+    def via_sql():
+        with server.db_pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT device_id, ts_ms / 86400000, AVG(temperature) FROM kitchen_sensor_data
+                WHERE ts_ms < ? GROUP BY device_id, ts_ms / 86400000
+            ''', (until,)).fetchall()
+        return {(device, day): avg for device, day, avg in rows}
+
+    def via_archive():
+        paths = [os.path.join(server.archive.directory, f['file']) for f in server.archive.files()]
+        table = pa.Table.from_batches(
+            [batch for path in paths for batch in iter_file_batches(path, ['ts', 'device_id', 'temperature'])])
+        day = pc.divide(pc.cast(table['ts'], pa.int64()), 86400000)
+        result = table.append_column('day', day).group_by(['device_id', 'day']).aggregate([('temperature', 'mean')])
+        return {(device, d): avg for device, d, avg in zip(
+            result['device_id'].to_pylist(), result['day'].to_pylist(), result['temperature_mean'].to_pylist())}
+
+    print(f"{'每设备每天平均温度':<24}{'用时 ms':>10}{'分组数':>8}{'与 SQL 一致':>12}")
+    expected = via_sql()
+    for name, fn in (('/api/history JSON', via_history_api), ('在线数据库 SQL', via_sql), ('列式归档', via_archive)):
+        began = time.perf_counter()
+        result = fn()
+        ms = (time.perf_counter() - began) * 1000
+        same = result.keys() == expected.keys() and all(abs(result[k] - expected[k]) < 1e-9 for k in expected)
+        print(f"{name:<24}{ms:>10.1f}{len(result):>8}{'是' if same else '否':>12}")
+
+    # /api/export 列表与下载
+    client = server.app.test_client()
+    listing = client.get('/api/export').get_json()
+    first = listing['files'][0]
+    download = client.get(first['url'])
+    with open(os.path.join(server.archive.directory, first['file']), 'rb') as f:
+        same_bytes = download.data == f.read()
+    print(f"/api/export: {listing['count']} 个文件，{listing['rows']} 行；下载 {first['file']} "
+          f"{'与归档文件一致' if same_bytes else '与归档文件不一致'}")
+
+    # archive.py 合并导出单个设备
+    out = os.path.join(workdir, f'kitchen_01{os.path.splitext(first["file"])[1]}')
+    paths = [os.path.join(server.archive.directory, f['file']) for f in listing['files']]
+    exported = export_files(paths, out, device_id='kitchen_01')
+    with server.db_pool.connection() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM kitchen_sensor_data WHERE device_id = 'kitchen_01' AND ts_ms < ?",
+                             (until,)).fetchone()[0]
+    print(f"合并导出 kitchen_01: {exported} 行（数据库 {count} 行）")
+
+    # 补录：向最早的已归档日期写入迟到的读数，下一轮归档合并进该日期的文件
+    day_start = first['start_ms']
+    server.save_batch_to_database([
+        server.reading_to_row({
+            'temperature': 25.0, 'humidity': 55.5, 'co': 12.3, 'air_quality': 87.0,
+            'sound': 33.3, 'timestamp': i, 'device_id': 'kitchen_late'
+        }, day_start + i * 1000)
+        for i in range(1000)
+    ])
+    pending = server.archive.pending(until)
+    began = time.perf_counter()
+    report = server.archive.run_once()
+    merge_ms = (time.perf_counter() - began) * 1000
+    with server.db_pool.connection() as conn:
+        count = conn.execute('SELECT COUNT(*) FROM kitchen_sensor_data WHERE ts_ms >= ? AND ts_ms < ?',
+                             (day_start, first['end_ms'])).fetchone()[0]
+    rows = {f['file']: f['rows'] for f in server.archive.files()}[first['file']]
+    print(f"补录 1000 行到 {first['file']}: 待归档 {'是' if pending else '否'}，重写 {report['rewritten']}，"
+          f"用时 {merge_ms:.0f} ms，文件 {rows} 行（数据库 {count} 行）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式 CSV 导出基准：导出全部原始数据时的耗时与峰值内存
+对比：/api/history?format=columnar&limit=全部（整体构造结果后再编码）
+     vs /api/export.csv（游标逐批编码输出，HTTP 与命令行 csv_export.py 两种入口）
+每种方式在单独的子进程中运行，峰值内存取子进程的最大常驻内存（ru_maxrss），并与只导入服务器模块时的基线相减
+用法：python scripts/bench_csv_export.py --rows 2000000
+说明：ru_maxrss 只在 Linux/macOS 上可用
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python')
+sys.path.insert(0, SRC_DIR)
+
+CASES = ['baseline', 'history', 'export_http', 'export_cli']
+
+
+def max_rss_mb():
+    """本进程的最大常驻内存，MB（Linux 为 KB，macOS 为字节）"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+
+def worker(case, rows):
+    """子进程：执行一种导出，输出 “行数 字节数 秒 峰值MB”"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.init_database()
+    client = server.app.test_client()
+
+    began = time.perf_counter()
+    count = size = 0
+    if case == 'history':
+        response = client.get(f'/api/history?format=columnar&limit={rows}')
+        size = len(response.data)
+        count = response.get_json()['length']
+    elif case == 'export_http':
+        response = client.get('/api/export.csv', buffered=False)
+        for chunk in response.response:
+            size += len(chunk)
+            count += chunk.count(b'\n')
+        count -= 1  # 表头
+    elif case == 'export_cli':
+        out = os.path.join(os.path.dirname(server.DB_PATH), 'export.csv')
+        sys.argv = ['csv_export.py', 'kitchen', '--out', out]
+        import csv_export
+        with contextlib.redirect_stderr(io.StringIO()):
+            csv_export.main()
+        size = os.path.getsize(out)
+        with open(out, 'rb') as f:
+            count = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b'')) - 1
+    print(count, size, time.perf_counter() - began, max_rss_mb())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式 CSV 导出基准')
+    parser.add_argument('--rows', type=int, default=2000000, help='原始数据行数')
+    parser.add_argument('--worker', choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.rows)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_csv_export_')
+    env = dict(os.environ, KITCHEN_DB_PATH=os.path.join(workdir, 'kitchen.db'), KITCHEN_LINE_PORT='0')
+    env.pop('KITCHEN_PARTITIONS', None)
+    os.environ.update(env)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.init_database()
+
+    now_ms = int(time.time() * 1000)
+    chunk = 20000
+    for start in range(0, args.rows, chunk):
+        server.save_batch_to_database([
+            server.reading_to_row({
+                'temperature': 20.0 + i % 100 / 10, 'humidity': 55.5, 'co': 12.3, 'air_quality': 87.0,
+                'sound': 33.3, 'timestamp': i, 'device_id': f'kitchen_{i % 4:02d}'
+            }, now_ms - (args.rows - i) * 1000)
+            for i in range(start, min(start + chunk, args.rows))
+        ])
+    with server.db_pool.connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    server.db_pool.close()
+
+    results = {}
+    for case in CASES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', case, '--rows', str(args.rows)],
+            env=env, cwd=workdir, check=True, capture_output=True, text=True
+        ).stdout
+        count, size, seconds, rss = output.split()
+        results[case] = (int(count), int(size), float(seconds), float(rss))
+
+    base_rss = results['baseline'][3]
+    print(f"{args.rows} 行，数据库 {os.path.getsize(server.DB_PATH) / 1e6:.1f} MB，基线内存 {base_rss:.0f} MB")
+    print(f"{'方式':<30}{'行数':>10}{'MB':>8}{'用时 s':>8}{'行/秒':>10}{'MB/s':>8}{'峰值内存增量 MB':>16}")
+    for case, name in (('history', '/api/history columnar'), ('export_http', '/api/export.csv'),
+                       ('export_cli', 'csv_export.py → 文件')):
+        count, size, seconds, rss = results[case]
+        print(f"{name:<30}{count:>10}{size / 1e6:>8.1f}{seconds:>8.2f}{count / seconds:>10.0f}"
+              f"{size / 1e6 / seconds:>8.1f}{rss - base_rss:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+空气质量 CSV 批量导入基准
+生成 data/sample_data.csv 格式的文件（每分钟一条，--rows 行，约 --rows/525600 年），其中夹杂少量无效行，然后对比：
+  1. 逐行导入：csv.DictReader + strptime + 每行一次 execute（整个文件一个事务）
+  2. AirQualityImporter：分块按列转换 + executemany，每块一个事务
+并检查：两种方式导入的行一致、无效行被拒绝并报告行号、重复导入同一文件不新增数据
+用法：python scripts/bench_csv_import.py --rows 2000000
+"""
+
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from csv_import import AirQualityImporter, TABLE_SQL, INDEX_SQLS, INSERT_SQL, LOCAL_TZ
+from db_pool import ConnectionPool
+
+ACTIVITIES = ['idle', 'boiling', 'frying', 'baking', 'cleaning']
+
+
+def generate(path, rows, bad_every):
+    """生成测试文件，每 bad_every 行插入一行无效数据，返回无效行数"""
+    start = int(datetime(2020, 1, 1, tzinfo=LOCAL_TZ).timestamp())
+    rng = random.Random(1)
+    bad = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'pm25', 'pm10', 'co', 'co2', 'temperature', 'humidity', 'activity', 'level'])
+        for i in range(rows):
+            ts = datetime.fromtimestamp(start + i * 60, LOCAL_TZ).strftime('%Y-%m-%d %H:%M:%S')
+            pm25 = round(rng.uniform(10, 150), 1)
+            writer.writerow([ts, pm25, round(pm25 * 1.2, 1), round(rng.uniform(2, 50), 1), rng.randint(400, 2500),
+                             round(rng.uniform(18, 32), 1), round(rng.uniform(40, 70), 1),
+                             ACTIVITIES[i % len(ACTIVITIES)], 'normal' if pm25 < 75 else 'warning'])
+            if bad_every and i % bad_every == bad_every - 1:
+                writer.writerow([ts, 'n/a', 1, 1, 1, 1, 1, 'idle', 'normal'] if bad % 2 else ['not-a-time', 1, 1])
+                bad += 1
+    return bad
+
+
+def naive_import(db_path, path):
+    """逐行导入：每行构造字典、解析时间、单独 execute"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(TABLE_SQL)
+    for sql in INDEX_SQLS:
+        conn.execute(sql)
+    read = 0
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            read += 1
+            try:
+                ts = datetime.strptime(row['timestamp'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=LOCAL_TZ)
+                values = ('', int(ts.timestamp() * 1000), float(row['pm25']), float(row['pm10']), float(row['co']),
+                          float(row['co2']), float(row['temperature']), float(row['humidity']),
+                          row['activity'], row['level'])
+            except (ValueError, TypeError):
+                continue
+            conn.execute(INSERT_SQL, values)
+    conn.commit()
+    conn.close()
+    return read
+
+
+def table_digest(db_path):
+    conn = sqlite3.connect(db_path)
+    digest = conn.execute('''
+        SELECT COUNT(*), SUM(ts_ms), SUM(pm25), SUM(co2), SUM(humidity), COUNT(DISTINCT activity)
+        FROM air_quality_data
+    ''').fetchone()
+    conn.close()
+    return digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='空气质量 CSV 批量导入基准')
+    parser.add_argument('--rows', type=int, default=2000000, help='有效数据行数')
+    parser.add_argument('--bad-every', type=int, default=500000, help='每隔多少行插入一行无效数据（0 不插入）')
+    parser.add_argument('--chunk-rows', type=int, default=100000, help='导入器每块的行数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_csv_import_')
+    path = os.path.join(workdir, 'readings.csv')
+    bad = generate(path, args.rows, args.bad_every)
+    print(f"{args.rows} 行有效数据 + {bad} 行无效数据，文件 {os.path.getsize(path) / 1e6:.1f} MB")
+
+    naive_db = os.path.join(workdir, 'naive.db')
+    began = time.perf_counter()
+    read = naive_import(naive_db, path)
+    naive_seconds = time.perf_counter() - began
+
+    pool = ConnectionPool(os.path.join(workdir, 'bulk.db'), size=1)
+    importer = AirQualityImporter(pool, chunk_rows=args.chunk_rows)
+    importer.create_table()
+    report = importer.import_file(path)
+    again = importer.import_file(path)
+    pool.close()
+
+    print(f"{'方式':<28}{'用时 s':>8}{'行/秒':>10}")
+    print(f"{'逐行 execute':<28}{naive_seconds:>8.2f}{read / naive_seconds:>10.0f}")
+    print(f"{'AirQualityImporter':<28}{report['seconds']:>8.2f}{report['rows_per_second']:>10}")
+    print(f"导入 {report['imported']} 行，拒绝 {report['rejected']} 行（应为 {bad}），"
+          f"报告的前几行: {[line for line, _ in report['errors'][:3]]}")
+    print(f"重复导入: 新增 {again['imported']} 行，重复 {again['duplicates']} 行")
+    same = table_digest(naive_db) == table_digest(os.path.join(workdir, 'bulk.db'))
+    print(f"与逐行导入的结果{'一致' if same else '不一致'}")
+
+
+if __name__ == '__main__':
+    main()
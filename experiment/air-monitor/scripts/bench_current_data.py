@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/current-data 轮询开销基准
+对比：每次 jsonify 最新数据（旧实现） vs 返回入库时预编码的快照 vs 带 If-None-Match 的 304
+分别给出：视图函数本身的耗时（请求上下文内直接调用）和完整 WSGI 请求的吞吐（含 Flask/CORS 开销，不含网络）
+用法：python scripts/bench_current_data.py --requests 20000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from flask import jsonify
+from werkzeug.test import EnvironBuilder
+
+from db_pool import ConnectionPool
+
+
+def time_view(app, view, path, headers, requests):
+    """在请求上下文内直接调用视图函数，返回 (平均微秒, 状态码)"""
+    with app.test_request_context(path, headers=headers):
+        status = app.make_response(view()).status_code
+        start = time.perf_counter()
+        for _ in range(requests):
+            view()
+        elapsed = time.perf_counter() - start
+    return elapsed * 1e6 / requests, status
+
+
+def time_wsgi(app, path, headers, requests):
+    """直接调用 WSGI 入口，返回每秒请求数"""
+    environ = EnvironBuilder(path=path, headers=headers).get_environ()
+
+    def start_response(status, response_headers, exc_info=None):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        env = dict(environ)
+        env['wsgi.input'] = io.BytesIO()
+        for _chunk in app(env, start_response):
+            pass
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/current-data 基准')
+    parser.add_argument('--requests', type=int, default=20000, help='每种方式的请求次数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_current_')
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.DB_PATH = os.path.join(workdir, 'bench.db')
+        server.db_pool = ConnectionPool(server.DB_PATH)
+        server.init_database()
+
+    server.update_state([{
+        'temperature': 23.5, 'humidity': 51.0, 'co': 12.0, 'air_quality': 80.0, 'sound': 20.0,
+        'timestamp': 1234567890, 'device_id': 'kitchen_01'
+    }])
+
+    # 旧实现：每次请求序列化一次
+    def legacy_current():
+        return jsonify(server.state.latest())
+
+    server.app.add_url_rule('/bench/legacy-current', 'bench_legacy_current', legacy_current)
+
+    etag = server.state.snapshot().etag
+    cases = [
+        ('jsonify（旧实现）', legacy_current, '/bench/legacy-current', {}),
+        ('预编码快照', server.get_current_data, '/api/current-data', {}),
+        ('If-None-Match 命中', server.get_current_data, '/api/current-data', {'If-None-Match': etag}),
+    ]
+    print(f"{'方式':<20}{'视图 us':>10}{'请求/秒':>12}{'状态码':>8}")
+    for name, view, path, headers in cases:
+        time_wsgi(server.app, path, headers, 200)  # 预热
+        view_us, status = time_view(server.app, view, path, headers, args.requests)
+        rps = time_wsgi(server.app, path, headers, args.requests)
+        print(f"{name:<20}{view_us:>10.1f}{rps:>12.0f}{status:>8}")
+
+
+if __name__ == '__main__':
+    main()
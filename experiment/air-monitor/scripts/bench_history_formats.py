@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/history 输出格式基准
+对比 format=rows（字典列表）、columnar（按列JSON）、binary（float32二进制）的
+响应大小、服务器端耗时（查询+序列化）以及解析耗时（Python json.loads / array 作为前端解析的近似）
+用法：python scripts/bench_history_formats.py --rows 1000 10000 100000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from db_pool import ConnectionPool
+
+
+def parse_binary(body):
+    """按 columnar.py 中的布局解析二进制响应"""
+    header_len = struct.unpack_from('<I', body)[0]
+    header = json.loads(body[4:4 + header_len])
+    offset = 4 + header_len
+    n = header['length']
+    columns = {}
+    for name, kind in header['columns']:
+        column = array('d' if kind == 'float64' else 'f')
+        size = column.itemsize * n
+        column.frombytes(body[offset:offset + size])
+        columns[name] = column
+        offset += size
+    return columns
+
+
+def best_of(fn, repeat=3):
+    """多次运行取最快一次，返回 (毫秒, 最后一次的返回值)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史数据输出格式基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000], help='每次查询的行数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_formats_')
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.DB_PATH = os.path.join(workdir, 'bench.db')
+        server.db_pool = ConnectionPool(server.DB_PATH)
+        server.init_database()
+
+    total = max(args.rows)
+    now_ms = int(time.time() * 1000)
+    rows = []
+    for i in range(total):
+        reading = {
+            'temperature': round(random.uniform(15, 35), 1), 'humidity': round(random.uniform(30, 80), 1),
+            'co': round(random.uniform(0, 50), 1), 'air_quality': round(random.uniform(0, 300), 1),
+            'sound': round(random.uniform(0, 100), 1), 'timestamp': i, 'device_id': 'kitchen_01'
+        }
+        rows.append(server.reading_to_row(reading, now_ms - (total - i) * 1000))
+    server.save_batch_to_database(rows)
+
+    client = server.app.test_client()
+    parsers = {'rows': json.loads, 'columnar': json.loads, 'binary': parse_binary}
+
+    print(f"{'行数':>8}  {'格式':<10}{'大小 KB':>10}{'服务器 ms':>12}{'解析 ms':>10}")
+    for n in args.rows:
+        for fmt in ('rows', 'columnar', 'binary'):
+            path = f'/api/history?limit={n}&format={fmt}'
+            server_ms, body = best_of(lambda: client.get(path).data)
+            parse_ms, _ = best_of(lambda: parsers[fmt](body))
+            print(f"{n:>8}  {fmt:<10}{len(body) / 1024:>10.1f}{server_ms:>12.1f}{parse_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
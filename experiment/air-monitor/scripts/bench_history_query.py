@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史查询性能基准测试
+对比：按文本列 created_at 过滤排序（无索引） vs 按整数列 ts_ms 走索引
+用法：python scripts/bench_history_query.py --rows 10000000 --devices 12
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+CREATE_SQL = '''
+    CREATE TABLE kitchen_sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        temperature REAL,
+        humidity REAL,
+        co REAL,
+        air_quality REAL,
+        sound REAL,
+        timestamp INTEGER,
+        device_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ts_ms INTEGER
+    )
+'''
+
+LEGACY_QUERY = '''
+    SELECT temperature, humidity, co, air_quality, sound, timestamp, device_id, created_at
+    FROM kitchen_sensor_data
+    WHERE created_at >= ?
+    ORDER BY created_at DESC LIMIT ?
+'''
+
+INDEXED_QUERY = '''
+    SELECT temperature, humidity, co, air_quality, sound, timestamp, device_id, created_at
+    FROM kitchen_sensor_data
+    WHERE ts_ms >= ?
+    ORDER BY ts_ms DESC LIMIT ?
+'''
+
+DEVICE_QUERY = '''
+    SELECT temperature, humidity, co, air_quality, sound, timestamp, device_id, created_at
+    FROM kitchen_sensor_data
+    WHERE device_id = ? AND ts_ms >= ?
+    ORDER BY ts_ms DESC LIMIT ?
+'''
+
+
+def populate(conn, rows, devices, end_s):
+    """用递归CTE快速生成rows条数据，每秒一条，轮流分配给devices个设备"""
+    conn.execute(CREATE_SQL)
+    conn.execute('''
+        WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < ?)
+        INSERT INTO kitchen_sensor_data
+            (temperature, humidity, co, air_quality, sound, timestamp, device_id, created_at, ts_ms)
+        SELECT 20 + (n % 10), 50 + (n % 20), n % 30, 80 + (n % 50), n % 100, n,
+               'kitchen_' || (n % ?),
+               datetime(? - ? + n, 'unixepoch'),
+               (? - ? + n) * 1000
+        FROM seq
+    ''', (rows, devices, end_s, rows, end_s, rows))
+    conn.commit()
+
+
+def timed(conn, sql, params, repeat):
+    """执行repeat次查询，返回平均毫秒数"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史查询性能基准测试')
+    parser.add_argument('--rows', type=int, default=10000000, help='表中数据行数')
+    parser.add_argument('--devices', type=int, default=12, help='设备数量')
+    parser.add_argument('--days', type=int, default=30, help='查询最近多少天')
+    parser.add_argument('--limit', type=int, default=500, help='LIMIT')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复次数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        end_s = int(time.time())
+
+        start = time.perf_counter()
+        populate(conn, args.rows, args.devices, end_s)
+        print(f"生成 {args.rows} 行数据用时 {time.perf_counter() - start:.1f} 秒")
+
+        start_s = end_s - args.days * 86400
+        legacy_params = (time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start_s)), args.limit)
+        legacy_ms = timed(conn, LEGACY_QUERY, legacy_params, args.repeat)
+
+        start = time.perf_counter()
+        conn.execute('CREATE INDEX idx_kitchen_ts ON kitchen_sensor_data (ts_ms)')
+        conn.execute('CREATE INDEX idx_kitchen_device_ts ON kitchen_sensor_data (device_id, ts_ms)')
+        conn.commit()
+        print(f"建立索引用时 {time.perf_counter() - start:.1f} 秒")
+
+        indexed_ms = timed(conn, INDEXED_QUERY, (start_s * 1000, args.limit), args.repeat)
+        device_ms = timed(conn, DEVICE_QUERY, ('kitchen_0', start_s * 1000, args.limit), args.repeat)
+
+        print(f"created_at 文本列（全表扫描+排序）: {legacy_ms:>10.2f} ms")
+        print(f"ts_ms 索引:                         {indexed_ms:>10.2f} ms")
+        print(f"(device_id, ts_ms) 索引:            {device_ms:>10.2f} ms")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
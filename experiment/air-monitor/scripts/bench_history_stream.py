@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/history 流式输出基准
+对比：一次性构造列表再 jsonify（旧实现） vs 从游标逐批编码的流式响应（不压缩 / gzip），
+给出首字节时间、总耗时、Python 峰值内存（tracemalloc）和响应大小，并校验流式输出与旧实现一致
+用法：python scripts/bench_history_stream.py --rows 1000 10000 100000
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from flask import jsonify
+
+from db_pool import ConnectionPool
+
+
+def consume(app, view, path, headers, keep=False):
+    """调用视图并逐块消费响应体，返回 (首字节 ms, 总耗时 ms, 字节数, 响应体或 None)"""
+    start = time.perf_counter()
+    first_ms = None
+    size = 0
+    chunks = [] if keep else None
+    with app.test_request_context(path, headers=headers):
+        response = app.make_response(view())
+        for chunk in response.response:
+            if first_ms is None:
+                first_ms = (time.perf_counter() - start) * 1000
+            chunk = chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+            size += len(chunk)
+            if keep:
+                chunks.append(chunk)
+        response.close()
+    total_ms = (time.perf_counter() - start) * 1000
+    return first_ms, total_ms, size, b''.join(chunks) if keep else None
+
+
+def peak_memory_kb(app, view, path, headers):
+    """消费响应（不保留响应体）期间的 Python 峰值内存（KB）"""
+    tracemalloc.start()
+    consume(app, view, path, headers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史数据流式输出基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000], help='每次查询的行数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_stream_')
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.DB_PATH = os.path.join(workdir, 'bench.db')
+        server.db_pool = ConnectionPool(server.DB_PATH)
+        server.init_database()
+
+    total = max(args.rows)
+    now_ms = int(time.time() * 1000)
+    rows = []
+    for i in range(total):
+        reading = {
+            'temperature': round(random.uniform(15, 35), 1), 'humidity': round(random.uniform(30, 80), 1),
+            'co': round(random.uniform(0, 50), 1), 'air_quality': round(random.uniform(0, 300), 1),
+            'sound': round(random.uniform(0, 100), 1), 'timestamp': i,
+            'device_id': random.choice(['kitchen_01', 'kitchen_02'])
+        }
+        # 每两条共用一个时间戳，覆盖同一时刻多行的截取
+        rows.append(server.reading_to_row(reading, now_ms - (total - i) // 2 * 1000))
+    server.save_batch_to_database(rows)
+
+    # 旧实现：整个结果集构造为列表后 jsonify
+    def legacy_history():
+        limit = server.request.args.get('limit', 100, type=int)
+        return jsonify(server.get_history_from_db(limit))
+
+    server.app.add_url_rule('/bench/legacy-history', 'bench_legacy_history', legacy_history)
+
+    cases = [
+        ('jsonify（旧实现）', legacy_history, '/bench/legacy-history', {}),
+        ('流式', server.get_history, '/api/history', {}),
+        ('流式 + gzip', server.get_history, '/api/history', {'Accept-Encoding': 'gzip'}),
+    ]
+    print(f"{'行数':>8}  {'方式':<16}{'首字节 ms':>10}{'总耗时 ms':>10}{'峰值内存 KB':>12}{'大小 KB':>10}  输出一致")
+    for n in args.rows:
+        expected = server.get_history_from_db(n)
+        for name, view, path, headers in cases:
+            url = f'{path}?limit={n}'
+            *_, body = consume(server.app, view, url, headers, keep=True)
+            first_ms, total_ms, size, _ = consume(server.app, view, url, headers)
+            peak_kb = peak_memory_kb(server.app, view, url, headers)
+            if headers.get('Accept-Encoding') == 'gzip':
+                same = json.loads(gzip.decompress(body)) == expected
+            else:
+                same = json.loads(body) == expected
+            print(f"{n:>8}  {name:<16}{first_ms:>10.1f}{total_ms:>10.1f}{peak_kb:>12.0f}{size / 1024:>10.1f}  {same}")
+
+        device_rows = server.iter_history_from_db(n, device_id='kitchen_02')
+        streamed = [server.history_row_to_item(row) for batch in device_rows for row in batch]
+        print(f"{'':>8}  按设备过滤输出一致: {streamed == server.get_history_from_db(n, device_id='kitchen_02')}")
+
+
+if __name__ == '__main__':
+    main()
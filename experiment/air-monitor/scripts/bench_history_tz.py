@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+get_history_from_db 时区转换基准
+对比：逐行 fromisoformat → astimezone → isoformat → 再解析求毫秒（旧实现）
+     vs SQL 中由 ts_ms 整数运算生成北京时间（新实现），并校验两者输出一致
+用法：python scripts/bench_history_tz.py --rows 10000 100000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from db_pool import ConnectionPool
+
+
+def legacy_convert(dt_str, local_tz):
+    """旧实现的 convert_to_local_iso（无缓存）"""
+    if not dt_str:
+        return None
+    value = dt_str.strip()
+    if not value:
+        return None
+    try:
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+    except ValueError:
+        try:
+            dt = datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        except ValueError:
+            return dt_str
+    return dt.astimezone(local_tz).isoformat(timespec='seconds')
+
+
+def legacy_history(server, limit):
+    """旧实现：取出 created_at 后逐行转换"""
+    with server.db_pool.connection() as conn:
+        rows = conn.execute('''
+            SELECT temperature, humidity, co, air_quality, sound,
+                   timestamp, device_id, created_at
+            FROM kitchen_sensor_data
+            ORDER BY ts_ms DESC LIMIT ?
+        ''', (limit,)).fetchall()
+
+    history = []
+    for row in reversed(rows):
+        created_at_local = legacy_convert(row[7], server.LOCAL_TZ)
+        local_timestamp_ms = None
+        if created_at_local:
+            try:
+                local_timestamp_ms = int(datetime.fromisoformat(created_at_local).timestamp() * 1000)
+            except ValueError:
+                pass
+        history.append({
+            'temperature': row[0], 'humidity': row[1], 'co': row[2],
+            'air_quality': row[3], 'sound': row[4], 'timestamp': row[5],
+            'device_id': row[6], 'created_at': row[7],
+            'created_at_local': created_at_local,
+            'created_at_local_ms': local_timestamp_ms
+        })
+    return history
+
+
+def best_of(fn, repeat=3):
+    """取多次运行中最快的一次（毫秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史数据时区转换基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000], help='每次查询的行数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_tz_')
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.DB_PATH = os.path.join(workdir, 'bench.db')
+        server.db_pool = ConnectionPool(server.DB_PATH)
+        server.init_database()
+
+    total = max(args.rows)
+    now_ms = int(time.time() * 1000)
+    rows = []
+    for i in range(total):
+        reading = {
+            'temperature': random.uniform(15, 35), 'humidity': random.uniform(30, 80),
+            'co': random.uniform(0, 50), 'air_quality': random.uniform(0, 300),
+            'sound': random.uniform(0, 100), 'timestamp': i, 'device_id': 'kitchen_01'
+        }
+        rows.append(server.reading_to_row(reading, now_ms - (total - i) * 1000))
+    server.save_batch_to_database(rows)
+
+    print(f"{'行数':>8}{'逐行转换 ms':>14}{'SQL转换 ms':>14}{'加速':>8}  输出一致")
+    for n in args.rows:
+        server.convert_to_local_iso.cache_clear()
+        old_ms = best_of(lambda: legacy_history(server, n))
+        new_ms = best_of(lambda: server.get_history_from_db(n))
+        same = legacy_history(server, n) == server.get_history_from_db(n)
+        print(f"{n:>8}{old_ms:>14.1f}{new_ms:>14.1f}{old_ms / new_ms:>7.1f}x  {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON编解码实现基准
+对比：Flask默认 JSON provider（旧实现） vs FastJSONProvider + 标准库 json vs FastJSONProvider + orjson（已安装时），
+分别测 POST /api/sensor-data（get_json 解析 + jsonify 应答）和 GET /api/history（逐行编码）的每秒请求数
+用法：python scripts/bench_json_codec.py --requests 5000 --history-limit 1000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.test import EnvironBuilder
+
+import json_codec
+from db_pool import ConnectionPool
+
+
+def time_wsgi(app, environ, body, requests):
+    """直接调用 WSGI 入口，返回 (每秒请求数, 最后一次的状态行)"""
+    status_line = []
+
+    def start_response(status, response_headers, exc_info=None):
+        status_line[:] = [status]
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        env = dict(environ)
+        env['wsgi.input'] = io.BytesIO(body)
+        result = app(env, start_response)
+        for _chunk in result:
+            pass
+        if hasattr(result, 'close'):
+            result.close()
+    return requests / (time.perf_counter() - start), status_line[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON编解码实现基准')
+    parser.add_argument('--requests', type=int, default=5000, help='每种情况的请求次数')
+    parser.add_argument('--history-limit', type=int, default=1000, help='/api/history 每次返回的行数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_json_')
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.DB_PATH = os.path.join(workdir, 'bench.db')
+        server.db_pool = ConnectionPool(server.DB_PATH)
+        server.init_database()
+
+    now_ms = int(time.time() * 1000)
+    server.save_batch_to_database([
+        server.reading_to_row({
+            'temperature': 20.0 + i % 100 / 10, 'humidity': 55.5, 'co': 12.3, 'air_quality': 87.0,
+            'sound': 33.3, 'timestamp': i, 'device_id': 'kitchen_01'
+        }, now_ms - (args.history_limit - i) * 1000)
+        for i in range(args.history_limit)
+    ])
+
+    reading = json.dumps({
+        'temperature': 23.4, 'humidity': 56.7, 'co': 12.0, 'air_quality': 88.0, 'sound': 31.5,
+        'timestamp': 1234567890, 'device_id': 'kitchen_01'
+    }).encode('utf-8')
+    post_environ = EnvironBuilder(
+        path='/api/sensor-data', method='POST', data=reading, content_type='application/json'
+    ).get_environ()
+    history_environ = EnvironBuilder(path=f'/api/history?limit={args.history_limit}').get_environ()
+
+    cases = [('Flask默认（旧实现）', DefaultJSONProvider, 'json'), ('FastJSONProvider', json_codec.FastJSONProvider, 'json')]
+    if 'orjson' in json_codec.BACKENDS:
+        cases.append(('FastJSONProvider', json_codec.FastJSONProvider, 'orjson'))
+    else:
+        print('未安装 orjson，只比较标准库实现（pip install orjson）')
+
+    print(f"{'provider':<22}{'实现':<8}{'sensor-data 请求/秒':>20}{'history 请求/秒':>18}")
+    for name, provider, backend in cases:
+        server.app.json = provider(server.app)
+        json_codec.set_backend(backend)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            time_wsgi(server.app, post_environ, reading, 200)  # 预热
+            post_rps, post_status = time_wsgi(server.app, post_environ, reading, args.requests)
+            history_rps, history_status = time_wsgi(server.app, history_environ, b'', max(args.requests // 20, 50))
+        server.write_buffer.flush()
+        print(f"{name:<22}{backend:<8}{post_rps:>20.0f}{history_rps:>18.0f}    ({post_status}, {history_status})")
+
+
+if __name__ == '__main__':
+    main()
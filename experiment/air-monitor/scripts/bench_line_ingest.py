@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上报路径的服务器端CPU开销基准
+对比：HTTP JSON POST /api/sensor-data（直接调用 WSGI 入口，不含 socket 和 HTTP 解析，偏向 HTTP 一侧）
+     vs UDP / TCP 行协议（真实 socket，发送方在子进程中，不计入本进程CPU）
+每种方式都计入写后缓冲落库和内存状态更新，结果为每条读数消耗的本进程CPU时间
+用法：python scripts/bench_line_ingest.py --readings 20000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from werkzeug.test import EnvironBuilder
+
+from db_pool import ConnectionPool
+
+CSV_LINE = 'kitchen_01,{i},23.4,56.7,12,88,31'
+INFLUX_LINE = 'kitchen,device_id=kitchen_01 temperature=23.4,humidity=56.7,co=12i,air_quality=88,sound=31 {i}'
+
+SENDER = '''
+import socket, sys, time
+proto, port, count, template = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), sys.argv[4]
+if proto == 'udp':
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for i in range(count):
+        sock.sendto((template.format(i=i) + '\\n').encode(), ('127.0.0.1', port))
+        if i % 100 == 99:
+            time.sleep(0.02)  # 约每秒5000条，模拟多台设备分散上报，避免瞬间塞满接收缓冲区
+else:
+    sock = socket.create_connection(('127.0.0.1', port))
+    for i in range(count):
+        sock.sendall((template.format(i=i) + '\\n').encode())
+    sock.close()
+'''
+
+
+def free_port():
+    """找一个 UDP 和 TCP 都空闲的端口"""
+    while True:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as tcp:
+            tcp.bind(('127.0.0.1', 0))
+            port = tcp.getsockname()[1]
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+                udp.bind(('127.0.0.1', port))
+            return port
+        except OSError:
+            continue
+
+
+def bench_http(server, count):
+    """WSGI 直接调用 POST /api/sensor-data，返回 (每条CPU微秒, 入库条数)"""
+    environ = EnvironBuilder(path='/api/sensor-data', method='POST', content_type='application/json').get_environ()
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    bodies = [json.dumps({
+        'temperature': 23.4, 'humidity': 56.7, 'co': 12, 'air_quality': 88, 'sound': 31,
+        'timestamp': i, 'device_id': 'kitchen_01'
+    }).encode() for i in range(count)]
+
+    before = server.write_buffer.flushed_rows
+    start = time.process_time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for body in bodies:
+            env = dict(environ, CONTENT_LENGTH=str(len(body)))
+            env['wsgi.input'] = io.BytesIO(body)
+            for _chunk in server.app(env, start_response):
+                pass
+    server.write_buffer.flush()
+    elapsed = time.process_time() - start
+    stored = server.write_buffer.flushed_rows - before
+    return elapsed * 1e6 / max(stored, 1), stored
+
+
+def bench_line(server, proto, template, count):
+    """子进程通过 UDP/TCP 发送行协议，返回 (每条CPU微秒, 入库条数)"""
+    port = free_port()
+    listener = server.LineIngestServer(server.line_server.parser, server.ingest_readings, host='127.0.0.1', port=port)
+    with contextlib.redirect_stdout(io.StringIO()):
+        listener.start()
+
+    before = server.write_buffer.flushed_rows
+    start = time.process_time()
+    sender = subprocess.Popen([sys.executable, '-c', SENDER, proto, str(port), str(count), template])
+
+    # 等待发送结束且不再有新数据到达
+    last, idle_since = -1, time.time()
+    while True:
+        time.sleep(0.05)
+        lines = listener.stats()['lines']
+        if lines != last:
+            last, idle_since = lines, time.time()
+        elif sender.poll() is not None and (lines >= count or time.time() - idle_since > 1):
+            break
+    server.write_buffer.flush()
+    elapsed = time.process_time() - start
+    listener.stop()
+
+    stored = server.write_buffer.flushed_rows - before
+    return elapsed * 1e6 / max(stored, 1), stored
+
+
+def bench_parse(parser, template, count):
+    """只解析，不入库，返回每行微秒"""
+    data = '\n'.join(template.format(i=i) for i in range(count)).encode()
+    start = time.process_time()
+    parser.parse_many(data)
+    return (time.process_time() - start) * 1e6 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='上报路径CPU开销基准')
+    parser.add_argument('--readings', type=int, default=20000, help='每种方式上报的条数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_line_')
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.DB_PATH = os.path.join(workdir, 'bench.db')
+        server.db_pool = ConnectionPool(server.DB_PATH)
+        server.init_database()
+        server.write_buffer.start()
+
+    print(f"{'方式':<28}{'每条CPU us':>12}{'入库条数':>10}")
+    http_us, stored = bench_http(server, args.readings)
+    print(f"{'HTTP JSON POST (WSGI)':<28}{http_us:>12.1f}{stored:>10}")
+    for proto in ('udp', 'tcp'):
+        for name, template in (('CSV', CSV_LINE), ('Influx', INFLUX_LINE)):
+            line_us, stored = bench_line(server, proto, template, args.readings)
+            label = f'{proto.upper()} {name}'
+            print(f"{label:<28}{line_us:>12.1f}{stored:>10}    ({line_us / http_us:.0%} of HTTP)")
+
+    print()
+    for name, template in (('CSV', CSV_LINE), ('Influx', INFLUX_LINE)):
+        label = f'仅解析 {name}'
+        print(f"{label:<28}{bench_parse(server.line_server.parser, template, args.readings):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
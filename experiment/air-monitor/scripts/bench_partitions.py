@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按时间分区存储基准
+对比：单表（所有原始数据在主库一张表中） vs 按天分区（KITCHEN_PARTITIONS=day，每天一个文件，并行查询）
+测量：最近 N 条历史、最近1天的范围查询、全范围按非汇总粒度（7分钟）的原始数据聚合、时间跨度，
+以及删除一半过期数据的耗时（单表为 RetentionEngine 分批删除 + 增量 VACUUM，分区为删除文件）
+两种存储各在一个子进程中运行（存储方式由环境变量在导入时决定），先核对两边查询结果一致
+用法：python scripts/bench_partitions.py --rows 1000000 --days 60
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+
+def timed(fn, repeat):
+    """重复执行 repeat 次，返回 (最后一次的结果, 平均毫秒)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def worker(args):
+    """子进程：建库、查询计时、删除计时，结果以 JSON 输出到 stdout"""
+    workdir = os.path.dirname(os.environ['KITCHEN_DB_PATH'])
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+        server.init_database()
+
+    # 两个子进程使用同一个“当前时间”，生成完全相同的数据
+    now_ms = args.now
+    step = args.days * 86400000 // args.rows
+    chunk = 20000
+    for start in range(0, args.rows, chunk):
+        server.save_batch_to_database([
+            server.reading_to_row({
+                'temperature': 20.0 + i % 100 / 10, 'humidity': 55.5, 'co': 12.3, 'air_quality': 87.0,
+                'sound': 33.3, 'timestamp': i, 'device_id': f'kitchen_{i % 4:02d}'
+            }, now_ms - (args.rows - i) * step)
+            for i in range(start, min(start + chunk, args.rows))
+        ])
+
+    day_ago = datetime.fromtimestamp((now_ms - 86400000) / 1000, timezone.utc)
+    cases = [
+        ('最近1000条', lambda: server.get_history_from_db(1000, columnar=True)['temperature']),
+        ('最近1天（单设备）', lambda: server.get_history_from_db(
+            100000, start_time_utc=day_ago, device_id='kitchen_01', columnar=True)['temperature']),
+        ('流式最近10000条', lambda: sum(len(batch) for batch in server.iter_history_from_db(10000))),
+        ('全范围7分钟桶聚合', lambda: [round(row['temperature'], 6) for row in server.get_bucketed_history_from_db(7 * 60000)]),
+        ('时间跨度', lambda: server.get_time_span_ms(device_id='kitchen_02')),
+    ]
+    results = {}
+    for name, fn in cases:
+        value, ms = timed(fn, args.repeat)
+        results[name] = {'ms': ms, 'value': value}
+
+    server.retention.retention_days = args.days / 2
+    start = time.perf_counter()
+    report = server.retention.run_once()
+    results['retention'] = {'ms': (time.perf_counter() - start) * 1000, 'deleted': report['deleted_rows'],
+                            'reclaimed': report['reclaimed_bytes']}
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按时间分区存储基准')
+    parser.add_argument('--rows', type=int, default=1000000, help='原始数据行数')
+    parser.add_argument('--days', type=int, default=60, help='数据跨越的天数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复次数')
+    parser.add_argument('--worker', choices=['single', 'day'], help=argparse.SUPPRESS)
+    parser.add_argument('--now', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench_partitions_')
+    now_ms = int(time.time() * 1000)
+    results = {}
+    for mode in ('single', 'day'):
+        os.makedirs(os.path.join(workdir, mode))
+        env = dict(os.environ, KITCHEN_DB_PATH=os.path.join(workdir, mode, 'kitchen.db'), KITCHEN_LINE_PORT='0')
+        env.pop('KITCHEN_PARTITIONS', None)
+        if mode == 'day':
+            env['KITCHEN_PARTITIONS'] = 'day'
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', mode, '--rows', str(args.rows),
+             '--days', str(args.days), '--repeat', str(args.repeat), '--now', str(now_ms)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    single, day = results['single'], results['day']
+    print(f"{args.rows} 行，跨 {args.days} 天，4 个设备")
+    print(f"{'查询':<20}{'单表 ms':>10}{'按天分区 ms':>14}{'结果一致':>10}")
+    for name in single:
+        if name == 'retention':
+            continue
+        same = single[name]['value'] == day[name]['value']
+        print(f"{name:<20}{single[name]['ms']:>10.1f}{day[name]['ms']:>14.1f}{'是' if same else '否':>10}")
+    print(f"{'删除一半过期数据':<20}{single['retention']['ms']:>10.0f}{day['retention']['ms']:>14.0f}"
+          f"    删除 {single['retention']['deleted']} / {day['retention']['deleted']} 行，"
+          f"回收 {single['retention']['reclaimed'] / 1e6:.1f} / {day['retention']['reclaimed'] / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据保留策略基准：删除过期数据时对上报写入的影响
+对比：一次性 DELETE ... WHERE ts_ms < ? + 完整 VACUUM（旧做法）
+     vs RetentionEngine（按 id 区间分小批删除 + 增量 VACUUM）
+两种方式在同一份数据库副本上执行，期间另一个线程以固定频率写入单条读数（与写后缓冲落库相同的事务），
+记录写入延迟的 p50 / p99 / 最大值，以及删除行数、回收字节数、数据库文件大小
+用法：python scripts/bench_retention.py --rows 500000 --days 60 --keep-days 30
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from db_pool import ConnectionPool
+from retention import RetentionEngine
+
+
+def build_database(server, path, rows, days):
+    """生成跨 days 天、共 rows 条的新数据库（增量 VACUUM 模式，含汇总表）"""
+    server.DB_PATH = path
+    server.db_pool = ConnectionPool(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        server.init_database()
+
+    now_ms = int(time.time() * 1000)
+    step = days * 86400000 // rows
+    chunk = 20000
+    for start in range(0, rows, chunk):
+        server.save_batch_to_database([
+            server.reading_to_row({
+                'temperature': 20.0 + i % 100 / 10, 'humidity': 55.5, 'co': 12.3, 'air_quality': 87.0,
+                'sound': 33.3, 'timestamp': i, 'device_id': f'kitchen_{i % 4:02d}'
+            }, now_ms - (rows - i) * step)
+            for i in range(start, min(start + chunk, rows))
+        ])
+    with server.db_pool.connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    server.db_pool.close()
+
+
+def file_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+class Writer:
+    """以固定间隔写入单条读数，记录每次写入（含等待写锁）的延迟"""
+
+    def __init__(self, server, interval):
+        self.server = server
+        self.interval = interval
+        self.latencies = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        i = 0
+        while not self._stop.is_set():
+            row = self.server.reading_to_row({
+                'temperature': 23.4, 'humidity': 56.7, 'co': 12.0, 'air_quality': 88.0, 'sound': 31.5,
+                'timestamp': i, 'device_id': 'kitchen_live'
+            })
+            start = time.perf_counter()
+            self.server.save_batch_to_database([row])
+            self.latencies.append(time.perf_counter() - start)
+            i += 1
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        time.sleep(0.2)
+        return self
+
+    def __exit__(self, *exc):
+        time.sleep(0.2)
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        values = sorted(self.latencies)
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        return len(values), statistics.median(values) * 1000, p99 * 1000, values[-1] * 1000
+
+
+def naive_retention(server, cutoff_ms):
+    """旧做法：一条 DELETE 删除全部过期行，再完整 VACUUM"""
+    with server.db_pool.transaction() as conn:
+        deleted = conn.execute('DELETE FROM kitchen_sensor_data WHERE ts_ms < ?', (cutoff_ms,)).rowcount
+    with server.db_pool.connection() as conn:
+        conn.execute('VACUUM')
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据保留策略基准')
+    parser.add_argument('--rows', type=int, default=500000, help='原始数据行数')
+    parser.add_argument('--days', type=int, default=60, help='数据跨越的天数')
+    parser.add_argument('--keep-days', type=float, default=30, help='保留天数')
+    parser.add_argument('--write-interval', type=float, default=0.01, help='并发写入的间隔，秒')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_retention_')
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as server
+
+    source = os.path.join(workdir, 'source.db')
+    build_database(server, source, args.rows, args.days)
+    print(f"数据库: {args.rows} 行，跨 {args.days} 天，{file_size(source) / 1e6:.1f} MB；保留 {args.keep_days:g} 天")
+    print(f"{'方式':<24}{'删除行数':>10}{'回收 MB':>9}{'文件 MB':>9}{'用时 s':>8}"
+          f"{'写入次数':>9}{'写p50 ms':>10}{'写p99 ms':>10}{'写max ms':>10}")
+
+    for index, name in enumerate(('一次性 DELETE + VACUUM', 'RetentionEngine')):
+        path = os.path.join(workdir, f'case{index}.db')
+        shutil.copy(source, path)
+        server.DB_PATH = path
+        server.db_pool = ConnectionPool(path)
+        before = file_size(path)
+        cutoff_ms = int((time.time() - args.keep_days * 86400) * 1000)
+
+        with Writer(server, args.write_interval) as writer:
+            start = time.perf_counter()
+            if name == 'RetentionEngine':
+                engine = RetentionEngine(server.db_pool.connection, 'kitchen_sensor_data', 'ts_ms',
+                                         args.keep_days, guard=server.rollups_cover_expired)
+                report = engine.run_once()
+                deleted, reclaimed = report['deleted_rows'], report['reclaimed_bytes']
+            else:
+                deleted = naive_retention(server, cutoff_ms)
+                reclaimed = None
+            elapsed = time.perf_counter() - start
+
+        with server.db_pool.connection() as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        after = file_size(path)
+        if reclaimed is None:
+            reclaimed = before - after
+        server.db_pool.close()
+
+        count, p50, p99, worst = writer.summary()
+        print(f"{name:<24}{deleted:>10}{reclaimed / 1e6:>9.1f}{after / 1e6:>9.1f}{elapsed:>8.2f}"
+              f"{count:>9}{p50:>10.2f}{p99:>10.2f}{worst:>10.1f}")
+        if name == 'RetentionEngine':
+            print(f"  单批最长占用写锁 {engine.max_lock_ms:.1f} ms，最终批量 {engine.chunk_size} 行")
+
+        conn = sqlite3.connect(path)
+        remaining = conn.execute('SELECT MIN(ts_ms) FROM kitchen_sensor_data WHERE device_id != ?',
+                                 ('kitchen_live',)).fetchone()[0]
+        conn.close()
+        assert remaining is None or remaining >= cutoff_ms - 1000, '存在未删除的过期数据'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存历史窗口对比：list[dict] + pop(0)（旧实现） vs ColumnarRingBuffer
+输出：每条读数占用的字节数，以及满窗口时每次追加的耗时
+用法：python scripts/bench_ring_buffer.py --capacity 1000 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from ring_buffer import ColumnarRingBuffer
+
+METRICS = ['temperature', 'humidity', 'co', 'air_quality', 'sound']
+DEVICES = [f'kitchen_{i:02d}' for i in range(12)]
+
+
+def make_reading(i):
+    """生成一条与 Arduino 上报格式相同的读数"""
+    reading = {m: round(random.uniform(0, 100), 1) for m in METRICS}
+    reading['timestamp'] = i * 1000
+    reading['device_id'] = DEVICES[i % len(DEVICES)]
+    return reading
+
+
+def measure(build):
+    """用 tracemalloc 统计 build() 产生的对象占用的内存"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description='内存历史窗口对比')
+    parser.add_argument('--capacity', type=int, nargs='+', default=[1000, 10000, 100000], help='窗口容量')
+    parser.add_argument('--appends', type=int, default=20000, help='满窗口后继续追加的条数')
+    args = parser.parse_args()
+
+    for capacity in args.capacity:
+        readings = [make_reading(i) for i in range(capacity)]
+        extra = [make_reading(capacity + i) for i in range(args.appends)]
+
+        history, list_bytes = measure(lambda: [r.copy() for r in readings])
+
+        def build_ring():
+            ring = ColumnarRingBuffer(capacity, METRICS + ['timestamp'], ['device_id'])
+            for i, r in enumerate(readings):
+                ring.append(float(i), r)
+            return ring
+        ring, ring_bytes = measure(build_ring)
+
+        start = time.perf_counter()
+        for r in extra:
+            history.append(r.copy())
+            if len(history) > capacity:
+                history.pop(0)
+        list_us = (time.perf_counter() - start) * 1e6 / args.appends
+
+        start = time.perf_counter()
+        for i, r in enumerate(extra):
+            ring.append(float(capacity + i), r)
+        ring_us = (time.perf_counter() - start) * 1e6 / args.appends
+
+        print(f"容量 {capacity:>7}:  list[dict] {list_bytes / capacity:>6.0f} B/条, 追加 {list_us:>6.2f} µs   "
+              f"环形缓冲 {ring_bytes / capacity:>5.0f} B/条, 追加 {ring_us:>5.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
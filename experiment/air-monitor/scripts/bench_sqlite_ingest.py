@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite写入性能基准测试
+对比：每条读数单独 connect/commit/close（旧实现） vs 共享连接池 + WAL（新实现）
+用法：python scripts/bench_sqlite_ingest.py --rows 5000 --threads 4
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from db_pool import ConnectionPool
+
+CREATE_SQL = '''
+    CREATE TABLE IF NOT EXISTS kitchen_sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        temperature REAL,
+        humidity REAL,
+        co REAL,
+        air_quality REAL,
+        sound REAL,
+        timestamp INTEGER,
+        device_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+INSERT_SQL = '''
+    INSERT INTO kitchen_sensor_data
+    (temperature, humidity, co, air_quality, sound, timestamp, device_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def make_row(i):
+    """生成一条模拟读数"""
+    return (24.5, 55.0, 12.0, 80.0, 30.0, i, f'kitchen_{i % 12:02d}')
+
+
+def insert_per_connection(db_path, i):
+    """旧实现：每条读数都新建连接并提交"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(INSERT_SQL, make_row(i))
+    conn.commit()
+    conn.close()
+
+
+def run(label, db_path, rows, threads, insert):
+    """多线程写入rows条数据并输出吞吐量"""
+    per_thread = rows // threads
+
+    def worker(offset):
+        for i in range(offset, offset + per_thread):
+            insert(i)
+
+    workers = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    total = per_thread * threads
+    print(f"{label:<28} {total:>8} 条  {elapsed:>7.2f} 秒  {total / elapsed:>10.0f} 条/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite写入性能基准测试')
+    parser.add_argument('--rows', type=int, default=5000, help='写入总条数')
+    parser.add_argument('--threads', type=int, default=4, help='并发写入线程数（模拟多个设备）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, 'legacy.db')
+        conn = sqlite3.connect(legacy_db)
+        conn.execute(CREATE_SQL)
+        conn.commit()
+        conn.close()
+        run('每次新建连接 (journal=DELETE)', legacy_db, args.rows, args.threads,
+            lambda i: insert_per_connection(legacy_db, i))
+
+        pooled_db = os.path.join(tmp, 'pooled.db')
+        pool = ConnectionPool(pooled_db, size=args.threads)
+        with pool.transaction() as conn:
+            conn.execute(CREATE_SQL)
+
+        def pooled_insert(i):
+            with pool.transaction() as conn:
+                conn.execute(INSERT_SQL, make_row(i))
+
+        run('连接池 (WAL, synchronous=NORMAL)', pooled_db, args.rows, args.threads, pooled_insert)
+        pool.close()
+
+
+if __name__ == '__main__':
+    main()
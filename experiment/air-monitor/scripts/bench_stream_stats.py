@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/api/stats 统计计算微基准
+对比：每次请求遍历 data_history 重建列表（旧实现） vs SlidingStats 增量统计
+用法：python scripts/bench_stream_stats.py --windows 1000 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from stream_stats import SlidingStats
+
+METRICS = ['temperature', 'humidity', 'co', 'air_quality', 'sound']
+
+
+def make_reading():
+    """生成一条模拟读数"""
+    return {m: random.uniform(0, 100) for m in METRICS}
+
+
+def legacy_stats(history):
+    """旧实现：每个指标重建列表并 sum/min/max"""
+    result = {}
+    for m in METRICS:
+        values = [d[m] for d in history]
+        result[m] = (sum(values) / len(values), min(values), max(values))
+    return result
+
+
+def incremental_stats(stats):
+    """新实现：直接读取增量统计"""
+    return {m: (stats.mean(m), stats.min(m), stats.max(m)) for m in METRICS}
+
+
+def bench(window, queries):
+    """窗口已满时，交替执行“写入一条 + 查询一次”"""
+    history = [make_reading() for _ in range(window)]
+    stats = SlidingStats(METRICS)
+    for r in history:
+        stats.push(r)
+
+    incoming = [make_reading() for _ in range(queries)]
+
+    legacy_list = list(history)
+    start = time.perf_counter()
+    for r in incoming:
+        legacy_list.append(r)
+        legacy_list.pop(0)
+        legacy_stats(legacy_list)
+    legacy_us = (time.perf_counter() - start) * 1e6 / queries
+
+    incr_list = list(history)
+    start = time.perf_counter()
+    for r in incoming:
+        incr_list.append(r)
+        stats.push(r)
+        stats.pop(incr_list.pop(0))
+        incremental_stats(stats)
+    incr_us = (time.perf_counter() - start) * 1e6 / queries
+
+    print(f"窗口 {window:>7}:  遍历重建 {legacy_us:>10.1f} µs/次   增量统计 {incr_us:>7.1f} µs/次   "
+          f"加速 {legacy_us / incr_us:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/stats 统计计算微基准')
+    parser.add_argument('--windows', type=int, nargs='+', default=[1000, 10000, 100000], help='窗口大小')
+    parser.add_argument('--queries', type=int, default=200, help='每个窗口执行的写入+查询次数')
+    args = parser.parse_args()
+
+    for window in args.windows:
+        bench(window, args.queries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flask（线程）与 ASGI（asyncio）两种服务器入口的负载对比
+流程：分别以子进程启动两种服务器（各用独立的临时数据库），先建立大量空闲的 SSE 长连接并保持，
+然后在这些连接存在的情况下压测 POST /api/sensor-data 和 GET /api/current-data，
+记录每秒请求数、延迟分位数、错误数，以及服务器进程的线程数和内存占用；最后检查 SSE 客户端是否都收到了推送
+用法：python scripts/load_test_servers.py --sse-clients 1000 --concurrency 50 --requests 1000
+说明：Flask 版以 threaded=True 启动（与 app.run(debug=True) 的并发模型相同，但不启用重载器和调试器）；
+      ASGI 版需要 pip install uvicorn
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python')
+
+FLASK_LAUNCHER = (
+    "import sys, kitchen_web_server as k; k.init_database(); k.write_buffer.start(); "
+    "k.app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)"
+)
+
+READING = json.dumps({
+    'temperature': 23.4, 'humidity': 56.7, 'co': 12.0, 'air_quality': 88.0, 'sound': 31.5,
+    'timestamp': 1234567890, 'device_id': 'kitchen_01'
+}).encode('utf-8')
+
+
+def start_server(kind, port, workdir):
+    """以子进程启动服务器，返回 Popen"""
+    env = dict(os.environ, KITCHEN_DB_PATH=os.path.join(workdir, f'{kind}.db'), KITCHEN_LINE_PORT='0')
+    if kind == 'flask':
+        cmd = [sys.executable, '-c', FLASK_LAUNCHER, str(port)]
+    else:
+        cmd = [sys.executable, 'kitchen_asgi_server.py', '--host', '127.0.0.1', '--port', str(port)]
+    process = subprocess.Popen(cmd, cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{kind} 服务器启动失败（退出码 {process.returncode}）')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{kind} 服务器启动超时')
+
+
+def process_stats(pid):
+    """从 /proc 读取进程的线程数和常驻内存（MB）"""
+    threads, rss_mb = None, None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+                elif line.startswith('VmRSS:'):
+                    rss_mb = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return threads, rss_mb
+
+
+async def http_request(reader, writer, method, path, body=b''):
+    """在已建立的连接上发送一个请求，返回 (状态码, 响应体, 连接是否可复用)"""
+    head = f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+    if body:
+        head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    writer.write(head.encode('latin-1') + b'\r\n' + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    version, status = status_line.split()[:2]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if 'content-length' in headers:
+        data = await reader.readexactly(int(headers['content-length']))
+        reusable = version == b'HTTP/1.1' and headers.get('connection') != 'close'
+    else:
+        data = await reader.read()
+        reusable = False
+    return int(status), data, reusable
+
+
+async def load_worker(port, method, path, body, count, latencies, errors):
+    """单个并发工作协程：尽量复用连接（服务器支持 keep-alive 时）"""
+    conn = None
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = await asyncio.open_connection('127.0.0.1', port)
+            status, _, reusable = await http_request(*conn, method, path, body)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+            else:
+                latencies.append(time.perf_counter() - start)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors['connection'] = errors.get('connection', 0) + 1
+            reusable = False
+        if not reusable and conn is not None:
+            conn[1].close()
+            conn = None
+    if conn is not None:
+        conn[1].close()
+
+
+async def run_load(port, method, path, body, requests, concurrency):
+    """并发压测一个路由，返回 (每秒请求数, p50 ms, p99 ms, 错误统计)"""
+    latencies, errors = [], {}
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(load_worker(port, method, path, body, n, latencies, errors) for n in per_worker))
+    elapsed = time.perf_counter() - start
+    if not latencies:
+        return 0, None, None, errors
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / elapsed, statistics.median(latencies) * 1000, p99 * 1000, errors
+
+
+class SSEClient:
+    """保持一个 /api/stream 连接，统计收到的 reading 事件数"""
+
+    def __init__(self):
+        self.connected = False
+        self.events = 0
+        self.writer = None
+
+    async def run(self, port):
+        try:
+            reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+            self.writer.write(b'GET /api/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n')
+            await self.writer.drain()
+            status_line = await reader.readline()
+            self.connected = b' 200 ' in status_line
+            while self.connected:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b'event: reading'):
+                    self.events += 1
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connected = False
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def test_server(port, pid, args):
+    """对一种服务器执行完整测试，返回结果字典"""
+    clients = [SSEClient() for _ in range(args.sse_clients)]
+    tasks = [asyncio.ensure_future(client.run(port)) for client in clients]
+
+    # 等待 SSE 连接建立（最多10秒）
+    deadline = time.time() + 10
+    while time.time() < deadline and sum(c.connected for c in clients) < len(clients):
+        await asyncio.sleep(0.2)
+    connected = sum(c.connected for c in clients)
+    threads, rss_mb = process_stats(pid)
+    initial_events = [c.events for c in clients]
+
+    post = await run_load(port, 'POST', '/api/sensor-data', READING, args.requests, args.concurrency)
+    current = await run_load(port, 'GET', '/api/current-data', b'', args.requests, args.concurrency)
+    await asyncio.sleep(1)
+
+    received = sum(1 for c, before in zip(clients, initial_events) if c.connected and c.events > before)
+    for client in clients:
+        client.close()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {'connected': connected, 'received': received, 'threads': threads, 'rss': rss_mb,
+            'post': post, 'current': current}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask 与 ASGI 服务器负载对比')
+    parser.add_argument('--sse-clients', type=int, default=1000, help='保持的空闲 SSE 连接数')
+    parser.add_argument('--concurrency', type=int, default=50, help='压测并发数')
+    parser.add_argument('--requests', type=int, default=1000, help='每个路由的请求数')
+    parser.add_argument('--port', type=int, default=5101, help='起始端口（两种服务器各占一个）')
+    parser.add_argument('--servers', nargs='+', default=['flask', 'asgi'], choices=['flask', 'asgi'])
+    args = parser.parse_args()
+
+    # 连接数较多时需要提高文件描述符上限（服务器子进程继承该上限）
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = args.sse_clients * 2 + args.concurrency * 2 + 256
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+    workdir = tempfile.mkdtemp(prefix='load_test_')
+    results = {}
+    for offset, kind in enumerate(args.servers):
+        port = args.port + offset
+        process = start_server(kind, port, workdir)
+        try:
+            results[kind] = asyncio.run(test_server(port, process.pid, args))
+        finally:
+            process.terminate()
+            process.wait(10)
+
+    print(f"SSE 空闲连接 {args.sse_clients}，并发 {args.concurrency}，每个路由 {args.requests} 次请求")
+    print(f"{'服务器':<8}{'SSE已连接':>10}{'收到推送':>10}{'线程':>6}{'内存 MB':>9}"
+          f"{'路由':>20}{'请求/秒':>10}{'p50 ms':>9}{'p99 ms':>9}  错误")
+    for kind, result in results.items():
+        for i, (route, (rps, p50, p99, errors)) in enumerate(
+                [('POST /api/sensor-data', result['post']), ('GET /api/current-data', result['current'])]):
+            if i == 0:
+                prefix = (f"{kind:<8}{result['connected']:>10}{result['received']:>10}"
+                          f"{result['threads'] or 0:>6}{result['rss'] or 0:>9.0f}")
+            else:
+                prefix = ' ' * 43
+            p50_text = f'{p50:>9.1f}' if p50 is not None else f"{'-':>9}"
+            p99_text = f'{p99:>9.1f}' if p99 is not None else f"{'-':>9}"
+            print(f"{prefix}{route:>22}{rps:>10.0f}{p50_text}{p99_text}  {errors or 0}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串口设备替身（伪终端），用于在没有开发板时测试串口上报
+每个替身设备是一个 pty，从端通过符号链接 <目录>/ttyFAKE0、ttyFAKE1... 暴露给读取方，
+按固定频率输出 CSV 读数行，中间夹杂开发板常见的调试输出（会被读取方拒绝并计数）
+
+用法：
+  1. 只运行替身设备，另开终端用 serial_ingest.py 读取：
+       python scripts/serial_pty_device.py --devices 2 --rate 10
+       python src/python/serial_ingest.py /tmp/serial_pty_xxx/ttyFAKE0 /tmp/serial_pty_xxx/ttyFAKE1
+  2. 自检：在本进程内启动 SerialIngestDaemon（临时数据库），发送指定条数后核对入库条数，
+     中途模拟一次拔线（关闭 pty 再换一个新的 pty 挂到同一路径），检查自动重连：
+       python scripts/serial_pty_device.py --selftest --devices 4 --readings 2000
+说明：pty 只在 Linux/macOS 上可用
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import pty
+import sys
+import tempfile
+import time
+import tty
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+# 开发板常见的调试输出
+DEBUG_LINES = ['WiFi连接失败！'.encode(), b'....', '温度: 23.40°C, 湿度: 55.00%'.encode()]
+
+
+class FakeDevice:
+    """一个替身设备：pty 主端由本进程写入，从端路径为固定的符号链接"""
+
+    def __init__(self, link_path, device_id):
+        self.link_path = link_path
+        self.device_id = device_id
+        self.master = None
+        self.sent = 0
+        self.debug_sent = 0
+        self.plug()
+
+    def plug(self):
+        """新建 pty 并把符号链接指向它（相当于插上设备）"""
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        slave_name = os.ttyname(slave)
+        os.close(slave)
+        if os.path.lexists(self.link_path):
+            os.unlink(self.link_path)
+        os.symlink(slave_name, self.link_path)
+        self.master = master
+
+    def unplug(self):
+        """关闭 pty 主端，读取方会收到错误（相当于拔线）"""
+        os.close(self.master)
+        self.master = None
+
+    def send_reading(self, index, timestamp):
+        line = f'{self.device_id},{timestamp},{20 + index % 100 / 10:.1f},55.5,12.3,87.0,33.3\n'
+        os.write(self.master, line.encode())
+        self.sent += 1
+
+    def send_debug(self):
+        os.write(self.master, DEBUG_LINES[self.debug_sent % len(DEBUG_LINES)] + b'\r\n')
+        self.debug_sent += 1
+
+
+def run_devices(devices, rate):
+    """按频率持续输出，直到 Ctrl+C"""
+    for device in devices:
+        print(f"{device.device_id}: {device.link_path} -> {os.readlink(device.link_path)}")
+    print("按 Ctrl+C 停止")
+    index = 0
+    try:
+        while True:
+            for device in devices:
+                device.send_reading(index, int(time.time() * 1000))
+                if index % 20 == 0:
+                    device.send_debug()
+            index += 1
+            time.sleep(1 / rate)
+    except KeyboardInterrupt:
+        pass
+
+
+def wait_until(condition, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def selftest(devices, readings, rate, workdir):
+    """在本进程内读取替身设备并核对入库结果，返回是否全部通过"""
+    from db_pool import ConnectionPool
+    from serial_ingest import SerialIngestDaemon
+
+    os.chdir(workdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import kitchen_web_server as kitchen
+        kitchen.DB_PATH = os.path.join(workdir, 'selftest.db')
+        kitchen.db_pool = ConnectionPool(kitchen.DB_PATH)
+        kitchen.init_database()
+        kitchen.write_buffer.start()
+
+    daemon = SerialIngestDaemon([d.link_path for d in devices], kitchen.line_server.parser, kitchen.ingest_readings,
+                                reconnect_delay=0.1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        daemon.start()
+        if not wait_until(lambda: all(r.connected for r in daemon.readers), 5):
+            print('串口未能全部连接')
+            return False
+
+        start = time.perf_counter()
+        unplugged = False
+        for i in range(readings):
+            if i == readings // 2 and not unplugged:
+                # 等已发送的数据被读走，再拔线、换新 pty、等待重连
+                wait_until(lambda: sum(r.lines for r in daemon.readers) >= sum(d.sent + d.debug_sent for d in devices), 5)
+                for device in devices:
+                    device.unplug()
+                    device.plug()
+                wait_until(lambda: all(r.connected and r.reconnects for r in daemon.readers), 10)
+                unplugged = True
+            for device in devices:
+                device.send_reading(i, i)
+                if i % 50 == 0:
+                    device.send_debug()
+            if rate:
+                time.sleep(1 / rate)
+
+        expected = readings * len(devices)
+        wait_until(lambda: sum(r.accepted + r.dropped for r in daemon.readers) >= expected, 10)
+        elapsed = time.perf_counter() - start
+        daemon.stop()
+        kitchen.write_buffer.flush()
+
+    with kitchen.db_pool.connection() as conn:
+        stored = dict(conn.execute(
+            'SELECT device_id, COUNT(*) FROM kitchen_sensor_data GROUP BY device_id'
+        ).fetchall())
+
+    ok = True
+    print(f"{'串口':<32}{'重连':>6}{'行数':>8}{'入库':>8}{'拒绝':>6}{'丢弃':>6}{'数据库':>8}")
+    for device, stats in zip(devices, daemon.stats()):
+        db_count = stored.get(device.device_id, 0)
+        print(f"{os.path.basename(stats['port']):<32}{stats['reconnects']:>6}{stats['lines']:>8}"
+              f"{stats['accepted']:>8}{stats['rejected']:>6}{stats['dropped']:>6}{db_count:>8}")
+        ok = ok and db_count == readings and stats['rejected'] == device.debug_sent and stats['reconnects'] >= 1
+    print(f"{len(devices)} 个串口共 {expected} 条读数，用时 {elapsed:.2f} 秒，{expected / elapsed:.0f} 条/秒")
+    print('自检通过' if ok else '自检失败')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='串口设备替身（伪终端）')
+    parser.add_argument('--devices', type=int, default=2, help='替身设备数')
+    parser.add_argument('--rate', type=float, help='每台设备每秒读数条数（默认10；自检时默认不限速）')
+    parser.add_argument('--selftest', action='store_true', help='在本进程内读取并核对入库条数')
+    parser.add_argument('--readings', type=int, default=2000, help='自检时每台设备发送的条数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='serial_pty_')
+    devices = [FakeDevice(os.path.join(workdir, f'ttyFAKE{i}'), f'kitchen_serial_{i:02d}') for i in range(args.devices)]
+    try:
+        if args.selftest:
+            sys.exit(0 if selftest(devices, args.readings, args.rate, workdir) else 1)
+        run_devices(devices, args.rate or 10)
+    finally:
+        for device in devices:
+            if device.master is not None:
+                os.close(device.master)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发压力测试：多线程同时 POST 上报与 GET 查询，检查读到的数据是否被撕裂
+每条读数的所有指标都等于同一个序号，/api/current-data 返回的指标互不相等即说明读到了写了一半的数据。
+服务器以多线程模式在本进程内启动，使用临时数据库。
+用法：python scripts/stress_concurrency.py --server kitchen --writers 8 --readers 8 --seconds 10
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from db_pool import ConnectionPool
+
+SERVERS = {
+    'kitchen': ['temperature', 'humidity', 'co', 'air_quality', 'sound'],
+    'dht11': ['temperature', 'humidity'],
+}
+
+
+def load_app(name, workdir):
+    """导入服务器模块并把数据库指向临时目录"""
+    os.chdir(workdir)
+    if name == 'kitchen':
+        import kitchen_web_server as server
+        server.DB_PATH = os.path.join(workdir, 'stress.db')
+        server.db_pool = ConnectionPool(server.DB_PATH)
+        server.init_database()
+        server.write_buffer.start()
+    else:
+        import sensor_web_server as server  # 使用当前目录下的 sensor_data.db
+        server.init_database()
+    return server
+
+
+class QuietHandler(WSGIRequestHandler):
+    """不输出访问日志"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Counter:
+    """线程安全的计数与延迟记录"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.errors = {}
+        self.latencies = {}
+        self.torn_reads = 0
+
+    def record(self, kind, seconds, ok):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.latencies.setdefault(kind, []).append(seconds)
+            if not ok:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def request_json(url, payload=None):
+    """发送请求，返回 (状态码, JSON)"""
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    req = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def writer(base_url, metrics, worker_id, deadline, counter, batch):
+    """持续上报：所有指标都取同一个序号"""
+    seq = 0
+    device_id = f'stress_{worker_id:02d}'
+    while time.time() < deadline:
+        readings = []
+        for _ in range(batch):
+            seq += 1
+            value = worker_id * 1000000 + seq
+            reading = {m: value for m in metrics}
+            reading.update(timestamp=seq, device_id=device_id)
+            readings.append(reading)
+
+        start = time.perf_counter()
+        if batch == 1:
+            status, _ = request_json(base_url + '/api/sensor-data', readings[0])
+            kind = 'POST sensor-data'
+        else:
+            status, _ = request_json(base_url + '/api/sensor-data/batch', readings)
+            kind = 'POST batch'
+        # 429 为写缓冲区背压，属于正常响应
+        counter.record(kind, time.perf_counter() - start, status in (200, 429))
+
+
+def reader(base_url, metrics, deadline, counter):
+    """轮流查询最新数据、统计、内存报告，并检查最新数据是否撕裂"""
+    paths = ['/api/current-data', '/api/stats', '/api/memory']
+    i = 0
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        status, body = request_json(base_url + path)
+        counter.record('GET ' + path, time.perf_counter() - start, status == 200)
+
+        if path == '/api/current-data' and body and body.get('device_id'):
+            values = {body.get(m) for m in metrics}
+            if len(values) > 1:
+                with counter.lock:
+                    counter.torn_reads += 1
+
+
+def percentile(values, p):
+    """简单百分位数"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='POST/GET 并发压力测试')
+    parser.add_argument('--server', choices=sorted(SERVERS), default='kitchen', help='被测服务器')
+    parser.add_argument('--writers', type=int, default=8, help='上报线程数（每个线程模拟一个设备）')
+    parser.add_argument('--readers', type=int, default=8, help='查询线程数')
+    parser.add_argument('--seconds', type=float, default=10, help='持续时间（秒）')
+    parser.add_argument('--batch', type=int, default=1, help='每次上报的条数，大于1时使用批量接口')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='stress_')
+    metrics = SERVERS[args.server]
+
+    # 服务器每个请求都会 print，压测期间丢弃输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = load_app(args.server, workdir)
+        httpd = make_server('127.0.0.1', 0, server.app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{httpd.server_port}'
+
+        counter = Counter()
+        deadline = time.time() + args.seconds
+        threads = [
+            threading.Thread(target=writer, args=(base_url, metrics, i, deadline, counter, args.batch))
+            for i in range(args.writers)
+        ]
+        threads += [
+            threading.Thread(target=reader, args=(base_url, metrics, deadline, counter))
+            for _ in range(args.readers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        httpd.shutdown()
+        if args.server == 'kitchen':
+            server.write_buffer.stop()
+
+    print(f"服务器: {args.server}, 上报线程: {args.writers}, 查询线程: {args.readers}, "
+          f"时长: {args.seconds}s, 数据目录: {workdir}")
+    print(f"{'请求':<24}{'次数':>8}{'失败':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for kind in sorted(counter.requests):
+        lat = counter.latencies[kind]
+        print(f"{kind:<24}{counter.requests[kind]:>8}{counter.errors.get(kind, 0):>8}"
+              f"{percentile(lat, 50) * 1000:>10.2f}{percentile(lat, 99) * 1000:>10.2f}")
+    print(f"撕裂读: {counter.torn_reads}")
+
+    failed = sum(counter.errors.values()) + counter.torn_reads
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
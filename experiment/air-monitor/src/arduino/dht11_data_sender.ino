@@ -18,6 +18,12 @@ char pass[] = "xiaoyezi";    // 你的WiFi密码
 // PC端Web服务器配置 - 请修改为你的PC IP地址
 // 注意：Arduino UNO R4 WiFi不支持HTTPClient库，使用原生WiFiClient
 
+// 上报方式：0 = HTTP JSON POST；1 = UDP 行协议（一行CSV，无需等待应答，设备端和服务器端开销都小得多）
+#define USE_LINE_PROTOCOL 0
+const char* lineHost = "192.168.3.4"; // 你的PC IP地址
+int linePort = 5003;                  // 服务器行协议端口（服务器需以 DHT11_LINE_PORT=5003 启动）
+WiFiUDP udp;
+
 // 组件初始化
 ArduinoLEDMatrix matrix;
 DHT dht(DHTPIN, DHTTYPE);
@@ -177,6 +183,27 @@ void sendDataToServer() {
   }
 }
 
+// 行协议上报：device_id,timestamp,temperature,humidity
+void sendLineProtocol() {
+  if (WiFi.status() != WL_CONNECTED) {
+    Serial.println("WiFi未连接，无法发送数据");
+    return;
+  }
+
+  char line[64];
+  snprintf(line, sizeof(line), "arduino_dht11_001,%lu,%.1f,%.1f\n",
+           millis(), currentTemperature, currentHumidity);
+
+  udp.beginPacket(lineHost, linePort);
+  udp.print(line);
+  if (udp.endPacket()) {
+    Serial.print("发送数据(UDP): ");
+    Serial.print(line);
+  } else {
+    Serial.println("UDP发送失败");
+  }
+}
+
 void loop() {
   // 更新传感器数据
   if (millis() - lastUpdate > 2000) { // 每2秒更新一次传感器数据
@@ -185,7 +212,11 @@ void loop() {
   
   // 发送数据到服务器
   if (millis() - lastSend > sendInterval) { // 每5秒发送一次数据
+#if USE_LINE_PROTOCOL
+    sendLineProtocol();
+#else
     sendDataToServer();
+#endif
     lastSend = millis();
   }
   
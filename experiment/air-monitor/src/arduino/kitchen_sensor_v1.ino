@@ -24,6 +24,12 @@ char pass[] = "xiaoyezi";              // 你的WiFi密码
 String host = "192.168.3.4";          // 你的PC IP地址
 int port = 5000;
 
+// 上报方式：0 = HTTP JSON POST；1 = UDP 行协议（一行CSV，无需等待应答，设备端和服务器端开销都小得多）；
+//          2 = 串口行协议（没有WiFi时用USB线连接PC，由 serial_ingest.py 或 KITCHEN_SERIAL_PORTS 读取）
+#define USE_LINE_PROTOCOL 0
+int linePort = 5002;                  // 服务器行协议端口（服务器需以 KITCHEN_LINE_PORT=5002 启动）
+WiFiUDP udp;
+
 // 组件初始化
 ArduinoLEDMatrix matrix;
 DHT dht(DHTPIN, DHTTYPE);
@@ -229,6 +235,36 @@ void sendDataToServer() {
   }
 }
 
+// 行协议上报：device_id,timestamp,temperature,humidity,co,air_quality,sound
+void sendLineProtocol() {
+  if (WiFi.status() != WL_CONNECTED) {
+    Serial.println("WiFi未连接，无法发送数据");
+    return;
+  }
+
+  char line[96];
+  snprintf(line, sizeof(line), "kitchen_sensor_001,%lu,%.1f,%.1f,%.0f,%.0f,%.0f\n",
+           millis(), currentTemperature, currentHumidity, currentCO, currentAirQuality, currentSound);
+
+  udp.beginPacket(host.c_str(), linePort);
+  udp.print(line);
+  if (udp.endPacket()) {
+    Serial.print("发送数据(UDP): ");
+    Serial.print(line);
+  } else {
+    Serial.println("UDP发送失败");
+    displayText("  SEND ERR ", 50);
+  }
+}
+
+// 串口上报：与UDP相同的一行CSV，直接写到USB串口（调试输出会被服务器忽略）
+void sendSerialLine() {
+  char line[96];
+  snprintf(line, sizeof(line), "kitchen_sensor_001,%lu,%.1f,%.1f,%.0f,%.0f,%.0f\n",
+           millis(), currentTemperature, currentHumidity, currentCO, currentAirQuality, currentSound);
+  Serial.print(line);
+}
+
 void updateDisplay() {
   char textBuffer[20];  // 改名避免与函数displayText()冲突
   
@@ -266,7 +302,13 @@ void loop() {
   
   // 发送数据到服务器
   if (millis() - lastSend > sendInterval) { // 每5秒发送一次数据
+#if USE_LINE_PROTOCOL == 2
+    sendSerialLine();
+#elif USE_LINE_PROTOCOL
+    sendLineProtocol();
+#else
     sendDataToServer();
+#endif
     lastSend = millis();
   }
   
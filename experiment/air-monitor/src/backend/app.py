@@ -2,55 +2,75 @@
 厨房空气质量监测系统 - Flask后端应用
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
 import sys
 import os
-from datetime import datetime, timedelta
+import time
+import threading
+from datetime import datetime
 
-# 添加父目录到路径，以便导入模拟器
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 添加父目录到路径，以便导入模拟器和 python/ 下的公用模块
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SRC_DIR)
+sys.path.append(os.path.join(SRC_DIR, 'python'))
 
 from simulator.air_quality_simulator import AirQualitySimulator, CookingActivity
+from stream_stats import SlidingStats
+from ring_buffer import ColumnarRingBuffer
+from broadcaster import Broadcaster
+from json_codec import FastJSONProvider
 
 app = Flask(__name__, 
             static_folder='../frontend',
             template_folder='../frontend')
 CORS(app)
+app.json = FastJSONProvider(app)  # jsonify / get_json 使用更快的JSON实现（装有 orjson 时）
 
 # 全局模拟器实例
 simulator = AirQualitySimulator()
 
-# 数据历史记录（简单实现，实际应使用数据库）
-data_history = []
+# 数据历史记录（列式环形缓冲区，实际应使用数据库）
 MAX_HISTORY = 1000  # 最多保留1000条记录
+data_history = ColumnarRingBuffer(
+    MAX_HISTORY,
+    ['pm25', 'pm10', 'co', 'co2', 'temperature', 'humidity'],
+    ['timestamp', 'activity']
+)
+
+# 参与统计的指标及其增量统计
+STATS_FIELDS = ['pm25', 'co', 'co2', 'temperature', 'humidity']
+history_stats = SlidingStats(STATS_FIELDS)
 
 # 告警历史
 alert_history = []
 MAX_ALERTS = 100
 
+# 实时推送：所有页面共用一个采样线程，每 SAMPLE_INTERVAL 秒读取一次模拟器并广播，
+# 不再每个页面各自轮询 /api/current
+SAMPLE_INTERVAL = 2
+broadcaster = Broadcaster()
+latest_payload = None  # 最近一次推送的内容，新连接先收到它
+_sampler_lock = threading.Lock()
+_sampler_thread = None
 
-@app.route('/')
-def index():
-    """主页"""
-    return render_template('index.html')
+# 采样线程与请求线程都会写历史和告警，读写都加锁（读取时只在锁内复制，编码在锁外）
+_history_lock = threading.Lock()
 
 
-@app.route('/api/current', methods=['GET'])
-def get_current_data():
-    """获取当前传感器数据"""
-    data = simulator.read_sensors()
-    level = simulator.get_air_quality_level(data)
-    should_alert = simulator.should_alert(data)
-    
-    # 添加到历史记录
-    data_history.append(data)
-    if len(data_history) > MAX_HISTORY:
-        data_history.pop(0)
-    
-    # 如果需要告警，记录告警
-    if should_alert:
-        alert_record = {
+def append_history(record):
+    """追加到历史记录，超出容量时淘汰最旧一条并同步更新统计"""
+    with _history_lock:
+        evicted = data_history.append(time.time(), record)
+        history_stats.push(record)
+        if evicted is not None:
+            history_stats.pop(evicted)
+
+
+def record_alert(data, level):
+    """记录一条告警"""
+    with _history_lock:
+        alert_history.append({
             'timestamp': data['timestamp'],
             'level': level,
             'pm25': data['pm25'],
@@ -58,10 +78,64 @@ def get_current_data():
             'co2': data['co2'],
             'temperature': data['temperature'],
             'humidity': data['humidity']
-        }
-        alert_history.append(alert_record)
+        })
         if len(alert_history) > MAX_ALERTS:
             alert_history.pop(0)
+
+
+def publish_reading(data, level, should_alert):
+    """把一条读数推送给所有订阅 /api/stream 的页面"""
+    global latest_payload
+    latest_payload = {
+        'success': True,
+        'data': data,
+        'level': level,
+        'alert': should_alert
+    }
+    broadcaster.publish('reading', latest_payload)
+
+
+def take_reading():
+    """读取一次模拟器，记录历史与告警并推送"""
+    data = simulator.read_sensors()
+    level = simulator.get_air_quality_level(data)
+    should_alert = simulator.should_alert(data)
+
+    append_history(data)
+    if should_alert:
+        record_alert(data, level)
+
+    publish_reading(data, level, should_alert)
+    return data, level, should_alert
+
+
+def sampler_loop():
+    """后台采样：有页面订阅时才读取模拟器"""
+    while True:
+        if broadcaster.subscriber_count:
+            take_reading()
+        time.sleep(SAMPLE_INTERVAL)
+
+
+def ensure_sampler():
+    """启动后台采样线程（只启动一次）"""
+    global _sampler_thread
+    with _sampler_lock:
+        if _sampler_thread is None:
+            _sampler_thread = threading.Thread(target=sampler_loop, daemon=True)
+            _sampler_thread.start()
+
+
+@app.route('/')
+def index():
+    """主页"""
+    return render_template('index.html')
+
+
+@app.route('/api/current', methods=['GET'])
+def get_current_data():
+    """获取当前传感器数据"""
+    data, level, should_alert = take_reading()
     
     return jsonify({
         'success': True,
@@ -71,6 +145,21 @@ def get_current_data():
     })
 
 
+@app.route('/api/stream', methods=['GET'])
+def stream_data():
+    """SSE推送实时数据（event: reading，格式同 /api/current），连接后先发送最近一次数据"""
+    ensure_sampler()
+
+    def snapshot():
+        return [('reading', latest_payload)] if latest_payload else []
+
+    return Response(
+        broadcaster.stream(snapshot=snapshot),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/history', methods=['GET'])
 def get_history_data():
     """获取历史数据"""
@@ -78,22 +167,15 @@ def get_history_data():
     hours = request.args.get('hours', default=1, type=int)
     limit = request.args.get('limit', default=100, type=int)
     
-    # 计算时间范围
-    now = datetime.now()
-    start_time = now - timedelta(hours=hours)
-    
-    # 筛选数据
-    filtered_data = []
-    for record in data_history:
-        record_time = datetime.fromisoformat(record['timestamp'])
-        if record_time >= start_time:
-            filtered_data.append(record)
-    
-    # 限制返回数量
-    if len(filtered_data) > limit:
-        # 均匀采样
-        step = len(filtered_data) // limit
-        filtered_data = filtered_data[::step]
+    with _history_lock:
+        # 计算时间范围（按接收时间二分查找，无需逐条解析时间字符串）
+        start, stop = data_history.window(time.time() - hours * 3600)
+        
+        # 限制返回数量：超过时均匀采样
+        step = 1
+        if limit > 0 and stop - start > limit:
+            step = (stop - start) // limit
+        filtered_data = data_history.records(start, stop, step)
     
     return jsonify({
         'success': True,
@@ -107,8 +189,9 @@ def get_alerts():
     """获取告警历史"""
     limit = request.args.get('limit', default=50, type=int)
     
-    # 返回最近的告警
-    recent_alerts = alert_history[-limit:] if len(alert_history) > limit else alert_history
+    # 返回最近的告警（锁内复制）
+    with _history_lock:
+        recent_alerts = alert_history[-limit:] if len(alert_history) > limit else list(alert_history)
     
     return jsonify({
         'success': True,
@@ -141,48 +224,14 @@ def set_activity():
 @app.route('/api/stats', methods=['GET'])
 def get_statistics():
     """获取统计信息"""
-    if not data_history:
-        return jsonify({
-            'success': True,
-            'stats': {}
-        })
-    
-    # 计算统计信息
-    pm25_values = [d['pm25'] for d in data_history]
-    co_values = [d['co'] for d in data_history]
-    co2_values = [d['co2'] for d in data_history]
-    temp_values = [d['temperature'] for d in data_history]
-    humidity_values = [d['humidity'] for d in data_history]
-    
-    stats = {
-        'pm25': {
-            'avg': sum(pm25_values) / len(pm25_values),
-            'min': min(pm25_values),
-            'max': max(pm25_values)
-        },
-        'co': {
-            'avg': sum(co_values) / len(co_values),
-            'min': min(co_values),
-            'max': max(co_values)
-        },
-        'co2': {
-            'avg': sum(co2_values) / len(co2_values),
-            'min': min(co2_values),
-            'max': max(co2_values)
-        },
-        'temperature': {
-            'avg': sum(temp_values) / len(temp_values),
-            'min': min(temp_values),
-            'max': max(temp_values)
-        },
-        'humidity': {
-            'avg': sum(humidity_values) / len(humidity_values),
-            'min': min(humidity_values),
-            'max': max(humidity_values)
-        },
-        'total_records': len(data_history),
-        'total_alerts': len(alert_history)
-    }
+    # 增量统计，O(1) 读取；在锁内读取，各字段与总数来自同一时刻
+    with _history_lock:
+        if not history_stats.count:
+            stats = {}
+        else:
+            stats = {field: history_stats.summary(field) for field in STATS_FIELDS}
+            stats['total_records'] = history_stats.count
+            stats['total_alerts'] = len(alert_history)
     
     return jsonify({
         'success': True,
@@ -258,24 +307,14 @@ def ingest_from_arduino_iot_cloud():
     }
 
     # 更新历史与告警
-    data_history.append(record)
-    if len(data_history) > MAX_HISTORY:
-        data_history.pop(0)
+    append_history(record)
 
     level = simulator.get_air_quality_level(record)
     should_alert = simulator.should_alert(record)
     if should_alert:
-        alert_history.append({
-            'timestamp': record['timestamp'],
-            'level': level,
-            'pm25': record['pm25'],
-            'co': record['co'],
-            'co2': record['co2'],
-            'temperature': record['temperature'],
-            'humidity': record['humidity']
-        })
-        if len(alert_history) > MAX_ALERTS:
-            alert_history.pop(0)
+        record_alert(record, level)
+
+    publish_reading(record, level, should_alert)
 
     return jsonify({
         'success': True,
@@ -291,6 +330,7 @@ if __name__ == '__main__':
     print("服务地址: http://localhost:5000")
     print("API文档:")
     print("  GET  /api/current    - 获取当前数据")
+    print("  GET  /api/stream     - 实时推送（SSE）")
     print("  GET  /api/history    - 获取历史数据")
     print("  GET  /api/alerts     - 获取告警历史")
     print("  POST /api/activity   - 设置烹饪活动（演示用）")
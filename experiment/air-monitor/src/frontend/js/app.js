@@ -8,6 +8,9 @@ const API_BASE = 'http://localhost:5000/api';
 // Chart.js实例
 let trendChart = null;
 
+// 趋势图最多显示的点数
+const CHART_POINTS = 50;
+
 // 历史数据
 let historyData = {
     labels: [],
@@ -21,7 +24,7 @@ let historyData = {
 // 初始化
 document.addEventListener('DOMContentLoaded', function() {
     initChart();
-    startDataPolling();
+    startLiveUpdates();
     updateTime();
     setInterval(updateTime, 1000);
 });
@@ -107,6 +110,34 @@ function updateTime() {
     document.getElementById('currentTime').textContent = timeStr;
 }
 
+/**
+ * 开始接收实时数据：订阅服务器推送（SSE），所有页面共用服务器端的一次采样，
+ * 新读数同时追加到趋势图；浏览器不支持 EventSource 时退回轮询
+ */
+function startLiveUpdates() {
+    if (!window.EventSource) {
+        startDataPolling();
+        return;
+    }
+
+    fetchHistoryData();
+    fetchStatistics();
+
+    const source = new EventSource(`${API_BASE}/stream`);
+    source.addEventListener('reading', function(event) {
+        const result = JSON.parse(event.data);
+        updateCurrentDisplay(result.data, result.level, result.alert);
+        appendChartPoint(result.data);
+    });
+    source.onerror = function() {
+        // EventSource 会自动重连
+        document.getElementById('systemStatus').textContent = '重连中...';
+    };
+
+    // 统计信息变化慢，仍每30秒查询一次
+    setInterval(fetchStatistics, 30000);
+}
+
 /**
  * 开始数据轮询
  */
@@ -146,7 +177,7 @@ async function fetchCurrentData() {
  */
 async function fetchHistoryData() {
     try {
-        const response = await fetch(`${API_BASE}/history?hours=1&limit=50`);
+        const response = await fetch(`${API_BASE}/history?hours=1&limit=${CHART_POINTS}`);
         const result = await response.json();
         
         if (result.success && result.data.length > 0) {
@@ -276,6 +307,24 @@ function updateChart(data) {
     trendChart.update();
 }
 
+/**
+ * 向趋势图追加一个点，超过 CHART_POINTS 时移除最旧的点
+ */
+function appendChartPoint(d) {
+    const time = new Date(d.timestamp);
+    trendChart.data.labels.push(time.toLocaleTimeString('zh-CN', { hour12: false }));
+    trendChart.data.datasets[0].data.push(d.pm25);
+    trendChart.data.datasets[1].data.push(d.co);
+    trendChart.data.datasets[2].data.push(d.co2);
+
+    if (trendChart.data.labels.length > CHART_POINTS) {
+        trendChart.data.labels.shift();
+        trendChart.data.datasets.forEach(dataset => dataset.data.shift());
+    }
+
+    trendChart.update('none');
+}
+
 /**
  * 更新统计信息
  */
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史原始数据的列式归档（Parquet / Arrow IPC）
+功能：把已封存（整个时间段已经结束）的每天/每周原始数据从 SQLite 流式导出为压缩的列式文件，每个时间段一个文件；
+多个月的分析直接按列读取归档文件（pyarrow、pandas、DuckDB 等），不经过在线数据库，也不受 /api/history 的 limit 限制
+
+需要 pyarrow（可选依赖，未安装时归档不可用，其余功能不受影响）。
+导出时逐批从游标读取、逐批写入，内存占用与时间段内的行数无关；文件先写入临时文件，完成后原子改名，
+读取方不会看到写了一半的文件。时间段按 UTC 对齐，与分区存储相同。
+
+已归档的时间段之后又补录了数据（如 /batch 补传的旧读数）时，数据源提供的水位（如各表的最大 id）会标出这些新行，
+下一轮把它们与原文件合并后重写该文件；每个文件写入时的水位记录在归档目录的目录文件（<name>_catalog.json）中。
+
+命令行：
+  python archive.py list <归档目录>
+  python archive.py export <归档目录> --start 2024-01-01 --end 2024-03-31 --device kitchen_01 --out q1.parquet
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from partitions import PERIODS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖
+    pa = None
+
+# 归档格式 -> 文件扩展名
+FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+# 下载归档文件时的 MIME 类型
+MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+
+def available():
+    """是否安装了 pyarrow"""
+    return pa is not None
+
+
+def _arrow_type(name):
+    """schema 中的类型名 -> pyarrow 类型；timestamp 为毫秒整数，写为 UTC 毫秒时间戳"""
+    return {
+        'float64': pa.float64(),
+        'int64': pa.int64(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('ms', tz='UTC'),
+    }[name]
+
+
+def format_of(path):
+    """按扩展名判断归档格式，不认识时返回 None"""
+    for fmt, ext in FORMATS.items():
+        if path.endswith(ext):
+            return fmt
+    return None
+
+
+def open_writer(path, schema, compression='zstd', fmt=None):
+    """打开 Parquet 或 Arrow IPC 文件写入器（均有 write_table / close），fmt 为 None 时按扩展名判断"""
+    fmt = fmt or format_of(path)
+    if fmt == 'parquet':
+        return pq.ParquetWriter(path, schema, compression=compression)
+    if fmt == 'arrow':
+        return ipc.new_file(path, schema, options=ipc.IpcWriteOptions(compression=compression))
+    raise ValueError(f'Unknown archive format: {path}, expected one of {", ".join(FORMATS.values())}')
+
+
+def iter_file_batches(path, columns=None):
+    """逐批读取一个归档文件（RecordBatch），不一次载入整个文件"""
+    if format_of(path) == 'parquet':
+        yield from pq.ParquetFile(path).iter_batches(columns=columns)
+        return
+    with pa.memory_map(path) as source:
+        reader = ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            yield batch.select(columns) if columns else batch
+
+
+def count_rows(path):
+    """归档文件的行数（只读文件尾的元数据）"""
+    if format_of(path) == 'parquet':
+        return pq.ParquetFile(path).metadata.num_rows
+    with pa.memory_map(path) as source:
+        reader = ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+class ColumnArchive:
+    """按时间段把原始数据归档为列式文件"""
+
+    def __init__(self, directory, name, schema, source, first_ms, fmt='parquet', period='day',
+                 compression='zstd', seal_delay=600, interval=3600, batch_rows=50000, changes=None):
+        """初始化（不创建目录，见 run_once）
+
+        Args:
+            directory: 归档文件所在目录
+            name: 文件名前缀，文件名如 kitchen_sensor_data_20240131.parquet
+            schema: [(列名, 类型)]，类型为 float64 / int64 / string / timestamp（毫秒整数），第一列为时间
+            source: source(start_ms, end_ms, batch_rows, after=None, until=None) 返回可迭代对象，按时间升序逐批产出
+                    [start_ms, end_ms) 内的元组列表，列顺序与 schema 一致；after、until 为 changes 返回的水位，
+                    只产出 after 之后、until 及之前写入的行（为 None 时不限）
+            first_ms: 无参可调用对象，返回最早一条数据的毫秒时间，没有数据时返回 None
+            fmt: 'parquet' 或 'arrow'
+            period: 'day' 或 'week'
+            compression: 压缩算法（zstd、lz4、snappy 等，Arrow IPC 只支持 zstd 和 lz4）
+            seal_delay: 时间段结束后再等待的秒数才视为封存（等写后缓冲把该时间段的数据落库）
+            interval: 后台线程两轮之间的间隔，秒
+            batch_rows: 每批读取、写入的行数
+            changes: 可选，changes(after, before_ms, period_ms) 返回 (当前水位, [时间段起点])：
+                     after 之后写入、时间早于 before_ms 的行落在哪些时间段（after 为 None 时只返回当前水位）；
+                     水位须可 JSON 序列化。不提供时已归档的时间段不再重写
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f'Unknown archive format: {fmt}, expected one of {", ".join(FORMATS)}')
+        if period not in PERIODS:
+            raise ValueError(f'Unknown archive period: {period}, expected one of {", ".join(PERIODS)}')
+        self.directory = directory
+        self.name = name
+        self.columns = list(schema)
+        self.source = source
+        self.first_ms = first_ms
+        self.fmt = fmt
+        self.period = period
+        self.period_ms = PERIODS[period]
+        self.compression = compression
+        self.seal_delay = seal_delay
+        self.interval = interval
+        self.batch_rows = batch_rows
+        self.changes = changes
+        self._pattern = re.compile(rf'^{re.escape(name)}_(\d{{8}}){re.escape(FORMATS[fmt])}$')
+
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._row_counts = {}        # 文件名 -> (mtime, 行数)
+        self._catalog = None         # {'checked': 已检查过补录的水位, 'files': {文件名: 写入时的水位}}
+
+        self.runs = 0
+        self.archived_files = 0
+        self.archived_rows = 0
+        self.rewritten_files = 0
+        self.archived_until = None   # 此前的所有已封存时间段均已归档（毫秒）
+        self.last_run = None
+        self.last_report = None
+        self.last_error = None
+
+    def schema(self):
+        return pa.schema([(name, _arrow_type(kind)) for name, kind in self.columns])
+
+    def file_name(self, start_ms):
+        day = datetime.fromtimestamp(start_ms / 1000, timezone.utc).strftime('%Y%m%d')
+        return f'{self.name}_{day}{FORMATS[self.fmt]}'
+
+    def path(self, start_ms):
+        return os.path.join(self.directory, self.file_name(start_ms))
+
+    def has_file(self, name):
+        """name 是否为本归档中已存在的文件（下载前校验文件名，不接受路径）"""
+        return bool(self._pattern.match(name)) and os.path.isfile(os.path.join(self.directory, name))
+
+    def sealed_before(self, now_ms=None):
+        """已封存时间段的上界：此时间之前开始的时间段都已结束并超过 seal_delay"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        return ((now_ms - self.seal_delay * 1000) // self.period_ms) * self.period_ms
+
+    def catalog_path(self):
+        return os.path.join(self.directory, f'{self.name}_catalog.json')
+
+    def _load_catalog(self):
+        if self._catalog is None:
+            try:
+                with open(self.catalog_path(), encoding='utf-8') as f:
+                    self._catalog = json.load(f)
+            except FileNotFoundError:
+                self._catalog = {'checked': None, 'files': {}}
+        return self._catalog
+
+    def _save_catalog(self):
+        """原子写入目录文件"""
+        path = self.catalog_path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self._catalog, f)
+        os.replace(path + '.tmp', path)
+
+    def _write_tables(self, start_ms, tables):
+        """把逐个产出的 Table 写入时间段的归档文件，返回写入的行数（没有数据时不生成、不改动文件）"""
+        path = self.path(start_ms)
+        tmp = path + '.tmp'
+        writer = None
+        rows = 0
+        try:
+            for table in tables:
+                if writer is None:
+                    writer = open_writer(tmp, table.schema, self.compression, self.fmt)
+                writer.write_table(table)
+                rows += table.num_rows
+            if writer is not None:
+                writer.close()
+                writer = None
+                os.replace(tmp, path)
+        finally:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return rows
+
+    def _tables(self, start_ms, after=None, until=None):
+        """逐批把数据源中时间段内（after 之后、until 及之前写入）的行转换为 Table"""
+        schema = self.schema()
+        for batch in self.source(start_ms, start_ms + self.period_ms, self.batch_rows, after=after, until=until):
+            if batch:
+                arrays = [pa.array(column, type=field.type) for column, field in zip(zip(*batch), schema)]
+                yield pa.Table.from_arrays(arrays, schema=schema)
+
+    def _write(self, start_ms, until=None):
+        """把一个时间段写入归档文件，返回写入的行数（没有数据时不生成文件）"""
+        return self._write_tables(start_ms, self._tables(start_ms, until=until))
+
+    def _merge(self, start_ms, after, until):
+        """把时间段内 after 之后补录的行与已有的归档文件合并后重写（按时间排序），返回新增的行数
+
+        原文件是已归档数据的依据（数据库中的旧行可能已被数据保留删除），只从数据源读取新行；
+        合并需要把该时间段的数据整体读入内存。
+        """
+        added = list(self._tables(start_ms, after=after, until=until))
+        if not added:
+            return 0
+        existing = pa.Table.from_batches(list(iter_file_batches(self.path(start_ms))), schema=self.schema())
+        merged = pa.concat_tables([existing] + added).sort_by(self.columns[0][0])
+        self._write_tables(start_ms, [merged])
+        return merged.num_rows - existing.num_rows
+
+    def pending(self, before_ms):
+        """最近一轮之后是否又有早于 before_ms 的数据写入（补录了已归档或待归档的时间段），
+        未运行过或不跟踪补录时返回 None"""
+        if self.changes is None:
+            return None
+        with self._lock:
+            checked = self._catalog['checked'] if self._catalog else None
+        if checked is None:
+            return None
+        return bool(self.changes(checked, before_ms, self.period_ms)[1])
+
+    def run_once(self, now_ms=None):
+        """归档所有尚未归档的已封存时间段（从最早的数据开始），合并已归档时间段中补录的数据，返回本轮报告"""
+        with self._run_lock:
+            began = time.perf_counter()
+            report = {'files': [], 'rows': 0, 'bytes': 0, 'rewritten': []}
+            try:
+                if pa is None:
+                    raise RuntimeError('pyarrow is not installed')
+                os.makedirs(self.directory, exist_ok=True)
+                sealed = self.sealed_before(now_ms)
+                catalog = self._load_catalog()
+                until, changed = None, set()
+                if self.changes is not None:
+                    until, changed = self.changes(catalog['checked'], sealed, self.period_ms)
+                    changed = set(changed)
+                first = self.first_ms()
+                start = sealed if first is None else min((first // self.period_ms) * self.period_ms, sealed)
+                with self._lock:
+                    self.archived_until = start
+                while start < sealed and not self._stop_event.is_set():
+                    name = self.file_name(start)
+                    if not os.path.exists(self.path(start)):
+                        rows = self._write(start, until)
+                        if rows:
+                            report['files'].append(name)
+                            report['rows'] += rows
+                            report['bytes'] += os.path.getsize(self.path(start))
+                            catalog['files'][name] = until
+                            self._save_catalog()
+                    elif self.changes is not None and name not in catalog['files']:
+                        # 开始跟踪补录之前写入的文件：以当前水位为起点
+                        catalog['files'][name] = until
+                        self._save_catalog()
+                    elif start in changed:
+                        rows = self._merge(start, catalog['files'][name], until)
+                        catalog['files'][name] = until
+                        self._save_catalog()
+                        if rows:
+                            report['rewritten'].append(name)
+                            report['rows'] += rows
+                    start += self.period_ms
+                    with self._lock:
+                        self.archived_until = start
+                if self.changes is not None and not self._stop_event.is_set():
+                    with self._lock:
+                        catalog['checked'] = until
+                    self._save_catalog()
+                error = None
+            except Exception as e:
+                error = str(e)
+                report['error'] = error
+            report['seconds'] = round(time.perf_counter() - began, 3)
+
+            with self._lock:
+                self.runs += 1
+                self.archived_files += len(report['files'])
+                self.rewritten_files += len(report['rewritten'])
+                self.archived_rows += report['rows']
+                self.last_run = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                self.last_report = report
+                if error:
+                    self.last_error = error
+            return report
+
+    def files(self, start_ms=None, end_ms=None):
+        """与 [start_ms, end_ms] 重叠的归档文件（按时间升序）：文件名、时间范围、行数、字节数"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+
+        result = []
+        for name in names:
+            match = self._pattern.match(name)
+            if not match:
+                continue
+            start = int(datetime.strptime(match.group(1), '%Y%m%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+            end = start + self.period_ms
+            if (start_ms is not None and end <= start_ms) or (end_ms is not None and start > end_ms):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+                with self._lock:
+                    cached = self._row_counts.get(name)
+                if cached is None or cached[0] != stat.st_mtime:
+                    cached = (stat.st_mtime, count_rows(path))
+                    with self._lock:
+                        self._row_counts[name] = cached
+            except (OSError, pa.ArrowInvalid):
+                continue
+            result.append({
+                'file': name,
+                'start_ms': start,
+                'end_ms': end,
+                'rows': cached[1],
+                'bytes': stat.st_size
+            })
+        return result
+
+    def _run(self, initial_delay):
+        if self._stop_event.wait(initial_delay):
+            return
+        while not self._stop_event.is_set():
+            report = self.run_once()
+            if report['files'] or report['rewritten'] or report.get('error'):
+                print(f"列式归档: 新增 {len(report['files'])} 个文件，重写 {len(report['rewritten'])} 个文件，"
+                      f"{report['rows']} 条，{report['bytes']} 字节"
+                      + (f"，错误: {report['error']}" if report.get('error') else ''))
+            self._stop_event.wait(self.interval)
+
+    def start(self, initial_delay=30):
+        """启动后台线程（首轮在 initial_delay 秒后执行）"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(initial_delay,), name=f'archive-{self.name}',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程（正在写的文件会写完当前时间段）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def stats(self):
+        """归档配置、文件数、累计归档行数"""
+        files = self.files() if pa is not None else []
+        with self._lock:
+            return {
+                'format': self.fmt,
+                'period': self.period,
+                'directory': self.directory,
+                'available': pa is not None,
+                'files': len(files),
+                'rows': sum(f['rows'] for f in files),
+                'bytes': sum(f['bytes'] for f in files),
+                'archived_until': self.archived_until,
+                'runs': self.runs,
+                'archived_files': self.archived_files,
+                'rewritten_files': self.rewritten_files,
+                'archived_rows': self.archived_rows,
+                'last_run': self.last_run,
+                'last_report': self.last_report,
+                'last_error': self.last_error
+            }
+
+
+def export_files(paths, out, start_ms=None, end_ms=None, device_id=None, columns=None,
+                 time_column='ts', compression='zstd'):
+    """把多个归档文件按时间范围、设备过滤后合并写入一个文件（格式由 out 的扩展名决定），返回写入的行数
+
+    逐批读取、过滤、写入，内存占用与总行数无关。
+    """
+    writer = None
+    rows = 0
+    try:
+        for path in paths:
+            for batch in iter_file_batches(path, columns):
+                mask = None
+                for condition in (
+                    pc.greater_equal(batch[time_column], pa.scalar(start_ms, pa.timestamp('ms', tz='UTC')))
+                    if start_ms is not None else None,
+                    pc.less_equal(batch[time_column], pa.scalar(end_ms, pa.timestamp('ms', tz='UTC')))
+                    if end_ms is not None else None,
+                    pc.equal(batch['device_id'], device_id) if device_id else None,
+                ):
+                    if condition is not None:
+                        mask = condition if mask is None else pc.and_(mask, condition)
+                if mask is not None:
+                    batch = batch.filter(mask)
+                if writer is None:
+                    writer = open_writer(out, batch.schema, compression)
+                writer.write_table(pa.Table.from_batches([batch]))
+                rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def parse_day_ms(value, end=False):
+    """日期（YYYY-MM-DD，UTC）-> 毫秒；end=True 时取当天最后一毫秒，格式错误时抛出 ValueError"""
+    ms = int(datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return ms + 86400000 - 1 if end else ms
+
+
+def main():
+    """命令行：列出归档文件，或把一段时间的归档合并导出为一个文件"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='历史数据列式归档')
+    parser.add_argument('command', choices=['list', 'export'])
+    parser.add_argument('directory', help='归档目录')
+    parser.add_argument('--name', default='kitchen_sensor_data', help='归档文件名前缀')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD（UTC，含）')
+    parser.add_argument('--end', help='结束日期 YYYY-MM-DD（UTC，含）')
+    parser.add_argument('--device', help='只导出该设备')
+    parser.add_argument('--columns', help='只导出这些列，逗号分隔（需包含 ts 和 device_id 以便过滤）')
+    parser.add_argument('--out', help='导出文件（.parquet 或 .arrow）')
+    args = parser.parse_args()
+
+    if pa is None:
+        print("需要 pyarrow：pip install pyarrow")
+        raise SystemExit(1)
+
+    start_ms = parse_day_ms(args.start) if args.start else None
+    end_ms = parse_day_ms(args.end, end=True) if args.end else None
+    listed = []
+    for fmt in FORMATS:
+        archive = ColumnArchive(args.directory, args.name, [], None, None, fmt=fmt)
+        listed.extend(archive.files(start_ms, end_ms))
+    listed.sort(key=lambda f: f['start_ms'])
+
+    if args.command == 'list':
+        for f in listed:
+            day = datetime.fromtimestamp(f['start_ms'] / 1000, timezone.utc).strftime('%Y-%m-%d')
+            print(f"{f['file']:<44}{day:>12}{f['rows']:>12}{f['bytes']:>14}")
+        print(f"共 {len(listed)} 个文件，{sum(f['rows'] for f in listed)} 条，{sum(f['bytes'] for f in listed)} 字节")
+        return
+
+    if not args.out or format_of(args.out) is None:
+        print("请用 --out 指定 .parquet 或 .arrow 文件")
+        raise SystemExit(1)
+    columns = args.columns.split(',') if args.columns else None
+    began = time.perf_counter()
+    rows = export_files([os.path.join(args.directory, f['file']) for f in listed], args.out,
+                        start_ms, end_ms, args.device, columns)
+    print(f"已导出 {rows} 条到 {args.out}（{len(listed)} 个归档文件，{time.perf_counter() - began:.2f} 秒）")
+
+
+if __name__ == '__main__':
+    main()
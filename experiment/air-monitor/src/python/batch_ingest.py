@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量数据上报解析 - /api/sensor-data/batch 公用逻辑
+支持两种请求体：
+  1. JSON数组：[{...}, {...}]
+  2. NDJSON（每行一个JSON对象），Content-Type 为 application/x-ndjson，逐行流式读取
+"""
+
+import math
+
+import json_codec
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+MAX_BATCH_ROWS = 10000  # 单次请求最多接受的行数
+
+
+# SQLite INTEGER 的取值范围，超出时绑定参数会失败
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class BatchTooLarge(ValueError):
+    """批量请求超过 MAX_BATCH_ROWS 行"""
+
+
+class ReadingSchema:
+    """一条读数的字段与类型：单条上报、批量上报共用，写入数据库和内存状态之前统一校验和转换"""
+
+    def __init__(self, required_fields, numeric_fields=(), integer_fields=(), text_fields=()):
+        """初始化
+
+        Args:
+            required_fields: 必须包含的字段
+            numeric_fields: 数值字段（接受数字或数字字符串，转换为有限的 float）
+            integer_fields: 整数字段（接受整数、整数值的浮点数或数字字符串，转换为 int64 范围内的 int）
+            text_fields: 字符串字段（只接受字符串）
+        """
+        self.required_fields = list(required_fields)
+        self.numeric_fields = list(numeric_fields)
+        self.integer_fields = list(integer_fields)
+        self.text_fields = list(text_fields)
+
+    @staticmethod
+    def _to_number(field, value):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f'Field {field} must be a number')
+        try:
+            number = float(value)
+        except (ValueError, OverflowError):
+            raise ValueError(f'Field {field} must be a number') from None
+        if not math.isfinite(number):
+            raise ValueError(f'Field {field} must be a finite number')
+        return number
+
+    def normalize(self, obj):
+        """校验一条读数，返回类型转换后的新字典（其余字段原样保留），不合法时抛出 ValueError"""
+        if not isinstance(obj, dict):
+            raise ValueError('Row must be a JSON object')
+        missing = [field for field in self.required_fields if field not in obj]
+        if missing:
+            raise ValueError(f'Missing field: {", ".join(missing)}')
+
+        data = dict(obj)
+        for field in self.numeric_fields:
+            if field in data:
+                data[field] = self._to_number(field, data[field])
+        for field in self.integer_fields:
+            if field in data:
+                value = data[field]
+                if not isinstance(value, int) or isinstance(value, bool):
+                    number = self._to_number(field, value)
+                    if not number.is_integer():
+                        raise ValueError(f'Field {field} must be an integer')
+                    value = int(number)
+                if not INT64_MIN <= value <= INT64_MAX:
+                    raise ValueError(f'Field {field} is out of range')
+                data[field] = value
+        for field in self.text_fields:
+            if field in data and not isinstance(data[field], str):
+                raise ValueError(f'Field {field} must be a string')
+        return data
+
+
+def is_ndjson(content_type):
+    """根据Content-Type判断是否为NDJSON"""
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    return mimetype in NDJSON_TYPES
+
+
+def iter_ndjson(stream):
+    """逐行读取NDJSON，返回 (对象或None, 错误信息或None)，空行跳过"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json_codec.loads(line), None
+        except ValueError as e:
+            yield None, f'Invalid JSON: {e}'
+
+
+def read_batch(flask_request, max_rows=MAX_BATCH_ROWS):
+    """读取批量请求体，返回 [(对象或None, 解析错误或None), ...]
+
+    JSON数组整体解析失败时抛出 ValueError；超过 max_rows 行时抛出 BatchTooLarge。
+    """
+    if is_ndjson(flask_request.content_type):
+        items = []
+        for item in iter_ndjson(flask_request.stream):
+            items.append(item)
+            if len(items) > max_rows:
+                raise BatchTooLarge(f'Batch exceeds {max_rows} rows')
+        return items
+
+    payload = flask_request.get_json(silent=True)
+    if not isinstance(payload, list):
+        raise ValueError('Body must be a JSON array or NDJSON')
+    if len(payload) > max_rows:
+        raise BatchTooLarge(f'Batch exceeds {max_rows} rows')
+    return [(obj, None) for obj in payload]
+
+
+def validate_batch(items, schema):
+    """一次遍历校验所有行（字段是否齐全、类型是否正确，见 ReadingSchema）
+
+    Returns:
+        (valid, errors)：valid 为通过校验并转换类型后的对象列表（保持原顺序），
+        errors 为 [{'index': 行号, 'error': 原因}, ...]
+    """
+    valid = []
+    errors = []
+    for index, (obj, parse_error) in enumerate(items):
+        if parse_error:
+            errors.append({'index': index, 'error': parse_error})
+            continue
+        try:
+            valid.append(schema.normalize(obj))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return valid, errors
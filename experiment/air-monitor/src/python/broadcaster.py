@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Server-Sent Events 一对多推送
+功能：入库路径每次更新只序列化一次，放入每个订阅者的有界队列，由各自的 /api/stream 响应逐条发出；
+某个客户端消费太慢、队列已满时直接断开它（浏览器 EventSource 会自动重连并重新拿到最新快照），
+不会阻塞入库线程，也不会无限占用内存
+Broadcaster 供线程模型的 Flask 服务器使用，AsyncBroadcaster 供 asyncio（ASGI）服务器使用
+"""
+
+import asyncio
+import queue
+import threading
+
+import json_codec
+
+
+def format_event(event, data, encoded=None):
+    """序列化为一条 SSE 消息，encoded 为已编码好的单行 JSON 时直接使用"""
+    payload = encoded if encoded is not None else json_codec.dumps(data)
+    return f'event: {event}\ndata: {payload}\n\n'
+
+
+class Subscriber:
+    """一个 SSE 客户端"""
+
+    __slots__ = ('queue', 'device_id', 'dropped')
+
+    def __init__(self, max_queue, device_id=None):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.device_id = device_id  # None 表示接收所有设备
+        self.dropped = False
+
+
+class Broadcaster:
+    """把消息分发给所有订阅者"""
+
+    def __init__(self, max_queue=256, keepalive_seconds=15, retry_ms=3000):
+        """初始化
+
+        Args:
+            max_queue: 每个客户端最多积压的消息数，超过即视为慢消费者并断开
+            keepalive_seconds: 空闲时发送注释行的间隔，用于保活和发现已断开的连接
+            retry_ms: 通知浏览器断线后的重连间隔
+        """
+        self.max_queue = max_queue
+        self.keepalive_seconds = keepalive_seconds
+        self.retry_ms = retry_ms
+        self._lock = threading.Lock()
+        self._subscribers = frozenset()  # 写时复制，publish 遍历时无需加锁
+        self.published = 0
+        self.dropped_clients = 0
+
+    @property
+    def subscriber_count(self):
+        """当前连接的客户端数"""
+        return len(self._subscribers)
+
+    def subscribe(self, device_id=None):
+        """注册一个订阅者"""
+        subscriber = Subscriber(self.max_queue, device_id)
+        with self._lock:
+            self._subscribers = self._subscribers | {subscriber}
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """注销订阅者（可重复调用）"""
+        with self._lock:
+            self._subscribers = self._subscribers - {subscriber}
+
+    def publish(self, event, data, device_id=None, encoded=None):
+        """广播一条消息，返回投递成功的客户端数；没有客户端时不做序列化
+
+        Args:
+            encoded: 可选，data 已编码好的单行 JSON（如 Snapshot.text），避免重复序列化
+        """
+        subscribers = self._subscribers
+        if not subscribers:
+            return 0
+
+        message = format_event(event, data, encoded)
+        delivered = 0
+        for subscriber in subscribers:
+            if subscriber.device_id is not None and subscriber.device_id != device_id:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+                delivered += 1
+            except queue.Full:
+                # 慢消费者：断开，由客户端重连后从最新快照继续
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                self.dropped_clients += 1
+        self.published += 1
+        return delivered
+
+    def stream(self, device_id=None, snapshot=None):
+        """SSE 响应体生成器
+
+        Args:
+            device_id: 只接收该设备的消息
+            snapshot: 可选回调，返回 [(event, data), ...]，订阅后立即发送（如当前最新数据）
+        """
+        subscriber = self.subscribe(device_id)
+        try:
+            yield f'retry: {self.retry_ms}\n\n'
+            if snapshot:
+                for event, data in snapshot():
+                    yield format_event(event, data)
+
+            while not subscriber.dropped:
+                try:
+                    message = subscriber.queue.get(timeout=self.keepalive_seconds)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+
+class AsyncSubscriber:
+    """asyncio 版SSE客户端，只在事件循环线程中访问"""
+
+    __slots__ = ('queue', 'device_id', 'dropped')
+
+    def __init__(self, max_queue, device_id=None):
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.device_id = device_id
+        self.dropped = False
+
+
+class AsyncBroadcaster:
+    """事件循环内的一对多推送，语义与 Broadcaster 相同（有界队列、慢消费者断开）
+
+    每个客户端只占一个协程和一个 asyncio.Queue，不占用线程，适合成千上万个空闲的长连接。
+    publish_threadsafe 可从任意线程（如 LiveState 写锁内）调用，实际分发在事件循环中进行。
+    """
+
+    def __init__(self, max_queue=256, keepalive_seconds=15, retry_ms=3000):
+        self.max_queue = max_queue
+        self.keepalive_seconds = keepalive_seconds
+        self.retry_ms = retry_ms
+        self.loop = None
+        self._subscribers = set()
+        self.published = 0
+        self.dropped_clients = 0
+
+    @property
+    def subscriber_count(self):
+        """当前连接的客户端数"""
+        return len(self._subscribers)
+
+    def bind(self, loop):
+        """绑定事件循环（服务器启动时调用）"""
+        self.loop = loop
+
+    def publish_threadsafe(self, event, data, device_id=None, encoded=None):
+        """从任意线程投递一条消息；尚未绑定事件循环或没有客户端时直接忽略"""
+        loop = self.loop
+        if loop is None or not self._subscribers:
+            return
+        loop.call_soon_threadsafe(self.publish, event, data, device_id, encoded)
+
+    def publish(self, event, data, device_id=None, encoded=None):
+        """在事件循环中广播一条消息，返回投递成功的客户端数"""
+        if not self._subscribers:
+            return 0
+
+        message = format_event(event, data, encoded).encode('utf-8')
+        delivered = 0
+        for subscriber in list(self._subscribers):
+            if subscriber.device_id is not None and subscriber.device_id != device_id:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+                delivered += 1
+            except asyncio.QueueFull:
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+                self.dropped_clients += 1
+        self.published += 1
+        return delivered
+
+    async def stream(self, send, device_id=None, snapshot=None):
+        """按ASGI协议逐条发送SSE消息，直到客户端被判定为慢消费者（断开由调用方取消本协程）
+
+        Args:
+            send: ASGI send 可调用对象（响应头已由调用方发出）
+            device_id: 只接收该设备的消息
+            snapshot: 可选回调，返回 [(event, data), ...]，订阅后立即发送
+        """
+        subscriber = AsyncSubscriber(self.max_queue, device_id)
+        self._subscribers.add(subscriber)
+        try:
+            await send({'type': 'http.response.body', 'body': f'retry: {self.retry_ms}\n\n'.encode(), 'more_body': True})
+            if snapshot:
+                for event, data in snapshot():
+                    await send({'type': 'http.response.body', 'body': format_event(event, data).encode('utf-8'), 'more_body': True})
+
+            while not subscriber.dropped:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), self.keepalive_seconds)
+                except asyncio.TimeoutError:
+                    message = b': keepalive\n\n'
+                await send({'type': 'http.response.body', 'body': message, 'more_body': True})
+        finally:
+            self._subscribers.discard(subscriber)
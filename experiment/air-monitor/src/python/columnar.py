@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史数据的列式输出
+功能：format=columnar 时返回 {length: n, ts: [...], 指标: [...]}，字段名只出现一次；
+format=binary 时返回小端二进制：时间列 float64 + 每个指标一列 float32，前端可直接用 TypedArray 读取
+
+二进制布局：
+  uint32 头长度 L | JSON 头（UTF-8，用空格补齐到 8 字节边界） | ts float64 × n | 指标1 float32 × n | 指标2 ...
+  JSON 头：{"length": n, "columns": [["ts", "float64"], ["temperature", "float32"], ...]}
+  缺失值为 NaN
+"""
+
+import json
+import math
+import struct
+import sys
+from array import array
+
+FORMATS = ('rows', 'columnar', 'binary')
+
+
+def rows_to_columns(rows, names):
+    """把元组列表转置为 {列名: 列表}"""
+    if not rows:
+        return {name: [] for name in names}
+    return {name: list(column) for name, column in zip(names, zip(*rows))}
+
+
+def records_to_columns(records, names):
+    """把字典列表转置为 {列名: 列表}"""
+    return {name: [record.get(name) for record in records] for name in names}
+
+
+def _to_float(value):
+    """None 或非数值转为 NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def encode_binary(ts, fields):
+    """编码为二进制格式
+
+    Args:
+        ts: 毫秒时间戳列表
+        fields: [(列名, 值列表), ...]，编码为 float32
+    """
+    count = len(ts)
+    header = {'length': count, 'columns': [['ts', 'float64']] + [[name, 'float32'] for name, _ in fields]}
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(4 + len(header_bytes)) % 8)
+
+    parts = [struct.pack('<I', len(header_bytes)), header_bytes]
+    columns = [array('d', (_to_float(v) for v in ts))]
+    columns += [array('f', (_to_float(v) for v in values)) for _, values in fields]
+    for column in columns:
+        if sys.byteorder == 'big':
+            column.byteswap()
+        parts.append(column.tobytes())
+    return b''.join(parts)
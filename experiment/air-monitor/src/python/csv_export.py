@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原始数据的流式 CSV 导出
+功能：每行在 SQL 中直接拼接为 CSV 文本（数值由 SQLite 转为文本，每行只产生一个 Python 字符串），
+从游标逐批取出后连接成片段立即发出；整个结果集从不驻留在内存中，导出几千万行时内存占用也保持不变。
+/api/export.csv 和命令行共用
+
+命令行（在服务器的工作目录中运行，数据库路径与服务器相同）：
+  python csv_export.py kitchen --start 2024-01-01 --end 2024-01-31 --device kitchen_01 --out jan.csv
+  python csv_export.py dht11 --columns created_at,temperature,humidity | gzip > dht11.csv.gz
+"""
+
+import sys
+import time
+from datetime import datetime, time as day_time, timezone
+
+# 每次从游标取出的行数（每行只是一个字符串，批次比 JSON 流式输出大，减少 Python 层的往返）
+EXPORT_FETCH_SIZE = 5000
+
+
+def parse_columns(value, available, default):
+    """columns 参数（逗号分隔）-> 列名列表；未指定时返回 default，含未知列时抛出 ValueError"""
+    if not value:
+        return list(default)
+    columns = [c.strip() for c in value.split(',') if c.strip()]
+    unknown = [c for c in columns if c not in available]
+    if unknown or not columns:
+        raise ValueError(f'Unknown columns: {", ".join(unknown) or value}, expected any of {", ".join(available)}')
+    return columns
+
+
+def parse_time(value, end=False):
+    """时间参数 -> UTC datetime；未指定时返回 None，格式错误时抛出 ValueError
+
+    接受 YYYY-MM-DD（UTC 日期，end=True 时取当天最后一刻，使结束日期包含在内）
+    或 ISO 8601 时间（不带时区时按 UTC）。
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if len(value) == 10:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+            return datetime.combine(day, day_time.max if end else day_time.min, timezone.utc)
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid time: {value}, expected YYYY-MM-DD or ISO 8601') from None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def csv_line_sql(expressions, quoted=()):
+    """把一行拼接为 CSV 文本的 SQL 表达式
+
+    Args:
+        expressions: 各列的查询表达式
+        quoted: 其中可能含逗号、引号或换行的文本列（如设备上报的 device_id），需要时按 RFC 4180 加引号；
+                其余列（数值、固定格式的时间）直接转为文本
+    NULL 输出为空字段；REAL 由 SQLite 转为最多 15 位有效数字的文本。
+    """
+    fields = []
+    for e in expressions:
+        if e in quoted:
+            fields.append(f"""CASE WHEN {e} GLOB '*[",' || char(10) || char(13) || ']*' """
+                          f"""THEN '"' || replace({e}, '"', '""') || '"' ELSE ifnull({e}, '') END""")
+        else:
+            fields.append(f"ifnull({e}, '')")
+    return " || ',' || ".join(fields)
+
+
+def iter_csv(header, batches):
+    """表头 + 逐批产生的行（csv_line_sql 查询出的单列元组）-> CSV 的 UTF-8 bytes 片段
+
+    每批一个片段，RFC 4180 的 \\r\\n 换行。
+    """
+    yield (','.join(header) + '\r\n').encode('utf-8')
+    for rows in batches:
+        if rows:
+            yield ('\r\n'.join([row[0] for row in rows]) + '\r\n').encode('utf-8')
+
+
+def main():
+    """命令行：把服务器数据库中的原始数据导出为 CSV 文件或标准输出"""
+    import argparse
+    import contextlib
+    import importlib
+
+    parser = argparse.ArgumentParser(description='流式导出原始数据为 CSV')
+    parser.add_argument('server', choices=['kitchen', 'dht11'], help='厨房版（kitchen_web_server）或 DHT11 版')
+    parser.add_argument('--start', help='开始时间，YYYY-MM-DD 或 ISO 8601（UTC，含）')
+    parser.add_argument('--end', help='结束时间，YYYY-MM-DD 或 ISO 8601（UTC，含）')
+    parser.add_argument('--device', help='只导出该设备')
+    parser.add_argument('--columns', help='导出的列，逗号分隔（默认同 /api/export.csv）')
+    parser.add_argument('--out', default='-', help='输出文件，- 为标准输出（默认）')
+    args = parser.parse_args()
+
+    # 服务器模块的初始化输出转到 stderr，标准输出只有 CSV
+    with contextlib.redirect_stdout(sys.stderr):
+        server = importlib.import_module('kitchen_web_server' if args.server == 'kitchen' else 'sensor_web_server')
+        server.init_database()
+
+    try:
+        columns = parse_columns(args.columns, server.EXPORT_COLUMNS, server.EXPORT_DEFAULT_COLUMNS)
+        start_time_utc = parse_time(args.start)
+        end_time_utc = parse_time(args.end, end=True)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        raise SystemExit(2)
+
+    rows = 0
+
+    def counted(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    began = time.perf_counter()
+    written = 0
+    out = sys.stdout.buffer if args.out == '-' else open(args.out, 'wb')
+    try:
+        for chunk in iter_csv(columns, counted(server.iter_export_lines(columns, start_time_utc, end_time_utc,
+                                                                       args.device))):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    elapsed = time.perf_counter() - began
+    print(f"已导出 {rows} 行，{written / 1e6:.1f} MB，用时 {elapsed:.2f} 秒（{rows / max(elapsed, 1e-9):.0f} 行/秒）",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
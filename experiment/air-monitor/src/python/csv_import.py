@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+空气质量 CSV 批量导入（data/sample_data.csv 格式）
+功能：把 timestamp,pm25,pm10,co,co2,temperature,humidity,activity,level 格式的历史读数
+（后端 app.py 的记录结构）分块读取、按列转换与校验，用同一条预编译的 INSERT 语句 executemany，
+每块一个大事务写入 SQLite 表 air_quality_data，报告每秒导入行数
+
+  - 表头必须包含全部列（顺序不限，多余的列忽略）
+  - 每块先按列整体转换（map(float, 列) 在 C 层循环）；某块转换失败时退回逐行转换，
+    只拒绝有问题的行并记录行号，其余行照常导入
+  - 数值字段为空时存为 NULL；NaN、Infinity 视为无效
+  - timestamp 为不带时区的本地时间（与 app.py 的 datetime.now().isoformat() 一致，默认北京时间），
+    也接受带时区的 ISO 8601；统一存为 UTC 毫秒 ts_ms
+  - 以 (source, ts_ms) 去重（INSERT OR IGNORE），重复导入同一批文件不会产生重复数据；
+    source 默认为文件名（不含扩展名），不同设备的文件即使时间相同也不会互相覆盖
+
+命令行：
+  python csv_import.py ../../data/sample_data.csv
+  python csv_import.py 2023.csv 2024.csv --db /data/kitchen.db --source kitchen_a --chunk-rows 200000
+"""
+
+import csv
+import itertools
+import math
+import operator
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from db_pool import ConnectionPool
+
+# CSV 中的列（与 data/sample_data.csv 相同）
+CSV_COLUMNS = ['timestamp', 'pm25', 'pm10', 'co', 'co2', 'temperature', 'humidity', 'activity', 'level']
+NUMERIC_COLUMNS = ['pm25', 'pm10', 'co', 'co2', 'temperature', 'humidity']
+TEXT_COLUMNS = ['activity', 'level']
+
+TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS air_quality_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT NOT NULL DEFAULT '',
+        ts_ms INTEGER NOT NULL,
+        pm25 REAL,
+        pm10 REAL,
+        co REAL,
+        co2 REAL,
+        temperature REAL,
+        humidity REAL,
+        activity TEXT,
+        level TEXT
+    )
+'''
+
+INDEX_SQLS = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_air_quality_source_ts ON air_quality_data (source, ts_ms)',
+    'CREATE INDEX IF NOT EXISTS idx_air_quality_ts ON air_quality_data (ts_ms)',
+]
+
+INSERT_SQL = f'''
+    INSERT OR IGNORE INTO air_quality_data
+    (source, ts_ms, {', '.join(NUMERIC_COLUMNS)}, {', '.join(TEXT_COLUMNS)})
+    VALUES ({', '.join(['?'] * (2 + len(NUMERIC_COLUMNS) + len(TEXT_COLUMNS)))})
+'''
+
+# 不带时区的时间按北京时间解释（与厨房服务器的 LOCAL_TZ 相同）
+LOCAL_TZ = timezone(timedelta(hours=8))
+
+# 报告中最多列出的被拒绝行数
+MAX_REPORTED_ERRORS = 20
+
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_ONE_MS = timedelta(milliseconds=1)
+
+
+class TimestampParser:
+    """时间字符串 -> UTC 毫秒
+
+    常见的 'YYYY-MM-DD HH:MM:SS'（或以 T 分隔）走快速路径：日期部分的零点按日期缓存，
+    时分秒直接由切片换算，不为每行构造 datetime；其余格式交给 datetime.fromisoformat。
+    """
+
+    def __init__(self, tz=LOCAL_TZ):
+        self.tz = tz
+        self._days = {}
+
+    def __call__(self, value):
+        if len(value) == 19 and value[10] in ' T' and value[13] == ':' and value[16] == ':':
+            hour, minute, second = int(value[11:13]), int(value[14:16]), int(value[17:19])
+            if hour < 24 and minute < 60 and second < 60:
+                day = self._days.get(value[:10])
+                if day is None:
+                    midnight = datetime.strptime(value[:10], '%Y-%m-%d').replace(tzinfo=self.tz)
+                    day = self._days[value[:10]] = int(midnight.timestamp()) * 1000
+                return day + (hour * 3600 + minute * 60 + second) * 1000
+
+        value = value.strip()
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=self.tz)
+        return int(dt.timestamp() * 1000)
+
+
+def _to_float(value):
+    """单个数值字段：空字符串为 None，NaN/Infinity 或非数值抛出 ValueError"""
+    value = value.strip()
+    if not value:
+        return None
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'not a finite number: {value}')
+    return number
+
+
+class AirQualityImporter:
+    """把 sample_data.csv 格式的文件批量导入 air_quality_data 表"""
+
+    def __init__(self, pool, source=None, chunk_rows=100000, tz=LOCAL_TZ):
+        """初始化
+
+        Args:
+            pool: 目标数据库的 ConnectionPool
+            source: 写入 source 列的来源标识（去重键的一部分，区分不同设备或厨房导出的文件），
+                    为 None 时使用各文件的文件名（不含扩展名）
+            chunk_rows: 每块读取、转换、写入（一个事务）的行数
+            tz: 不带时区的时间按此时区解释
+        """
+        self.pool = pool
+        self.source = source
+        self.chunk_rows = chunk_rows
+        self.parse_ts = TimestampParser(tz)
+        self.tz_offset_ms = tz.utcoffset(None) // _ONE_MS
+
+    def create_table(self):
+        with self.pool.transaction() as conn:
+            conn.execute(TABLE_SQL)
+            for sql in INDEX_SQLS:
+                conn.execute(sql)
+
+    def _positions(self, header):
+        """校验表头，返回各列在行中的位置"""
+        names = [name.strip().lower() for name in header]
+        missing = [c for c in CSV_COLUMNS if c not in names]
+        if missing:
+            raise ValueError(f'Missing columns: {", ".join(missing)}, expected {",".join(CSV_COLUMNS)}')
+        return [names.index(c) for c in CSV_COLUMNS]
+
+    def _convert_fast(self, rows, positions, width, source):
+        """整块按列转换，任何一行有问题时抛出 ValueError（由调用方退回逐行转换）"""
+        if any(length != width for length in map(len, rows)):
+            raise ValueError('ragged rows')
+
+        def column(pos):
+            return map(operator.itemgetter(pos), rows)
+
+        # 不带时区的时间：(datetime - 1970-01-01) // 1 毫秒 - 时区偏移，整条链都在 C 层；
+        # 带时区的时间与 naive 的 EPOCH 相减抛出 TypeError，由调用方退回逐行转换
+        ts = list(map(operator.sub,
+                      map(operator.floordiv,
+                          map(operator.sub, map(datetime.fromisoformat, column(positions[0])),
+                              itertools.repeat(_NAIVE_EPOCH)),
+                          itertools.repeat(_ONE_MS)),
+                      itertools.repeat(self.tz_offset_ms)))
+        numbers = []
+        for pos in positions[1:1 + len(NUMERIC_COLUMNS)]:
+            values = list(map(float, column(pos)))
+            if not all(map(math.isfinite, values)):
+                raise ValueError('non-finite value')
+            numbers.append(values)
+        texts = [list(map(str.strip, column(pos))) for pos in positions[1 + len(NUMERIC_COLUMNS):]]
+        return list(zip(itertools.repeat(source), ts, *numbers, *texts))
+
+    def _convert_slow(self, rows, positions, source, first_line, errors):
+        """逐行转换，跳过有问题的行并记录 (行号, 原因)"""
+        result = []
+        text_positions = positions[1 + len(NUMERIC_COLUMNS):]
+        for offset, row in enumerate(rows):
+            try:
+                ts = self.parse_ts(row[positions[0]])
+                numbers = [_to_float(row[pos]) for pos in positions[1:1 + len(NUMERIC_COLUMNS)]]
+                texts = [row[pos].strip() for pos in text_positions]
+            except (ValueError, IndexError) as e:
+                errors.append((first_line + offset, str(e) or type(e).__name__))
+                continue
+            result.append((source, ts, *numbers, *texts))
+        return result
+
+    def import_file(self, path, progress=None):
+        """导入一个文件，返回报告：读取、导入、重复、拒绝的行数，用时，每秒行数，前若干个被拒绝行
+
+        Args:
+            progress: 可选，每写完一块调用 progress(已读取行数, 已导入行数)
+        """
+        began = time.perf_counter()
+        source = self.source if self.source is not None else os.path.splitext(os.path.basename(path))[0]
+        read = imported = 0
+        errors = []
+        rejected = 0
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f'{path} is empty')
+            positions = self._positions(header)
+            width = len(header)
+
+            line = 2  # 第一行数据的行号（表头为第 1 行；带引号的多行字段会使行号偏小）
+            while True:
+                rows = list(itertools.islice(reader, self.chunk_rows))
+                if not rows:
+                    break
+                try:
+                    values = self._convert_fast(rows, positions, width, source)
+                except (ValueError, TypeError):
+                    chunk_errors = []
+                    values = self._convert_slow(rows, positions, source, line, chunk_errors)
+                    rejected += len(chunk_errors)
+                    errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+                with self.pool.transaction() as conn:
+                    before = conn.total_changes
+                    conn.executemany(INSERT_SQL, values)
+                    imported += conn.total_changes - before
+                read += len(rows)
+                line += len(rows)
+                if progress is not None:
+                    progress(read, imported)
+
+        seconds = time.perf_counter() - began
+        return {
+            'file': path,
+            'source': source,
+            'read': read,
+            'imported': imported,
+            'duplicates': read - rejected - imported,
+            'rejected': rejected,
+            'errors': errors,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(read / seconds) if seconds else None
+        }
+
+
+def main():
+    """命令行：导入一个或多个 CSV 文件"""
+    import argparse
+
+    default_db = os.environ.get('KITCHEN_DB_PATH',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sensor_data.db'))
+    parser = argparse.ArgumentParser(description='空气质量 CSV 批量导入（data/sample_data.csv 格式）')
+    parser.add_argument('files', nargs='+', help='CSV 文件')
+    parser.add_argument('--db', default=default_db, help='目标数据库（默认与厨房服务器相同，可用 KITCHEN_DB_PATH 指定）')
+    parser.add_argument('--source', help='来源标识，与时间一起作为去重键（默认为各文件的文件名，不含扩展名）')
+    parser.add_argument('--chunk-rows', type=int, default=100000, help='每块（一个事务）的行数')
+    parser.add_argument('--utc-offset', type=float, default=8, help='不带时区的时间所在时区，相对 UTC 的小时数')
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db, size=1)
+    importer = AirQualityImporter(pool, args.source, args.chunk_rows, timezone(timedelta(hours=args.utc_offset)))
+    importer.create_table()
+    print(f"数据库: {args.db}")
+
+    failed = False
+    for path in args.files:
+        started = time.perf_counter()
+
+        def progress(read, imported):
+            elapsed = time.perf_counter() - started
+            print(f"  {read} 行，已导入 {imported}，{read / elapsed:.0f} 行/秒")
+
+        try:
+            report = importer.import_file(path, progress)
+        except (OSError, ValueError) as e:
+            print(f"{path}: 导入失败: {e}")
+            failed = True
+            continue
+        print(f"{path}（source={report['source']}）: 读取 {report['read']} 行，导入 {report['imported']}，"
+              f"重复 {report['duplicates']}，拒绝 {report['rejected']}，用时 {report['seconds']} 秒（{report['rows_per_second']} 行/秒）")
+        for line, reason in report['errors']:
+            print(f"  第 {line} 行: {reason}")
+    pool.close()
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite连接池 - 供Flask各路由共享的持久连接
+功能：复用连接、WAL日志模式、调优的同步级别、语句缓存
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """线程安全的SQLite连接池
+
+    每个请求线程从池中借出一个连接，用完归还；连接本身长期保持打开，
+    因此sqlite3模块的语句缓存（即预编译语句）可以跨请求复用。
+    """
+
+    def __init__(self, db_path, size=4, synchronous='NORMAL',
+                 cached_statements=256, busy_timeout_ms=5000, auto_vacuum='INCREMENTAL'):
+        """初始化连接池
+
+        Args:
+            db_path: 数据库文件路径
+            size: 最多同时打开的连接数
+            synchronous: PRAGMA synchronous 取值（WAL模式下NORMAL已可保证一致性）
+            cached_statements: 每个连接缓存的预编译语句数量
+            busy_timeout_ms: 等待写锁的最长时间（毫秒）
+            auto_vacuum: 新建数据库的 PRAGMA auto_vacuum 取值（INCREMENTAL 便于删除后逐步回收空间；
+                         对已有数据库无效）
+        """
+        self.db_path = db_path
+        self.size = size
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+        self.auto_vacuum = auto_vacuum
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _create(self):
+        """创建一个新连接并设置PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        if self.auto_vacuum:
+            # 必须在切换 WAL 之前设置，否则新库的文件头已写入、设置不再生效
+            conn.execute(f'PRAGMA auto_vacuum={self.auto_vacuum}')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def _acquire(self):
+        """借出一个连接，池满时阻塞等待"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                conn = self._create()
+                self._created += 1
+                self._all.append(conn)
+                return conn
+
+        return self._idle.get(timeout=self.busy_timeout_ms / 1000)
+
+    def _release(self, conn):
+        """归还连接，丢弃未提交的事务"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """借用连接的上下文管理器（不自动提交）"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """在单个事务中执行，成功提交、异常回滚"""
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+            self._created = 0
+            self._idle = queue.LifoQueue()
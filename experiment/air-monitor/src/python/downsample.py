@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史数据降采样工具
+功能：解析时间桶参数、按目标点数选择时间桶、LTTB（Largest-Triangle-Three-Buckets）保形降采样
+"""
+
+import re
+
+# 可选的时间桶大小（毫秒），按目标点数自动选择时向上取整到其中之一
+NICE_BUCKETS_MS = [
+    1000, 5000, 10000, 30000,
+    60000, 5 * 60000, 10 * 60000, 15 * 60000, 30 * 60000,
+    3600000, 2 * 3600000, 3 * 3600000, 6 * 3600000, 12 * 3600000,
+    86400000, 7 * 86400000
+]
+
+_UNIT_MS = {'s': 1000, 'm': 60000, 'h': 3600000, 'd': 86400000}
+_BUCKET_RE = re.compile(r'^\s*(\d+)\s*([smhd]?)\s*$', re.IGNORECASE)
+
+
+def parse_bucket(value):
+    """解析时间桶参数：'30s'、'5m'、'1h'、'1d'，纯数字按秒计；非法值返回 None"""
+    if not value:
+        return None
+    match = _BUCKET_RE.match(str(value))
+    if not match:
+        return None
+    amount = int(match.group(1))
+    unit = (match.group(2) or 's').lower()
+    bucket_ms = amount * _UNIT_MS[unit]
+    return bucket_ms if bucket_ms > 0 else None
+
+
+def choose_bucket_ms(span_ms, max_points):
+    """选择最小的时间桶，使 span_ms 范围内的桶数不超过 max_points"""
+    if max_points <= 0:
+        return NICE_BUCKETS_MS[-1]
+    target = span_ms / max_points
+    for bucket_ms in NICE_BUCKETS_MS:
+        if bucket_ms >= target:
+            return bucket_ms
+    # 超出预设范围时按天取整
+    days = -(-int(target) // 86400000)
+    return days * 86400000
+
+
+def lttb_indices(xs, ys, threshold):
+    """LTTB降采样，返回保留点的下标列表（始终包含首尾点）
+
+    Args:
+        xs: 横坐标序列（递增）
+        ys: 纵坐标序列，None 视为 0
+        threshold: 目标点数
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    indices = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # 下一个桶的平均点
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_len = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / avg_len
+        avg_y = sum(ys[j] or 0 for j in range(avg_start, avg_end)) / avg_len
+
+        # 当前桶内选出与前一个已选点、下一桶平均点构成最大三角形的点
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax = xs[a]
+        ay = ys[a] or 0
+        max_area = -1
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * ((ys[j] or 0) - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+
+        indices.append(next_a)
+        a = next_a
+
+    indices.append(n - 1)
+    return indices
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按时间（而非条数）划定的内存热数据窗口，每个设备一个
+功能：窗口时长可全局配置、也可按设备单独配置；超过时长的读数自动淘汰，
+容量上限兜底防止高频设备占满内存；提供合并统计与内存占用报告
+"""
+
+import time
+
+from ring_buffer import ColumnarRingBuffer
+from stream_stats import SlidingStats, combine_moments
+
+
+class WindowSnapshot:
+    """单个窗口某一时刻的统计与内存占用，发布后不再修改，可在锁外读取"""
+
+    __slots__ = ('count', 'moments', 'capacity', 'window_seconds', 'oldest_ts', 'evicted_rows', 'bytes')
+
+    def __init__(self, window):
+        buffer = window.buffer
+        self.count = window.stats.count
+        self.moments = {f: window.stats.moments(f) for f in window.stats.fields}
+        self.capacity = buffer.capacity
+        self.window_seconds = window.window_seconds
+        self.oldest_ts = buffer.ts_at(0) if buffer else None
+        self.evicted_rows = window.evicted_rows
+        self.bytes = window.memory_bytes()
+
+
+def summarize(snapshots, field):
+    """合并若干窗口快照的指标统计"""
+    return combine_moments([s.moments[field] for s in snapshots])
+
+
+def build_memory_report(snapshots, default_window_seconds, now=None):
+    """由 {device_id: WindowSnapshot} 生成内存占用报告"""
+    now = time.time() if now is None else now
+    devices = {
+        device_id: {
+            'rows': snap.count,
+            'capacity': snap.capacity,
+            'window_seconds': snap.window_seconds,
+            'oldest_age_seconds': round(now - snap.oldest_ts, 1) if snap.oldest_ts is not None else None,
+            'evicted_rows': snap.evicted_rows,
+            'bytes': snap.bytes
+        }
+        for device_id, snap in snapshots.items()
+    }
+    return {
+        'default_window_seconds': default_window_seconds,
+        'device_count': len(devices),
+        'total_rows': sum(d['rows'] for d in devices.values()),
+        'total_bytes': sum(d['bytes'] for d in devices.values()),
+        'devices': devices
+    }
+
+
+class HotWindow:
+    """单个设备的热数据窗口：环形缓冲 + 增量统计"""
+
+    def __init__(self, window_seconds, capacity, fields, extra_fields=()):
+        self.window_seconds = window_seconds
+        self.buffer = ColumnarRingBuffer(capacity, fields, extra_fields)
+        self.stats = SlidingStats(fields)
+        self.evicted_rows = 0
+
+    def _drop_oldest(self):
+        """最旧一条离开窗口：统计直接读取缓冲区中的数值，不构造字典"""
+        self.stats.pop_values(self.buffer.values_at(0))
+        self.buffer.drop_oldest()
+
+    def append(self, ts, record):
+        """追加一条读数，返回被淘汰的条数（容量已满时覆盖最旧一条，加上按时间过期的条数）"""
+        evicted = 0
+        if len(self.buffer) == self.buffer.capacity:
+            self._drop_oldest()
+            evicted = 1
+        self.buffer.append(ts, record)
+        self.stats.push(record)
+        return evicted + self.expire(ts)
+
+    def expire(self, now):
+        """淘汰接收时间早于 now - window_seconds 的读数，返回淘汰的条数"""
+        cutoff = now - self.window_seconds
+        buffer = self.buffer
+        evicted = 0
+        while buffer and buffer.ts_at(0) < cutoff:
+            self._drop_oldest()
+            evicted += 1
+        self.evicted_rows += evicted
+        return evicted
+
+    def snapshot(self):
+        """当前统计与内存占用的不可变快照"""
+        return WindowSnapshot(self)
+
+    def memory_bytes(self):
+        """窗口占用的内存（字节）"""
+        return self.buffer.memory_bytes() + self.stats.memory_bytes()
+
+
+class HotWindowSet:
+    """按 device_id 分区的热数据窗口集合"""
+
+    def __init__(self, fields, extra_fields=(), window_seconds=900, max_rate_hz=1.0,
+                 max_rows=20000, device_windows=None):
+        """初始化
+
+        Args:
+            fields: 数值字段
+            extra_fields: 非数值字段
+            window_seconds: 默认窗口时长（秒）
+            max_rate_hz: 预计的单设备最高上报频率，用于计算窗口容量
+            max_rows: 单个设备窗口的容量上限
+            device_windows: {device_id: 窗口时长秒}，按设备覆盖默认值
+        """
+        self.fields = list(fields)
+        self.extra_fields = list(extra_fields)
+        self.window_seconds = window_seconds
+        self.max_rate_hz = max_rate_hz
+        self.max_rows = max_rows
+        self.device_windows = dict(device_windows or {})
+        self.windows = {}
+
+    def window_seconds_for(self, device_id):
+        """设备的窗口时长"""
+        return self.device_windows.get(device_id, self.window_seconds)
+
+    def window_for(self, device_id):
+        """取得设备的窗口，不存在时创建"""
+        window = self.windows.get(device_id)
+        if window is None:
+            seconds = self.window_seconds_for(device_id)
+            capacity = max(1, min(self.max_rows, int(seconds * self.max_rate_hz) + 1))
+            window = HotWindow(seconds, capacity, self.fields, self.extra_fields)
+            self.windows[device_id] = window
+        return window
+
+    def append(self, device_id, record, ts=None):
+        """追加一条读数到对应设备的窗口，返回被淘汰的条数"""
+        ts = time.time() if ts is None else ts
+        return self.window_for(device_id).append(ts, record)
+
+    def expire_all(self, now=None):
+        """按时间淘汰所有设备窗口中的过期读数，返回有读数被淘汰的设备列表"""
+        now = time.time() if now is None else now
+        return [device_id for device_id, window in self.windows.items() if window.expire(now)]
+
+    def count(self, device_id=None):
+        """窗口内的读数条数（不指定设备时为全部设备之和）"""
+        if device_id is not None:
+            window = self.windows.get(device_id)
+            return window.stats.count if window else 0
+        return sum(w.stats.count for w in self.windows.values())
+
+    def summary(self, field, device_id=None):
+        """指标统计，不指定设备时合并所有设备窗口"""
+        if device_id is not None:
+            windows = [self.windows[device_id]] if device_id in self.windows else []
+        else:
+            windows = list(self.windows.values())
+        return combine_moments([w.stats.moments(field) for w in windows])
+
+    def memory_report(self):
+        """内存占用报告"""
+        return build_memory_report({d: w.snapshot() for d, w in self.windows.items()}, self.window_seconds)
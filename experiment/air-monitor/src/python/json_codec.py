@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可替换的JSON编解码层
+功能：安装了 orjson 时用它编解码（C实现，明显快于标准库），否则回退到标准库 json；
+FastJSONProvider 接入Flask后，request.get_json() 和 jsonify 都走这里，
+快照、SSE推送、流式历史数据等自行编码的地方也统一调用本模块
+
+环境变量 AIR_MONITOR_JSON=json|orjson 可强制指定实现（默认自动选择）。
+两种实现的输出均为紧凑的 UTF-8 JSON；差别在于 orjson 把 NaN/Infinity 编码为 null，
+且解析时不接受 NaN 字面量（标准库会输出/接受非标准的 NaN）。
+"""
+
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+BACKENDS = ('orjson', 'json') if orjson is not None else ('json',)
+
+backend = None
+
+
+def _std_dumps_bytes(obj, default=None):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+
+def _orjson_dumps_bytes(obj, default=None):
+    # datetime 交给 default 处理，与Flask默认的HTTP日期格式保持一致；允许非字符串键
+    return orjson.dumps(obj, default=default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+def set_backend(name=None):
+    """切换JSON实现，name 为 None 时优先使用 orjson；返回实际使用的实现名"""
+    global backend, dumps_bytes, loads
+    if name is None:
+        name = BACKENDS[0]
+    if name not in BACKENDS:
+        raise ValueError(f'JSON backend not available: {name}')
+
+    backend = name
+    if name == 'orjson':
+        dumps_bytes, loads = _orjson_dumps_bytes, orjson.loads
+    else:
+        dumps_bytes, loads = _std_dumps_bytes, json.loads
+    return backend
+
+
+def dumps(obj, default=None):
+    """编码为紧凑的JSON字符串"""
+    return dumps_bytes(obj, default).decode('utf-8')
+
+
+set_backend(os.environ.get('AIR_MONITOR_JSON') or None)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider：jsonify、request.get_json() 以及模板 tojson 均使用本模块的实现
+
+    无额外参数的调用走快速路径；带参数（如 indent）时交给Flask默认实现。
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, self.default)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, self.default), mimetype=self.mimetype)
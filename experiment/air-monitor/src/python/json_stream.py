@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大响应的流式JSON编码与HTTP压缩
+功能：直接从SQLite游标分批取行，逐批编码为JSON数组片段并按 Accept-Encoding 协商 gzip/deflate 压缩后发出；
+整个结果集从不完整地驻留在内存中，峰值内存与行数无关，首字节时间也不随行数增长
+"""
+
+import zlib
+
+import json_codec
+
+# 每次从游标取出并编码的行数
+FETCH_SIZE = 500
+
+# 压缩级别：传感器JSON重复度高，级别1已能压到约1/10，CPU开销约为默认级别6的一半以下
+COMPRESS_LEVEL = 1
+
+# 小于该字节数的完整响应不压缩（压缩头和CPU开销不划算）
+MIN_COMPRESS_SIZE = 1024
+
+# 服务器支持的编码，按优先级排列；wbits 决定 zlib 输出的容器格式
+_ENCODINGS = {
+    'gzip': 16 + zlib.MAX_WBITS,  # gzip 头 + CRC32
+    'deflate': zlib.MAX_WBITS     # HTTP 的 deflate 实际为 zlib 格式（RFC 9110）
+}
+
+def negotiate_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择压缩方式，返回 'gzip'、'deflate' 或 None（不压缩）
+
+    q=0 表示客户端拒绝该编码；'*' 匹配任何未单独列出的编码。
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for name in _ENCODINGS:
+        q = weights.get(name, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def iter_json_array(batches, to_item=None):
+    """把逐批产生的行编码为一个JSON数组，每批输出一个 bytes 片段
+
+    Args:
+        batches: 可迭代的行批次（如 iter_cursor 的输出）
+        to_item: 可选，把一行转换为可序列化对象（如 dict）
+    """
+    yield b'['
+    first = True
+    for rows in batches:
+        if to_item is not None:
+            rows = [to_item(row) for row in rows]
+        if not rows:
+            continue
+        data = b','.join(json_codec.dumps_bytes(row) for row in rows)
+        yield data if first else b',' + data
+        first = False
+    yield b']'
+
+
+def iter_cursor(cursor, size=FETCH_SIZE):
+    """按批从游标取行，直到取完"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def compress_chunks(chunks, encoding, level=COMPRESS_LEVEL):
+    """把 bytes 片段流压缩为指定编码
+
+    第一个片段后立即同步刷新，让响应头和数组开头尽快发出；之后由 zlib 自行决定输出时机，
+    不影响压缩率。
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _ENCODINGS[encoding])
+    flushed = False
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if not flushed:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            flushed = True
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_body(body, encoding):
+    """压缩一个完整的响应体；过小或未协商出编码时原样返回，返回 (body, 实际使用的编码)"""
+    if not encoding or len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, _ENCODINGS[encoding])
+    return compressor.compress(body) + compressor.flush(), encoding
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+厨房空气质量监测系统 - asyncio（ASGI）服务器入口
+功能：与 kitchen_web_server.py 共用数据库、写后缓冲、内存状态和全部路由，但运行在单个事件循环上：
+  - 高频路由原生异步实现：POST /api/sensor-data、GET /api/current-data、GET /api/stream（SSE）、GET /api/memory
+  - 其余路由（/api/history、/api/stats、/api/devices、批量上报、页面）交给 Flask 应用，
+    在线程池中执行，SQLite 查询和响应体生成都不阻塞事件循环
+  - 空闲的 keep-alive 连接和 SSE 客户端只占用协程，不占用线程，单核即可保持数千个连接
+
+运行：pip install uvicorn 后执行 python kitchen_asgi_server.py（或 uvicorn kitchen_asgi_server:app --port 5001）
+"""
+
+import asyncio
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import json_codec
+import kitchen_web_server as kitchen
+from broadcaster import AsyncBroadcaster
+
+# 执行数据库查询和 Flask 路由的线程数（与连接池大小相当即可，更多线程只会排队等连接）
+EXECUTOR_WORKERS = 8
+
+# 单个请求体上限（批量上报最多10000行）
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# 与 Flask 版 CORS(app) 相同：允许任意来源跨域访问（预检请求由 Flask 处理）
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='asgi-db')
+
+# SSE推送：每个客户端一个协程 + 有界队列
+stream_hub = AsyncBroadcaster()
+
+
+class BodyTooLarge(ValueError):
+    """请求体超过 MAX_BODY_BYTES"""
+
+
+def _publish_update(device_id, snapshot):
+    """LiveState 写入回调：同时推送给线程版和异步版的订阅者"""
+    kitchen.broadcaster.publish('reading', snapshot.data, device_id, snapshot.text)
+    stream_hub.publish_threadsafe('reading', snapshot.data, device_id, snapshot.text)
+
+
+async def read_body(receive):
+    """读取完整请求体"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body = message.get('body', b'')
+        size += len(body)
+        if size > MAX_BODY_BYTES:
+            raise BodyTooLarge(f'Body exceeds {MAX_BODY_BYTES} bytes')
+        chunks.append(body)
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+async def wait_disconnect(receive):
+    """等待客户端断开"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def query_param(scope, name):
+    """取查询参数的第一个值，不存在时返回 None"""
+    values = parse_qs(scope['query_string'].decode('latin-1')).get(name)
+    return values[0] if values else None
+
+
+def request_header(scope, name):
+    """取请求头（name 为小写字节串），不存在时返回 None"""
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def send_response(send, status, body=b'', content_type=b'application/json', headers=()):
+    """发送一个完整响应"""
+    response_headers = [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]
+    response_headers.extend(headers)
+    response_headers.extend(CORS_HEADERS)
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, status, data, headers=()):
+    """编码并发送JSON响应"""
+    await send_response(send, status, json_codec.dumps_bytes(data), headers=headers)
+
+
+async def handle_sensor_data(scope, receive, send):
+    """POST /api/sensor-data：与 Flask 版相同的校验、入队和应答，全部在事件循环中完成（入队不阻塞）"""
+    try:
+        data = json_codec.loads(await read_body(receive) or b'null')
+    except BodyTooLarge as e:
+        return await send_json(send, 413, {'error': str(e)})
+    except ValueError as e:
+        return await send_json(send, 400, {'error': f'Invalid JSON: {e}'})
+
+    if not data:
+        return await send_json(send, 400, {'error': 'No data received'})
+
+    if not isinstance(data, dict):
+        return await send_json(send, 400, {'error': 'Body must be a JSON object'})
+
+    # 与 Flask 版相同的字段与类型校验，类型错误的行不会进入写后缓冲
+    try:
+        data = kitchen.READING_SCHEMA.normalize(data)
+    except ValueError as e:
+        return await send_json(send, 400, {'error': str(e)})
+
+    if not kitchen.write_buffer.submit(kitchen.reading_to_row(data)):
+        return await send_json(send, 429, {'error': 'Server busy, retry later'}, headers=[(b'retry-after', b'1')])
+
+    kitchen.update_state([data])
+
+    print(f"收到数据: T={data['temperature']}°C, H={data['humidity']}%, "
+          f"CO={data['co']}ppm, AQ={data['air_quality']}, Sound={data['sound']}%")
+
+    await send_json(send, 200, {
+        'status': 'success',
+        'message': 'Data received successfully',
+        'timestamp': int(time.time())
+    })
+
+
+async def handle_current_data(scope, receive, send):
+    """GET /api/current-data：直接发送预编码快照，支持 ETag / If-None-Match"""
+    device_id = query_param(scope, 'device_id')
+    snapshot = kitchen.state.snapshot(device_id)
+    if snapshot is None:
+        return await send_json(send, 404, {'error': f'Unknown device: {device_id}'})
+
+    headers = [(b'etag', snapshot.etag.encode()), (b'cache-control', b'no-cache')]
+    if snapshot.matches(request_header(scope, b'if-none-match')):
+        await send({'type': 'http.response.start', 'status': 304, 'headers': headers + CORS_HEADERS})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    await send_response(send, 200, snapshot.body, headers=headers)
+
+
+async def handle_stream(scope, receive, send):
+    """GET /api/stream：SSE推送，客户端断开时立即结束"""
+    device_id = query_param(scope, 'device_id')
+
+    def snapshot():
+        latest = kitchen.state.latest(device_id)
+        return [('reading', latest)] if latest else []
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no')
+    ] + CORS_HEADERS})
+
+    streaming = asyncio.ensure_future(stream_hub.stream(send, device_id, snapshot))
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await asyncio.wait({streaming, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (streaming, disconnect):
+            task.cancel()
+
+    if not streaming.cancelled() and streaming.done() and streaming.exception() is None:
+        # 慢消费者被断开：结束响应，客户端会自动重连
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def handle_memory(scope, receive, send):
+    """GET /api/memory：内存热窗口占用及连接数"""
+    report = kitchen.state.memory_report()
+    report['write_buffer_pending'] = kitchen.write_buffer.pending
+    report['write_buffer_dropped'] = kitchen.write_buffer.dropped_rows
+    report['stream_clients'] = stream_hub.subscriber_count + kitchen.broadcaster.subscriber_count
+    report['stream_dropped_clients'] = stream_hub.dropped_clients + kitchen.broadcaster.dropped_clients
+    report['line_ingest'] = kitchen.line_server.stats()
+    report['serial_ingest'] = kitchen.serial_daemon.stats()
+    report['retention'] = kitchen.retention.stats()
+    if kitchen.partitions is not None:
+        report['partitions'] = kitchen.partitions.stats()
+    if kitchen.archive is not None:
+        report['archive'] = kitchen.archive.stats()
+    await send_json(send, 200, report)
+
+
+# 原生异步实现的路由：(方法, 路径) -> 处理函数
+ROUTES = {
+    ('POST', '/api/sensor-data'): handle_sensor_data,
+    ('GET', '/api/current-data'): handle_current_data,
+    ('GET', '/api/stream'): handle_stream,
+    ('GET', '/api/memory'): handle_memory,
+}
+
+
+def build_environ(scope, body):
+    """由ASGI scope构造WSGI environ"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(len(body)),
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            name = 'HTTP_' + name
+            environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+def start_wsgi(environ):
+    """在线程池中调用 Flask 应用，返回 (状态码, 响应头, 响应体迭代器, 原始返回值)"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    result = kitchen.app(environ, start_response)
+    iterator = iter(result)
+    # 流式响应要取出第一块后才会调用 start_response
+    first = next(iterator, None)
+    return started['status'], started['headers'], first, iterator, result
+
+
+async def handle_wsgi(scope, receive, send):
+    """其余路由交给 Flask：路由执行和每一块响应体的生成都在线程池中进行"""
+    loop = asyncio.get_running_loop()
+    try:
+        body = await read_body(receive)
+    except BodyTooLarge as e:
+        return await send_json(send, 413, {'error': str(e)})
+
+    status, headers, chunk, iterator, result = await loop.run_in_executor(
+        executor, start_wsgi, build_environ(scope, body)
+    )
+    try:
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await loop.run_in_executor(executor, next, iterator, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        # 关闭生成器（如流式历史查询）以释放数据库连接
+        if hasattr(result, 'close'):
+            await loop.run_in_executor(executor, result.close)
+
+
+async def lifespan(receive, send):
+    """启动时初始化数据库和后台写入线程，关闭时把缓冲数据落库"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(executor, kitchen.init_database)
+                # 只在模板缺失时生成，不覆盖已有的页面
+                if not os.path.exists(os.path.join(kitchen.TEMPLATE_DIR, 'kitchen_monitor.html')):
+                    kitchen.create_templates()
+                if kitchen.LINE_PORT:
+                    kitchen.line_server.start()
+                kitchen.serial_daemon.start()
+                if kitchen.RETENTION_DAYS:
+                    kitchen.retention.start()
+                if kitchen.archive is not None:
+                    kitchen.archive.start()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            stream_hub.bind(loop)
+            kitchen.state.on_update = _publish_update
+            kitchen.write_buffer.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if kitchen.LINE_PORT:
+                kitchen.line_server.stop()
+            kitchen.serial_daemon.stop()
+            kitchen.retention.stop()
+            if kitchen.archive is not None:
+                kitchen.archive.stop()
+            kitchen.write_buffer.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI入口"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    handler = ROUTES.get((scope['method'], scope['path']), handle_wsgi)
+    await handler(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='厨房空气质量监测系统 - ASGI服务器')
+    parser.add_argument('--host', default='0.0.0.0', help='监听地址')
+    parser.add_argument('--port', type=int, default=5001, help='监听端口')
+    parser.add_argument('--keep-alive', type=int, default=75, help='空闲 keep-alive 连接保持的秒数')
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("需要ASGI服务器：pip install uvicorn")
+        raise SystemExit(1)
+
+    print("=" * 60)
+    print("厨房空气质量监测系统 - ASGI服务器（asyncio）")
+    print("=" * 60)
+    print(f"Web界面访问地址: http://localhost:{args.port}")
+    print(f"原生异步路由: {', '.join(path for _, path in ROUTES)}")
+    print("其余路由由 Flask 应用在线程池中处理")
+    print("=" * 60)
+
+    uvicorn.run(app, host=args.host, port=args.port, timeout_keep_alive=args.keep_alive,
+                backlog=4096, access_log=False, log_level='warning')
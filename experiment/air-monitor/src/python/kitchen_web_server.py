@@ -6,27 +6,59 @@
 传感器：DHT11温湿度 + MQ7一氧化碳 + MQ135空气质量 + 声音传感器
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, send_from_directory
 from flask_cors import CORS
 import json
 import time
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import threading
 import sqlite3
 import os
+from contextlib import closing
+
+from db_pool import ConnectionPool
+from write_buffer import WriteBehindBuffer
+from batch_ingest import read_batch, validate_batch, BatchTooLarge, ReadingSchema
+from hot_window import HotWindowSet
+from live_state import LiveState
+from broadcaster import Broadcaster
+from downsample import parse_bucket, choose_bucket_ms, lttb_indices
+from rollups import RollupManager
+from json_codec import FastJSONProvider
+from columnar import FORMATS, rows_to_columns, records_to_columns, encode_binary
+from line_ingest import LineParser, LineIngestServer
+from serial_ingest import SerialIngestDaemon
+from retention import RetentionEngine, enable_incremental_vacuum
+from partitions import PartitionedStore
+from archive import ColumnArchive, MIMETYPES as ARCHIVE_MIMETYPES, available as archive_available, parse_day_ms
+from json_stream import negotiate_encoding, iter_json_array, iter_cursor, compress_chunks, encode_body
+from csv_export import EXPORT_FETCH_SIZE, parse_columns, parse_time, csv_line_sql, iter_csv
 
 # 基础路径配置
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'sensor_data.db')
+DB_PATH = os.environ.get('KITCHEN_DB_PATH', os.path.join(BASE_DIR, 'sensor_data.db'))
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 
 LOCAL_TZ = timezone(timedelta(hours=8))
 
+# 在SQL中由 ts_ms 直接生成北京时间 ISO 字符串（整数运算，不在Python里逐行解析时间）
+_LOCAL_OFFSET_MINUTES = int(LOCAL_TZ.utcoffset(None).total_seconds() // 60)
+_LOCAL_OFFSET_SUFFIX = datetime(2000, 1, 1, tzinfo=LOCAL_TZ).isoformat()[-6:]  # '+08:00'
+LOCAL_ISO_SQL = (
+    f"strftime('%Y-%m-%dT%H:%M:%S', ts_ms / 1000, 'unixepoch', '{_LOCAL_OFFSET_MINUTES:+d} minutes')"
+    f" || '{_LOCAL_OFFSET_SUFFIX}'"
+)
+
+# 共享的数据库连接池（WAL模式，所有路由复用）
+db_pool = ConnectionPool(DB_PATH)
+
 app = Flask(__name__, template_folder=TEMPLATE_DIR)
 CORS(app)  # 允许跨域请求
+app.json = FastJSONProvider(app)  # jsonify / get_json 使用更快的JSON实现（装有 orjson 时）
 
-# 全局变量存储最新数据
-latest_data = {
+# 尚无设备上报时 /api/current-data 返回的默认数据
+DEFAULT_DATA = {
     'temperature': 0.0,
     'humidity': 0.0,
     'co': 0.0,              # 一氧化碳浓度
@@ -37,60 +69,380 @@ latest_data = {
     'last_update': None
 }
 
-# 数据存储
-data_history = []
-max_history = 1000  # 最多保存1000条记录
+# 数值型传感器指标
+METRICS = ['temperature', 'humidity', 'co', 'air_quality', 'sound']
+
+# 内存热数据窗口：按时间划定（默认15分钟），每个设备一个，可按设备单独配置，
+# 这样统计口径不会随设备数量、上报频率变化
+HOT_WINDOW_SECONDS = int(os.environ.get('KITCHEN_HOT_WINDOW_SECONDS', 15 * 60))
+DEVICE_WINDOW_SECONDS = json.loads(os.environ.get('KITCHEN_DEVICE_WINDOWS', '{}'))  # 例如 {"kitchen_01": 3600}
+HOT_WINDOW_MAX_RATE_HZ = 1.0  # 单设备预计最高上报频率，决定窗口容量
+HOT_WINDOW_MAX_ROWS = 20000   # 单设备窗口容量上限（内存保护）
+
+# 读数入库时已同步写入SQLite和汇总表，离开窗口时无需再落盘；
+# 超出热窗口时长的统计由汇总表回答
+hot_windows = HotWindowSet(
+    METRICS, ['timestamp', 'device_id'],
+    window_seconds=HOT_WINDOW_SECONDS,
+    max_rate_hz=HOT_WINDOW_MAX_RATE_HZ,
+    max_rows=HOT_WINDOW_MAX_ROWS,
+    device_windows=DEVICE_WINDOW_SECONDS
+)
+
+# /api/stream 的SSE推送：每次更新只序列化一次，分发给所有打开的页面
+broadcaster = Broadcaster()
+
+# 最新数据与热窗口的并发访问统一经过 state（写入加锁，最新数据写时复制）；
+# latest() 为任意设备最近一次上报，latest(device_id) 为指定设备的最新数据
+state = LiveState(
+    hot_windows, DEFAULT_DATA,
+    on_update=lambda device_id, snap: broadcaster.publish('reading', snap.data, device_id, snap.text)
+)
+
+# 1分钟/1小时/1天汇总表，随批量写入增量更新
+rollups = RollupManager('kitchen_sensor_data', METRICS)
+
+# LTTB降采样时最多读取的原始行数
+LTTB_SOURCE_LIMIT = 200000
+
+# 上报数据必须包含的字段
+REQUIRED_FIELDS = ['temperature', 'humidity', 'co', 'air_quality', 'sound', 'timestamp', 'device_id']
+
+# 上报数据的类型：指标为数值，timestamp 为整数，device_id 为字符串（入队和更新内存状态之前校验）
+READING_SCHEMA = ReadingSchema(REQUIRED_FIELDS, METRICS, ['timestamp'], ['device_id'])
+
+def update_state(readings):
+    """更新最新数据并追加到设备的内存热窗口，过期或超出容量的读数自动淘汰"""
+    state.ingest(readings, datetime.now(LOCAL_TZ).strftime('%Y-%m-%d %H:%M:%S'))
+
+INSERT_SQL = '''
+    INSERT INTO kitchen_sensor_data
+    (temperature, humidity, co, air_quality, sound, timestamp, device_id, created_at, ts_ms)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+BACKFILL_CHUNK = 50000  # 回填 ts_ms 时每个事务处理的行数
+
+RAW_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS kitchen_sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        temperature REAL,
+        humidity REAL,
+        co REAL,
+        air_quality REAL,
+        sound REAL,
+        timestamp INTEGER,
+        device_id TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ts_ms INTEGER
+    )
+'''
+
+RAW_INDEX_SQLS = [
+    'CREATE INDEX IF NOT EXISTS idx_kitchen_ts ON kitchen_sensor_data (ts_ms)',
+    'CREATE INDEX IF NOT EXISTS idx_kitchen_device_ts ON kitchen_sensor_data (device_id, ts_ms)',
+]
+
+# 按时间分区存储原始数据：KITCHEN_PARTITIONS=day（每天一个文件）或 week，不设置时所有数据在主库一张表中；
+# 汇总表始终在主库
+PARTITION_PERIOD = os.environ.get('KITCHEN_PARTITIONS', '').strip().lower()
+partitions = PartitionedStore(
+    os.environ.get('KITCHEN_PARTITION_DIR', os.path.join(os.path.dirname(DB_PATH), 'kitchen_partitions')),
+    'kitchen_sensor_data', [RAW_TABLE_SQL] + RAW_INDEX_SQLS, PARTITION_PERIOD,
+    workers=int(os.environ.get('KITCHEN_PARTITION_WORKERS', 4))
+) if PARTITION_PERIOD else None
 
 # 数据库初始化
 def init_database():
     """初始化SQLite数据库"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS kitchen_sensor_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            temperature REAL,
-            humidity REAL,
-            co REAL,
-            air_quality REAL,
-            sound REAL,
-            timestamp INTEGER,
-            device_id TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    with db_pool.transaction() as conn:
+        conn.execute(RAW_TABLE_SQL)
+
+    migrate_database()
+
+    with db_pool.transaction() as conn:
+        rollups.create_tables(conn)
+        has_raw = conn.execute('SELECT 1 FROM kitchen_sensor_data LIMIT 1').fetchone()
+        has_rollup = conn.execute(f"SELECT 1 FROM {rollups.table_name('1m')} LIMIT 1").fetchone()
+    if has_raw and not has_rollup:
+        print("提示: 汇总表为空，可运行 python kitchen_web_server.py --rebuild-rollups 回填历史数据")
+
+    if partitions is not None:
+        partitions.open()
+        if has_raw:
+            print("提示: 主库中仍有未分区的原始数据，查询只读取分区，"
+                  "请运行 python kitchen_web_server.py --migrate-partitions 迁移")
+
+    if ARCHIVE_FORMAT and archive is None:
+        print("提示: 列式归档需要 pyarrow（pip install pyarrow），KITCHEN_ARCHIVE 未生效")
+
     print("数据库初始化完成")
 
+def rebuild_rollups():
+    """从原始数据全量重建汇总表"""
+    write_buffer.flush()
+    if partitions is not None:
+        rebuild_partitioned_rollups()
+        return
+    with db_pool.transaction() as conn:
+        counts = rollups.rebuild(conn)
+    for name, count in counts.items():
+        print(f"汇总表 {rollups.table_name(name)} 重建完成: {count} 个时间桶")
+
+def rebuild_partitioned_rollups():
+    """分区存储时重建汇总表：清空后逐个分区读取原始数据合并进汇总表（汇总桶不跨分区）"""
+    with db_pool.transaction() as conn:
+        rollups.clear(conn)
+    columns = ', '.join(METRICS)
+    for start in partitions.partitions():
+        with partitions.connection(start) as source:
+            if source is None:
+                continue
+            cursor = source.execute(
+                f'SELECT ts_ms, device_id, {columns} FROM kitchen_sensor_data WHERE ts_ms IS NOT NULL'
+            )
+            while True:
+                rows = cursor.fetchmany(BACKFILL_CHUNK)
+                if not rows:
+                    break
+                with db_pool.transaction() as conn:
+                    rollups.update(conn, [(row[0], row[1], row[2:]) for row in rows])
+        print(f"汇总表已合并分区 {partitions.file_name(start)}")
+
+def migrate_to_partitions():
+    """把主库中的原始数据分批移入分区文件（每批先写入分区再从主库删除），返回迁移的行数
+
+    迁移不更新汇总表，因此要求汇总表已覆盖这些数据；缺少 ts_ms 的行无法分区，保留在主库。
+    """
+    with db_pool.connection() as conn:
+        if not rollups.covers_source(conn):
+            print("汇总表未覆盖主库中最早的原始数据，请先运行 --rebuild-rollups")
+            return 0
+
+    moved = 0
+    last_id = 0
+    while True:
+        with db_pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT id, temperature, humidity, co, air_quality, sound, timestamp, device_id, created_at, ts_ms
+                FROM kitchen_sensor_data WHERE id > ? AND ts_ms IS NOT NULL ORDER BY id LIMIT ?
+            ''', (last_id, BACKFILL_CHUNK)).fetchall()
+        if not rows:
+            break
+        partitions.insert(INSERT_SQL, [row[1:] for row in rows], 8)
+        with db_pool.transaction() as conn:
+            conn.execute('DELETE FROM kitchen_sensor_data WHERE id BETWEEN ? AND ? AND ts_ms IS NOT NULL',
+                         (rows[0][0], rows[-1][0]))
+        last_id = rows[-1][0]
+        moved += len(rows)
+        print(f"已迁移 {moved} 条")
+    return moved
+
+def migrate_database():
+    """schema迁移：增加整数毫秒时间列 ts_ms（UTC），回填旧数据并建立时间索引"""
+    with db_pool.transaction() as conn:
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(kitchen_sensor_data)')}
+        if 'ts_ms' not in columns:
+            conn.execute('ALTER TABLE kitchen_sensor_data ADD COLUMN ts_ms INTEGER')
+            print("已添加 ts_ms 列，开始回填历史数据")
+
+    # 分批回填，避免长时间占用写锁
+    with db_pool.connection() as conn:
+        low, high = conn.execute(
+            'SELECT MIN(id), MAX(id) FROM kitchen_sensor_data WHERE ts_ms IS NULL'
+        ).fetchone()
+        updated = 0
+        if low is not None:
+            for start in range(low, high + 1, BACKFILL_CHUNK):
+                updated += conn.execute('''
+                    UPDATE kitchen_sensor_data
+                    SET ts_ms = CAST(strftime('%s', created_at) AS INTEGER) * 1000
+                    WHERE id BETWEEN ? AND ? AND ts_ms IS NULL
+                      AND strftime('%s', created_at) IS NOT NULL
+                ''', (start, start + BACKFILL_CHUNK - 1)).rowcount
+                conn.commit()
+        if updated:
+            print(f"ts_ms 回填完成，共 {updated} 条")
+
+    with db_pool.transaction() as conn:
+        for sql in RAW_INDEX_SQLS:
+            conn.execute(sql)
+
 # 保存数据到数据库
-def save_to_database(data):
-    """保存数据到SQLite数据库"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO kitchen_sensor_data 
-        (temperature, humidity, co, air_quality, sound, timestamp, device_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (
+def reading_to_row(data, received_ms=None):
+    """将一条读数转换为INSERT_SQL的参数元组（接收时间即入库时间，不受批量写入延迟影响）"""
+    if received_ms is None:
+        received_ms = int(time.time() * 1000)
+    return (
         data.get('temperature', 0),
         data.get('humidity', 0),
         data.get('co', 0),
         data.get('air_quality', 0),
         data.get('sound', 0),
         data.get('timestamp', 0),
-        data.get('device_id', '')
-    ))
-    
-    conn.commit()
-    conn.close()
+        data.get('device_id', ''),
+        time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(received_ms / 1000)),
+        received_ms
+    )
+
+def save_to_database(data):
+    """保存数据到SQLite数据库"""
+    save_batch_to_database([reading_to_row(data)])
+
+def save_batch_to_database(rows):
+    """在一个事务中批量写入多行并增量更新汇总表（供写后缓冲调用）
+
+    分区存储时原始数据先写入各分区文件，汇总表随后在主库的事务中更新（两者不在同一个事务中，
+    进程在两步之间退出时可用 --rebuild-rollups 修复）。
+    """
+    if partitions is not None:
+        partitions.insert(INSERT_SQL, rows, 8)
+        with db_pool.transaction() as conn:
+            rollups.update(conn, [(row[8], row[6], row[:5]) for row in rows])
+        return
+    with db_pool.transaction() as conn:
+        conn.executemany(INSERT_SQL, rows)
+        rollups.update(conn, [(row[8], row[6], row[:5]) for row in rows])
+
+# 写后缓冲：请求只入队，后台线程按500条或0.5秒批量提交
+write_buffer = WriteBehindBuffer(save_batch_to_database)
+
+def ingest_readings(readings):
+    """非HTTP入口（行协议监听）的入库：逐条入队写后缓冲，再一次性更新内存状态，返回接受的条数
+
+    队列已满时丢弃该条（UDP 没有应答可以通知设备重试）。
+    """
+    received_ms = int(time.time() * 1000)
+    accepted = [data for data in readings if write_buffer.submit(reading_to_row(data, received_ms))]
+    if accepted:
+        update_state(accepted)
+    return len(accepted)
+
+# UDP/TCP 行协议上报，CSV 列顺序：device_id,timestamp,temperature,humidity,co,air_quality,sound
+# 行协议没有认证，默认不启用；设备改用行协议时设置 KITCHEN_LINE_PORT=5002，
+# 只在本机转发时可设置 KITCHEN_LINE_HOST=127.0.0.1
+LINE_PORT = int(os.environ.get('KITCHEN_LINE_PORT', 0))  # 0 表示不启用
+LINE_HOST = os.environ.get('KITCHEN_LINE_HOST', '0.0.0.0')
+line_server = LineIngestServer(
+    LineParser(['device_id', 'timestamp'] + METRICS, METRICS, REQUIRED_FIELDS),
+    ingest_readings, host=LINE_HOST, port=LINE_PORT
+)
+
+# 串口上报（没有 WiFi 的开发板），多个串口用逗号分隔，行格式与行协议相同
+SERIAL_PORTS = [p.strip() for p in os.environ.get('KITCHEN_SERIAL_PORTS', '').split(',') if p.strip()]
+serial_daemon = SerialIngestDaemon(
+    SERIAL_PORTS, line_server.parser, ingest_readings,
+    baudrate=int(os.environ.get('KITCHEN_SERIAL_BAUD', 115200))
+)
+
+# 数据保留：超过保留天数的原始数据分批删除（汇总表保留全部历史），0 表示不删除
+RETENTION_DAYS = float(os.environ.get('KITCHEN_RETENTION_DAYS', 0))
+
+def rollups_cover_expired(conn):
+    """删除前检查：原始数据必须已汇总进汇总表，否则删除会丢失这部分历史"""
+    if not rollups.covers_source(conn):
+        return 'rollups do not cover the oldest raw rows, run --rebuild-rollups first'
+    return None
+
+def retention_guard(conn):
+    """删除前检查：已汇总进汇总表；启用列式归档时，过期数据所在的时间段还必须已归档"""
+    reason = rollups_cover_expired(conn)
+    if reason is None and archive is not None:
+        cutoff_ms = int((time.time() - retention.retention_days * 86400) * 1000)
+        if archive.archived_until is None or archive.archived_until < cutoff_ms:
+            reason = 'expired raw rows are not archived yet, run --archive first'
+        elif archive.pending(cutoff_ms):
+            reason = 'rows were backfilled into archived days, run --archive first'
+    return reason
+
+retention = RetentionEngine(
+    db_pool.connection, 'kitchen_sensor_data', 'ts_ms', RETENTION_DAYS,
+    guard=retention_guard,
+    interval=int(os.environ.get('KITCHEN_RETENTION_INTERVAL', 3600)),
+    partitions=partitions
+)
+
+# 列式归档：KITCHEN_ARCHIVE=parquet 或 arrow 时，每个已结束的时间段（默认每天，分区存储时与分区周期相同）
+# 的原始数据导出为一个压缩的列式文件，供 /api/export 下载和 archive.py 命令行合并导出；需要 pyarrow
+ARCHIVE_FORMAT = os.environ.get('KITCHEN_ARCHIVE', '').strip().lower()
+
+# 归档文件的列：ts 为接收时间（UTC 毫秒时间戳，即 ts_ms），timestamp 为设备上报的时间戳
+ARCHIVE_COLUMNS = [('ts', 'timestamp'), ('device_id', 'string')] + [(m, 'float64') for m in METRICS] \
+    + [('timestamp', 'int64')]
+
+def raw_stores(start_ms=None, end_ms=None):
+    """原始数据所在的表：[(水位键, 打开连接的上下文管理器)]；单库时为主库，分区存储时为与 [start_ms, end_ms] 重叠的分区"""
+    if partitions is None:
+        return [('main', db_pool.connection)]
+    return [(str(start), lambda start=start: partitions.connection(start))
+            for start in partitions.partitions(start_ms, end_ms)]
+
+def id_range_sql(watermark_key, after, until):
+    """水位（{表: 最大 id}）对应的 id 范围条件和参数：after 之后、until 及之前写入的行"""
+    conditions, params = [], []
+    if after is not None:
+        conditions.append('id > ?')
+        params.append(after.get(watermark_key, 0))
+    if until is not None:
+        conditions.append('id <= ?')
+        params.append(until.get(watermark_key, 0))
+    return ''.join(f' AND {c}' for c in conditions), params
+
+def iter_raw_batches(start_ms, end_ms, batch_rows, after=None, until=None):
+    """按时间升序逐批读取 [start_ms, end_ms) 内的原始数据，列顺序与 ARCHIVE_COLUMNS 一致（走 ts_ms 索引）
+
+    after、until 为 raw_changes 返回的水位，只读取 after 之后、until 及之前写入的行。
+    """
+    for key, connect in raw_stores(start_ms, end_ms - 1):
+        ids, id_params = id_range_sql(key, after, until)
+        query = f'''
+            SELECT ts_ms, device_id, {', '.join(METRICS)}, timestamp
+            FROM kitchen_sensor_data WHERE ts_ms >= ? AND ts_ms < ?{ids} ORDER BY ts_ms
+        '''
+        with connect() as conn:
+            if conn is None:
+                continue
+            yield from iter_cursor(conn.execute(query, [start_ms, end_ms] + id_params), batch_rows)
+
+def raw_changes(after, before_ms, period_ms):
+    """归档用的补录检测：返回 (当前水位 {表: 最大 id}, [after 之后写入、时间早于 before_ms 的行所在的时间段起点])
+
+    id 自增且不重用，按 id 区间只扫描上次检测之后写入的行；after 为 None 时只返回当前水位。
+    """
+    watermark, periods = {}, set()
+    for key, connect in raw_stores(end_ms=before_ms - 1):
+        with connect() as conn:
+            if conn is None:
+                continue
+            watermark[key] = conn.execute('SELECT MAX(id) FROM kitchen_sensor_data').fetchone()[0] or 0
+            if after is not None and watermark[key] > after.get(key, 0):
+                periods.update(row[0] * period_ms for row in conn.execute(
+                    'SELECT DISTINCT ts_ms / ? FROM kitchen_sensor_data WHERE id > ? AND id <= ? AND ts_ms < ?',
+                    (period_ms, after.get(key, 0), watermark[key], before_ms)
+                ))
+    return watermark, sorted(periods)
+
+def oldest_ts_ms():
+    """最早一条原始数据的毫秒时间（分区存储时为最早分区的起始时间），没有数据时返回 None"""
+    if partitions is not None:
+        starts = partitions.partitions()
+        return starts[0] if starts else None
+    with db_pool.connection() as conn:
+        return conn.execute('SELECT MIN(ts_ms) FROM kitchen_sensor_data').fetchone()[0]
+
+archive = ColumnArchive(
+    os.environ.get('KITCHEN_ARCHIVE_DIR', os.path.join(os.path.dirname(DB_PATH), 'kitchen_archive')),
+    'kitchen_sensor_data', ARCHIVE_COLUMNS, iter_raw_batches, oldest_ts_ms,
+    fmt=ARCHIVE_FORMAT, period=os.environ.get('KITCHEN_ARCHIVE_PERIOD', PARTITION_PERIOD or 'day'),
+    compression=os.environ.get('KITCHEN_ARCHIVE_COMPRESSION', 'zstd'),
+    interval=int(os.environ.get('KITCHEN_ARCHIVE_INTERVAL', 3600)),
+    changes=raw_changes
+) if ARCHIVE_FORMAT and archive_available() else None
 
 # 从数据库获取历史数据
+@lru_cache(maxsize=4096)
 def convert_to_local_iso(dt_str: str) -> str:
-    """将数据库中的时间字符串转换为北京时间 ISO 格式"""
+    """将数据库中的时间字符串转换为北京时间 ISO 格式（结果缓存，时区固定）"""
     if not dt_str:
         return None
 
@@ -115,66 +467,382 @@ def convert_to_local_iso(dt_str: str) -> str:
     return local_dt.isoformat(timespec='seconds')
 
 
-def get_history_from_db(limit=100, start_time_utc=None, end_time_utc=None):
-    """从数据库获取历史数据，并可选按时间范围过滤"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    base_query = '''
-        SELECT temperature, humidity, co, air_quality, sound, 
-               timestamp, device_id, created_at
-        FROM kitchen_sensor_data
-    '''
+# get_history_from_db 返回的字段，与查询列一一对应
+HISTORY_COLUMNS = [
+    'temperature', 'humidity', 'co', 'air_quality', 'sound',
+    'timestamp', 'device_id', 'created_at', 'created_at_local', 'created_at_local_ms'
+]
 
+# 历史数据查询列，与 HISTORY_COLUMNS 一一对应
+HISTORY_SELECT = f'''
+    temperature, humidity, co, air_quality, sound,
+    timestamp, device_id, created_at,
+    {LOCAL_ISO_SQL}, (ts_ms / 1000) * 1000
+'''
+
+def history_filters(start_time_utc=None, end_time_utc=None, device_id=None):
+    """历史数据的过滤条件，返回 (WHERE 子句, 参数列表)，无条件时子句为空字符串"""
     conditions = []
     params = []
 
+    if device_id:
+        conditions.append('device_id = ?')
+        params.append(device_id)
+
     if start_time_utc:
-        conditions.append('created_at >= ?')
-        params.append(start_time_utc.strftime('%Y-%m-%d %H:%M:%S'))
+        conditions.append('ts_ms >= ?')
+        params.append(int(start_time_utc.timestamp() * 1000))
 
     if end_time_utc:
-        conditions.append('created_at <= ?')
-        params.append(end_time_utc.strftime('%Y-%m-%d %H:%M:%S'))
+        conditions.append('ts_ms <= ?')
+        params.append(int(end_time_utc.timestamp() * 1000))
 
-    if conditions:
-        base_query += ' WHERE ' + ' AND '.join(conditions)
+    if not conditions:
+        return '', params
+    return ' WHERE ' + ' AND '.join(conditions), params
 
-    base_query += ' ORDER BY created_at DESC LIMIT ?'
+def range_ms(start_time_utc=None, end_time_utc=None):
+    """查询时间范围转换为毫秒（用于选择分区），未指定的一端为 None"""
+    start_ms = int(start_time_utc.timestamp() * 1000) if start_time_utc else None
+    end_ms = int(end_time_utc.timestamp() * 1000) if end_time_utc else None
+    return start_ms, end_ms
+
+def get_history_from_db(limit=100, start_time_utc=None, end_time_utc=None, device_id=None, columnar=False):
+    """从数据库获取历史数据，并可选按时间范围、设备过滤（走 ts_ms 索引）
+
+    北京时间字符串和毫秒时间戳由SQL根据 ts_ms 整体计算（精确到秒，与 created_at 一致）；
+    只有缺少 ts_ms 的旧数据才回退到逐行解析 created_at。
+    columnar=True 时直接转置为 {字段: 列表}，不为每行构造字典。
+    """
+    where, params = history_filters(start_time_utc, end_time_utc, device_id)
+    query = f'SELECT {HISTORY_SELECT} FROM kitchen_sensor_data{where} ORDER BY ts_ms DESC LIMIT ?'
     params.append(limit)
 
-    cursor.execute(base_query, params)
-    rows = cursor.fetchall()
-    conn.close()
-    
-    history = []
-    for row in reversed(rows):
-        created_at_raw = row[7]
-        created_at_local = convert_to_local_iso(created_at_raw)
+    if partitions is not None:
+        # 从最新的分区开始并行查询，凑够 limit 条后不再查更早的分区
+        parts = partitions.map(
+            lambda conn, _: conn.execute(query, params).fetchall(),
+            *range_ms(start_time_utc, end_time_utc),
+            newest_first=True, enough=lambda results: sum(map(len, results)) >= limit
+        )
+        rows = [row for part in parts for row in part][:limit]
+    else:
+        with db_pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+    rows.reverse()
+
+    if columnar:
+        if any(row[9] is None for row in rows):
+            rows = [row if row[9] is not None else legacy_row(row) for row in rows]
+        return rows_to_columns(rows, HISTORY_COLUMNS)
+
+    history = [dict(zip(HISTORY_COLUMNS, row)) for row in rows]
+
+    for item in history:
+        if item['created_at_local_ms'] is None:
+            fill_local_time(item)
+
+    return history
+
+def read_only_connection():
+    """流式响应用的独立只读连接（用 with 语句，结束时关闭）
+
+    流式响应可能在不同线程中逐批读取同一个游标（如 ASGI 入口的线程池），因此不限制线程。
+    """
+    return closing(sqlite3.connect(f'file:{DB_PATH}?mode=ro', uri=True, timeout=5, check_same_thread=False))
+
+def iter_history_from_db(limit=100, start_time_utc=None, end_time_utc=None, device_id=None):
+    """与 get_history_from_db 结果相同（按时间升序的最近 limit 条），但从游标逐批产出元组，供流式响应使用
+
+    先沿 ts_ms 索引找到第 limit 新的时间点，再从该点起升序读取，并跳过同一时刻多出的行；
+    排序和截取都走索引，不在内存中缓存结果集。使用独立的只读连接，慢速或停滞的客户端不占用连接池
+    （否则几个这样的请求就会耗尽连接池，阻塞写入）；生成器关闭（如客户端断开）时游标和连接随即关闭。
+    """
+    if limit <= 0:
+        return
+
+    where, params = history_filters(start_time_utc, end_time_utc, device_id)
+    if partitions is not None:
+        yield from iter_partitioned_history(limit, where, params, *range_ms(start_time_utc, end_time_utc))
+        return
 
-        local_timestamp_ms = None
-        if created_at_local:
+    with read_only_connection() as conn:
+        row = conn.execute(
+            f'SELECT ts_ms FROM kitchen_sensor_data{where} ORDER BY ts_ms DESC LIMIT 1 OFFSET ?',
+            params + [limit - 1]
+        ).fetchone()
+
+        if row is not None and row[0] is not None:
+            where += (' AND ' if where else ' WHERE ') + 'ts_ms >= ?'
+            params.append(row[0])
+
+        total = conn.execute(f'SELECT COUNT(*) FROM kitchen_sensor_data{where}', params).fetchone()[0]
+        cursor = conn.execute(
+            f'SELECT {HISTORY_SELECT} FROM kitchen_sensor_data{where} ORDER BY ts_ms LIMIT -1 OFFSET ?',
+            params + [max(total - limit, 0)]
+        )
+        try:
+            yield from iter_cursor(cursor)
+        finally:
+            cursor.close()
+
+def iter_partitioned_history(limit, where, params, start_ms, end_ms):
+    """分区存储时的 iter_history_from_db：先从最新分区往前并行计数，确定要读的分区，
+    再按时间升序逐个分区从游标产出，最早的分区跳过多出的行"""
+    count_sql = f'SELECT COUNT(*) FROM kitchen_sensor_data{where}'
+    counts = partitions.map(
+        lambda conn, start: (start, conn.execute(count_sql, params).fetchone()[0]),
+        start_ms, end_ms, newest_first=True,
+        enough=lambda results: sum(count for _, count in results) >= limit
+    )
+
+    selected = []
+    total = 0
+    for start, count in counts:
+        if total >= limit:
+            break
+        if count:
+            selected.append(start)
+            total += count
+
+    skip = max(total - limit, 0)
+    select_sql = f'SELECT {HISTORY_SELECT} FROM kitchen_sensor_data{where} ORDER BY ts_ms LIMIT -1 OFFSET ?'
+    for start in reversed(selected):
+        with partitions.connection(start) as conn:
+            if conn is None:
+                continue
+            cursor = conn.execute(select_sql, params + [skip])
+            skip = 0
             try:
-                local_dt = datetime.fromisoformat(created_at_local)
-                local_timestamp_ms = int(local_dt.timestamp() * 1000)
-            except ValueError:
-                pass
-
-        history.append({
-            'temperature': row[0],
-            'humidity': row[1],
-            'co': row[2],
-            'air_quality': row[3],
-            'sound': row[4],
-            'timestamp': row[5],
-            'device_id': row[6],
-            'created_at': created_at_raw,
-            'created_at_local': created_at_local,
-            'created_at_local_ms': local_timestamp_ms
-        })
-    
+                yield from iter_cursor(cursor)
+            finally:
+                cursor.close()
+
+# /api/export.csv 可导出的列 -> 查询表达式；ts_ms 为 UTC 毫秒时间，created_at_local 为北京时间
+EXPORT_COLUMNS = {
+    'ts_ms': 'ts_ms',
+    'created_at': 'created_at',
+    'created_at_local': LOCAL_ISO_SQL,
+    'device_id': 'device_id',
+    **{m: m for m in METRICS},
+    'timestamp': 'timestamp',
+}
+EXPORT_DEFAULT_COLUMNS = ['ts_ms', 'created_at_local', 'device_id'] + METRICS
+
+def iter_export_lines(columns, start_time_utc=None, end_time_utc=None, device_id=None, batch_rows=EXPORT_FETCH_SIZE):
+    """按时间升序逐批产出原始数据的 CSV 行（在 SQL 中拼接好的单列元组，列顺序与 columns 一致），不限行数
+
+    单库时使用独立的只读连接（长时间的导出不占用连接池），分区存储时依次读取各分区；
+    生成器关闭（如客户端断开）时游标和连接随即关闭。
+    """
+    where, params = history_filters(start_time_utc, end_time_utc, device_id)
+    query = f'''
+        SELECT {csv_line_sql([EXPORT_COLUMNS[c] for c in columns], quoted=('device_id',))}
+        FROM kitchen_sensor_data{where} ORDER BY ts_ms
+    '''
+    if partitions is not None:
+        for start in partitions.partitions(*range_ms(start_time_utc, end_time_utc)):
+            with partitions.connection(start) as conn:
+                if conn is None:
+                    continue
+                cursor = conn.execute(query, params)
+                try:
+                    yield from iter_cursor(cursor, batch_rows)
+                finally:
+                    cursor.close()
+        return
+
+    with read_only_connection() as conn:
+        cursor = conn.execute(query, params)
+        try:
+            yield from iter_cursor(cursor, batch_rows)
+        finally:
+            cursor.close()
+
+def history_row_to_item(row):
+    """把查询结果元组转换为与 get_history_from_db 相同的字典"""
+    item = dict(zip(HISTORY_COLUMNS, row))
+    if item['created_at_local_ms'] is None:
+        fill_local_time(item)
+    return item
+
+def legacy_row(row):
+    """缺少 ts_ms 的旧数据行：补上北京时间后按 HISTORY_COLUMNS 顺序返回元组"""
+    item = dict(zip(HISTORY_COLUMNS, row))
+    fill_local_time(item)
+    return tuple(item[c] for c in HISTORY_COLUMNS)
+
+def fill_local_time(item):
+    """缺少 ts_ms 的旧数据：解析 created_at 得到北京时间字符串和毫秒时间戳"""
+    created_at_local = convert_to_local_iso(item['created_at'])
+    item['created_at_local'] = created_at_local
+
+    if created_at_local:
+        try:
+            local_dt = datetime.fromisoformat(created_at_local)
+            item['created_at_local_ms'] = int(local_dt.timestamp() * 1000)
+        except ValueError:
+            pass
+
+def get_bucketed_history_from_db(bucket_ms, start_time_utc=None, end_time_utc=None, device_id=None):
+    """按时间桶聚合历史数据，每个桶返回各指标的 avg/min/max
+
+    桶大小是某个汇总表粒度的整数倍时读汇总表，否则在SQL中聚合原始数据。
+    """
+    start_ms = int(start_time_utc.timestamp() * 1000) if start_time_utc else None
+    end_ms = int(end_time_utc.timestamp() * 1000) if end_time_utc else None
+    level = rollups.pick_level(bucket_ms)
+
+    if level:
+        with db_pool.connection() as conn:
+            rows = rollups.query(conn, level[0], bucket_ms, start_ms, end_ms, device_id)
+    elif partitions is not None:
+        rows = get_partitioned_buckets(bucket_ms, start_ms, end_ms, device_id)
+    else:
+        aggregates = ', '.join(
+            f'AVG({m}), MIN({m}), MAX({m})' for m in METRICS
+        )
+        query = f'''
+            SELECT (ts_ms / ?) * ? AS bucket_start, COUNT(*), {aggregates}
+            FROM kitchen_sensor_data
+            WHERE ts_ms IS NOT NULL
+        '''
+        params = [bucket_ms, bucket_ms]
+
+        if device_id:
+            query += ' AND device_id = ?'
+            params.append(device_id)
+
+        if start_ms is not None:
+            query += ' AND ts_ms >= ?'
+            params.append(start_ms)
+
+        if end_ms is not None:
+            query += ' AND ts_ms <= ?'
+            params.append(end_ms)
+
+        query += ' GROUP BY bucket_start ORDER BY bucket_start'
+
+        with db_pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+    history = []
+    for row in rows:
+        bucket_start = row[0]
+        item = {
+            'device_id': device_id,
+            'count': row[1],
+            'bucket_ms': bucket_ms,
+            'source': f'rollup_{level[0]}' if level else 'raw',
+            'created_at_local': datetime.fromtimestamp(bucket_start / 1000, LOCAL_TZ).isoformat(timespec='seconds'),
+            'created_at_local_ms': bucket_start
+        }
+        for i, metric in enumerate(METRICS):
+            avg_value, min_value, max_value = row[2 + i * 3:5 + i * 3]
+            item[metric] = round(avg_value, 2) if avg_value is not None else None
+            item[f'{metric}_min'] = min_value
+            item[f'{metric}_max'] = max_value
+        history.append(item)
+
     return history
 
+def get_partitioned_buckets(bucket_ms, start_ms=None, end_ms=None, device_id=None):
+    """分区存储时在各分区上并行按桶聚合，再合并同一个桶的部分结果（桶可能跨分区）
+
+    返回行格式与原始表聚合相同：(bucket_start, count, 指标1 avg, min, max, ...)
+    """
+    aggregates = ', '.join(f'SUM({m}), COUNT({m}), MIN({m}), MAX({m})' for m in METRICS)
+    query = f'''
+        SELECT (ts_ms / ?) * ? AS bucket_start, COUNT(*), {aggregates}
+        FROM kitchen_sensor_data
+        WHERE ts_ms IS NOT NULL
+    '''
+    params = [bucket_ms, bucket_ms]
+    if device_id:
+        query += ' AND device_id = ?'
+        params.append(device_id)
+    if start_ms is not None:
+        query += ' AND ts_ms >= ?'
+        params.append(start_ms)
+    if end_ms is not None:
+        query += ' AND ts_ms <= ?'
+        params.append(end_ms)
+    query += ' GROUP BY bucket_start'
+
+    merged = {}
+    for part in partitions.map(lambda conn, _: conn.execute(query, params).fetchall(), start_ms, end_ms):
+        for row in part:
+            acc = merged.get(row[0])
+            if acc is None:
+                merged[row[0]] = list(row[1:])
+                continue
+            acc[0] += row[1]
+            for i in range(len(METRICS)):
+                base = 1 + i * 4
+                total, count, low, high = row[1 + base:5 + base]
+                if count:
+                    acc[base] = (acc[base] or 0) + total
+                    acc[base + 1] += count
+                    acc[base + 2] = low if acc[base + 2] is None else min(acc[base + 2], low)
+                    acc[base + 3] = high if acc[base + 3] is None else max(acc[base + 3], high)
+
+    rows = []
+    for bucket_start in sorted(merged):
+        acc = merged[bucket_start]
+        row = [bucket_start, acc[0]]
+        for i in range(len(METRICS)):
+            total, count, low, high = acc[1 + i * 4:5 + i * 4]
+            row.extend([total / count if count else None, low, high])
+        rows.append(row)
+    return rows
+
+def get_time_span_ms(start_time_utc=None, end_time_utc=None, device_id=None):
+    """查询范围内实际数据的时间跨度（毫秒），MIN/MAX 直接走 ts_ms 索引"""
+    query = 'SELECT MIN(ts_ms), MAX(ts_ms) FROM kitchen_sensor_data WHERE ts_ms IS NOT NULL'
+    params = []
+
+    if device_id:
+        query += ' AND device_id = ?'
+        params.append(device_id)
+
+    if start_time_utc:
+        query += ' AND ts_ms >= ?'
+        params.append(int(start_time_utc.timestamp() * 1000))
+
+    if end_time_utc:
+        query += ' AND ts_ms <= ?'
+        params.append(int(end_time_utc.timestamp() * 1000))
+
+    if partitions is not None:
+        # 最早的时间只需从最早的分区往后找到第一个有数据的分区，最晚的时间同理从最新的分区往前找
+        def first_span(newest_first):
+            spans = partitions.map(
+                lambda conn, _: conn.execute(query, params).fetchone(), *range_ms(start_time_utc, end_time_utc),
+                newest_first=newest_first, enough=lambda results: any(s[0] is not None for s in results)
+            )
+            return [s for s in spans if s[0] is not None]
+        start_ms = min((s[0] for s in first_span(False)), default=None)
+        end_ms = max((s[1] for s in first_span(True)), default=None)
+    else:
+        with db_pool.connection() as conn:
+            start_ms, end_ms = conn.execute(query, params).fetchone()
+
+    if start_ms is None:
+        return 0
+    return end_ms - start_ms
+
+def lttb_downsample(history, max_points):
+    """对每个指标分别做LTTB，保留任一指标选中的点（结果不超过 max_points × 指标数）"""
+    if len(history) <= max_points:
+        return history
+
+    xs = [item['created_at_local_ms'] or 0 for item in history]
+    keep = set()
+    for metric in METRICS:
+        ys = [item[metric] for item in history]
+        keep.update(lttb_indices(xs, ys, max_points))
+    return [history[i] for i in sorted(keep)]
+
 @app.route('/')
 def index():
     """主页 - 显示Web界面"""
@@ -189,24 +857,20 @@ def receive_sensor_data():
         if not data:
             return jsonify({'error': 'No data received'}), 400
         
-        # 验证数据格式
-        required_fields = ['temperature', 'humidity', 'co', 'air_quality', 'sound', 'timestamp', 'device_id']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing field: {field}'}), 400
-        
-        # 更新全局数据
-        global latest_data
-        latest_data.update(data)
-        latest_data['last_update'] = datetime.now(LOCAL_TZ).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 添加到历史数据
-        data_history.append(data.copy())
-        if len(data_history) > max_history:
-            data_history.pop(0)
+        # 验证字段与类型（入队之前：类型错误的行一旦入队，整批写入都会失败）
+        try:
+            data = READING_SCHEMA.normalize(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # 保存到数据库
-        save_to_database(data)
+        # 入队等待批量落库，队列已满时通知设备稍后重试
+        if not write_buffer.submit(reading_to_row(data)):
+            response = jsonify({'error': 'Server busy, retry later'})
+            response.headers['Retry-After'] = '1'
+            return response, 429
+
+        # 更新最新数据和内存热窗口
+        update_state([data])
         
         print(f"收到数据: T={data['temperature']}°C, H={data['humidity']}%, "
               f"CO={data['co']}ppm, AQ={data['air_quality']}, Sound={data['sound']}%")
@@ -221,10 +885,88 @@ def receive_sensor_data():
         print(f"处理数据时出错: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/sensor-data/batch', methods=['POST'])
+def receive_sensor_data_batch():
+    """批量接收传感器数据（JSON数组或NDJSON），一个事务写入"""
+    try:
+        try:
+            items = read_batch(request)
+        except BatchTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        valid, errors = validate_batch(items, READING_SCHEMA)
+
+        if valid:
+            save_batch_to_database([reading_to_row(data) for data in valid])
+            update_state(valid)
+
+        print(f"批量收到数据: 接受 {len(valid)} 条, 拒绝 {len(errors)} 条")
+
+        return jsonify({
+            'status': 'success' if valid else 'error',
+            'accepted': len(valid),
+            'rejected': len(errors),
+            'errors': errors,
+            'timestamp': int(time.time())
+        }), 200 if valid else 400
+
+    except Exception as e:
+        print(f"处理批量数据时出错: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def snapshot_response(snapshot):
+    """直接返回预编码的最新数据；客户端 If-None-Match 与 ETag 一致时返回 304"""
+    # no-cache：允许浏览器缓存，但每次都要带 ETag 向服务器验证
+    headers = [('ETag', snapshot.etag), ('Cache-Control', 'no-cache')]
+    if snapshot.matches(request.headers.get('If-None-Match')):
+        return Response(status=304, headers=headers)
+    return Response(snapshot.body, mimetype='application/json', headers=headers)
+
 @app.route('/api/current-data')
 def get_current_data():
-    """获取当前最新数据"""
-    return jsonify(latest_data)
+    """获取当前最新数据，指定 device_id 时返回该设备的最新数据
+
+    数据在入库时已编码好，这里不再序列化；支持 ETag / If-None-Match，数据未变化时返回 304
+    """
+    device_id = request.args.get('device_id', default=None, type=str)
+    snapshot = state.snapshot(device_id)
+    if snapshot is None:
+        return jsonify({'error': f'Unknown device: {device_id}'}), 404
+    return snapshot_response(snapshot)
+
+@app.route('/api/stream')
+def stream_data():
+    """SSE推送最新数据（event: reading），连接后先发送一次当前数据；可按 device_id 过滤"""
+    device_id = request.args.get('device_id', default=None, type=str)
+
+    def snapshot():
+        latest = state.latest(device_id)
+        return [('reading', latest)] if latest else []
+
+    return Response(
+        broadcaster.stream(device_id, snapshot),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/devices')
+def get_devices():
+    """列出已上报过数据的设备及其最新数据、热窗口条数"""
+    device_latest = state.device_latest()
+    window_counts = state.window_counts()
+    devices = []
+    for device_id in sorted(device_latest):
+        latest = device_latest[device_id]
+        devices.append({
+            'device_id': device_id,
+            'last_update': latest.get('last_update'),
+            'latest': {m: latest.get(m) for m in METRICS},
+            'window_records': window_counts.get(device_id, 0),
+            'window_seconds': state.window_seconds_for(device_id)
+        })
+    return jsonify({'count': len(devices), 'devices': devices})
 
 @app.route('/api/history')
 def get_history():
@@ -232,6 +974,7 @@ def get_history():
     limit = request.args.get('limit', 100, type=int)
     range_type = request.args.get('range_type', default=None, type=str)
     range_value = request.args.get('range_value', default=None, type=int)
+    device_id = request.args.get('device_id', default=None, type=str)
 
     start_time_utc = None
 
@@ -249,42 +992,210 @@ def get_history():
         if delta:
             start_time_utc = datetime.now(timezone.utc) - delta
 
-    history = get_history_from_db(limit, start_time_utc=start_time_utc)
-    return jsonify(history)
+    # 降采样：bucket 指定时间桶，max_points 指定最多返回的点数
+    bucket_ms = parse_bucket(request.args.get('bucket', default=None, type=str))
+    max_points = request.args.get('max_points', default=None, type=int)
+    method = request.args.get('method', default='bucket', type=str).lower()
+
+    # 输出格式：rows（默认，字典列表）、columnar（按列的JSON）、binary（float32二进制）
+    fmt = request.args.get('format', default='rows', type=str).lower()
+    if fmt not in FORMATS:
+        return jsonify({'error': f'Unknown format: {fmt}, expected one of {", ".join(FORMATS)}'}), 400
+
+    if max_points and max_points > 0 and method == 'lttb':
+        history = get_history_from_db(LTTB_SOURCE_LIMIT, start_time_utc=start_time_utc, device_id=device_id)
+        return history_response(fmt, lttb_downsample(history, max_points), METRICS)
+
+    if not bucket_ms and max_points and max_points > 0:
+        span_ms = get_time_span_ms(start_time_utc, device_id=device_id)
+        bucket_ms = choose_bucket_ms(span_ms, max_points)
+
+    if bucket_ms:
+        history = get_bucketed_history_from_db(bucket_ms, start_time_utc=start_time_utc, device_id=device_id)
+        return history_response(fmt, history, BUCKET_FIELDS)
+
+    if fmt == 'rows':
+        # 原始数据逐批从游标编码输出，内存占用与 limit 无关
+        rows = iter_history_from_db(limit, start_time_utc=start_time_utc, device_id=device_id)
+        return stream_json_response(iter_json_array(rows, history_row_to_item))
+
+    columns = get_history_from_db(limit, start_time_utc=start_time_utc, device_id=device_id, columnar=True)
+    return columns_response(fmt, columns, METRICS)
+
+# 按时间桶返回时，列式输出额外包含每个桶的条数和各指标的最小/最大值
+BUCKET_FIELDS = METRICS + ['count'] + [f'{m}_{agg}' for m in METRICS for agg in ('min', 'max')]
+
+def history_response(fmt, history, fields):
+    """按请求的格式输出字典列表形式的历史数据"""
+    if fmt == 'rows':
+        return compress_response(jsonify(history))
+    return columns_response(fmt, records_to_columns(history, ['created_at_local_ms'] + fields), fields)
+
+def columns_response(fmt, columns, fields):
+    """输出列式数据：ts 为毫秒时间戳，其余每个字段一列"""
+    ts = columns['created_at_local_ms']
+    if fmt == 'binary':
+        body = encode_binary(ts, [(f, columns[f]) for f in fields])
+        return compress_response(Response(body, mimetype='application/octet-stream'))
+
+    payload = {'format': 'columnar', 'length': len(ts), 'ts': ts}
+    for f in fields:
+        payload[f] = columns[f]
+    return compress_response(jsonify(payload))
+
+def stream_json_response(chunks):
+    """流式输出JSON片段，按 Accept-Encoding 边生成边压缩（分块传输，无 Content-Length）"""
+    return stream_response(chunks, 'application/json')
+
+def stream_response(chunks, mimetype, headers=None):
+    """流式输出 bytes 片段，按 Accept-Encoding 边生成边压缩（分块传输，无 Content-Length）"""
+    headers = list(headers or []) + [('Vary', 'Accept-Encoding')]
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        chunks = compress_chunks(chunks, encoding)
+        headers.append(('Content-Encoding', encoding))
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+def compress_response(response):
+    """按 Accept-Encoding 压缩已生成的完整响应体（过小的响应不压缩）"""
+    response.vary.add('Accept-Encoding')
+    body, encoding = encode_body(response.get_data(), negotiate_encoding(request.headers.get('Accept-Encoding')))
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
 
 @app.route('/api/stats')
 def get_stats():
-    """获取统计信息"""
-    if not data_history:
+    """获取统计信息
+
+    默认统计内存热窗口（HOT_WINDOW_SECONDS）；window_seconds 超过热窗口时由1分钟汇总表计算。
+    指定 device_id 时只统计该设备。
+    """
+    window_seconds = request.args.get('window_seconds', default=None, type=int)
+    device_id = request.args.get('device_id', default=None, type=str)
+    hot_seconds = state.window_seconds_for(device_id) if device_id is not None else HOT_WINDOW_SECONDS
+
+    if window_seconds and window_seconds > hot_seconds:
+        start_ms = int(time.time() * 1000) - window_seconds * 1000
+        with db_pool.connection() as conn:
+            totals = rollups.totals(conn, '1m', start_ms=start_ms, device_id=device_id)
+        count = totals['count']
+        summaries = {m: totals[m] for m in METRICS}
+        source = 'rollup_1m'
+    else:
+        count, summaries = state.stats(METRICS, device_id)
+        source = 'memory'
+        window_seconds = hot_seconds
+
+    if not count:
         return jsonify({
             'total_records': 0,
             'avg_temperature': 0,
             'avg_humidity': 0,
             'avg_co': 0,
             'avg_air_quality': 0,
-            'avg_sound': 0
+            'avg_sound': 0,
+            'window_seconds': window_seconds,
+            'source': source
         })
     
-    temperatures = [d['temperature'] for d in data_history]
-    humidities = [d['humidity'] for d in data_history]
-    co_values = [d['co'] for d in data_history]
-    air_quality_values = [d['air_quality'] for d in data_history]
-    sound_values = [d['sound'] for d in data_history]
-    
+    st = summaries
+    return jsonify({
+        'total_records': count,
+        'avg_temperature': round(st['temperature']['avg'], 2),
+        'avg_humidity': round(st['humidity']['avg'], 2),
+        'avg_co': round(st['co']['avg'], 2),
+        'avg_air_quality': round(st['air_quality']['avg'], 2),
+        'avg_sound': round(st['sound']['avg'], 2),
+        'min_temperature': round(st['temperature']['min'], 2),
+        'max_temperature': round(st['temperature']['max'], 2),
+        'min_humidity': round(st['humidity']['min'], 2),
+        'max_humidity': round(st['humidity']['max'], 2),
+        'max_co': round(st['co']['max'], 2),
+        'max_air_quality': round(st['air_quality']['max'], 2),
+        'std_temperature': round(st['temperature']['std'], 2),
+        'std_humidity': round(st['humidity']['std'], 2),
+        'std_co': round(st['co']['std'], 2),
+        'std_air_quality': round(st['air_quality']['std'], 2),
+        'std_sound': round(st['sound']['std'], 2),
+        'window_seconds': window_seconds,
+        'source': source,
+        'last_update': (state.latest(device_id) or {}).get('last_update', 'Never')
+    })
+
+@app.route('/api/memory')
+def get_memory():
+    """内存热窗口的占用情况（每个设备的条数、容量、字节数）"""
+    report = state.memory_report()
+    report['write_buffer_pending'] = write_buffer.pending
+    report['write_buffer_dropped'] = write_buffer.dropped_rows
+    report['stream_clients'] = broadcaster.subscriber_count
+    report['stream_dropped_clients'] = broadcaster.dropped_clients
+    report['line_ingest'] = line_server.stats()
+    report['serial_ingest'] = serial_daemon.stats()
+    report['retention'] = retention.stats()
+    if partitions is not None:
+        report['partitions'] = partitions.stats()
+    if archive is not None:
+        report['archive'] = archive.stats()
+    return jsonify(report)
+
+@app.route('/api/export.csv')
+def export_csv():
+    """流式导出原始数据为 CSV（按时间升序，不限行数，内存占用与行数无关）
+
+    start、end 为 UTC 日期 YYYY-MM-DD 或 ISO 8601 时间（含两端），device_id 过滤设备，
+    columns 为逗号分隔的列名（可选列见 EXPORT_COLUMNS）。
+    """
+    try:
+        columns = parse_columns(request.args.get('columns'), EXPORT_COLUMNS, EXPORT_DEFAULT_COLUMNS)
+        start_time_utc = parse_time(request.args.get('start'))
+        end_time_utc = parse_time(request.args.get('end'), end=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    device_id = request.args.get('device_id', default=None, type=str)
+
+    rows = iter_export_lines(columns, start_time_utc, end_time_utc, device_id)
+    return stream_response(iter_csv(columns, rows), 'text/csv',
+                           [('Content-Disposition', 'attachment; filename=kitchen_sensor_data.csv')])
+
+@app.route('/api/export')
+def export_archive():
+    """列出列式归档文件，或下载其中一个文件（file=文件名）
+
+    start、end 为 UTC 日期 YYYY-MM-DD（含），只列出与该范围重叠的文件。
+    """
+    if archive is None:
+        return jsonify({'error': 'Archive export is not enabled, set KITCHEN_ARCHIVE=parquet or arrow '
+                                 '(requires pyarrow)'}), 404
+
+    name = request.args.get('file', default=None, type=str)
+    if name:
+        if not archive.has_file(name):
+            return jsonify({'error': f'Unknown archive file: {name}'}), 404
+        return send_from_directory(archive.directory, name, mimetype=ARCHIVE_MIMETYPES[archive.fmt],
+                                   as_attachment=True)
+
+    try:
+        start = request.args.get('start', default=None, type=str)
+        end = request.args.get('end', default=None, type=str)
+        start_ms = parse_day_ms(start) if start else None
+        end_ms = parse_day_ms(end, end=True) if end else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates in YYYY-MM-DD format (UTC)'}), 400
+
+    files = archive.files(start_ms, end_ms)
+    for f in files:
+        f['url'] = f"/api/export?file={f['file']}"
     return jsonify({
-        'total_records': len(data_history),
-        'avg_temperature': round(sum(temperatures) / len(temperatures), 2),
-        'avg_humidity': round(sum(humidities) / len(humidities), 2),
-        'avg_co': round(sum(co_values) / len(co_values), 2),
-        'avg_air_quality': round(sum(air_quality_values) / len(air_quality_values), 2),
-        'avg_sound': round(sum(sound_values) / len(sound_values), 2),
-        'min_temperature': round(min(temperatures), 2),
-        'max_temperature': round(max(temperatures), 2),
-        'min_humidity': round(min(humidities), 2),
-        'max_humidity': round(max(humidities), 2),
-        'max_co': round(max(co_values), 2),
-        'max_air_quality': round(max(air_quality_values), 2),
-        'last_update': latest_data.get('last_update', 'Never')
+        'format': archive.fmt,
+        'period': archive.period,
+        'archived_until': archive.archived_until,
+        'count': len(files),
+        'rows': sum(f['rows'] for f in files),
+        'bytes': sum(f['bytes'] for f in files),
+        'files': files
     })
 
 # 创建模板目录和文件
@@ -682,6 +1593,7 @@ def create_templates():
     <script>
         let tempHumChart, gasChart, soundChart;
         let autoRefreshInterval;
+        let eventSource = null;
         let isAutoRefresh = true;
         
         // 初始化图表
@@ -814,7 +1726,7 @@ def create_templates():
         // 获取历史数据
         async function fetchHistory() {
             try {
-                const response = await fetch('/api/history?limit=50');
+                const response = await fetch('/api/history?limit=50&format=columnar');
                 const data = await response.json();
                 return data;
             } catch (error) {
@@ -894,16 +1806,16 @@ def create_templates():
             }
         }
         
-        // 更新图表
+        // 更新图表（history 为列式数据，每个指标已是一个数组）
         function updateCharts(history) {
             if (!history.length) return;
             
-            const labels = history.map((_, index) => index);
-            const temperatures = history.map(d => d.temperature);
-            const humidities = history.map(d => d.humidity);
-            const coValues = history.map(d => d.co);
-            const aqValues = history.map(d => d.air_quality);
-            const soundValues = history.map(d => d.sound);
+            const labels = history.ts.map((_, index) => index);
+            const temperatures = history.temperature;
+            const humidities = history.humidity;
+            const coValues = history.co;
+            const aqValues = history.air_quality;
+            const soundValues = history.sound;
             
             // 更新温湿度图表
             if (tempHumChart) {
@@ -929,19 +1841,51 @@ def create_templates():
             }
         }
         
+        // 订阅服务器推送（SSE），浏览器不支持时退回每3秒轮询
+        function startLiveUpdates() {
+            stopLiveUpdates();
+
+            if (!window.EventSource) {
+                refreshData();
+                autoRefreshInterval = setInterval(refreshData, 3000);
+                return;
+            }
+
+            eventSource = new EventSource('/api/stream');
+            eventSource.addEventListener('reading', function(event) {
+                updateDisplay(JSON.parse(event.data));
+            });
+            eventSource.onerror = function() {
+                // EventSource 会自动重连
+                document.getElementById('connectionStatus').textContent = '重连中...';
+                document.getElementById('connectionStatus').className = 'status-value disconnected';
+            };
+        }
+
+        function stopLiveUpdates() {
+            if (eventSource) {
+                eventSource.close();
+                eventSource = null;
+            }
+            if (autoRefreshInterval) {
+                clearInterval(autoRefreshInterval);
+                autoRefreshInterval = null;
+            }
+        }
+
         // 切换自动刷新
         function toggleAutoRefresh() {
             if (isAutoRefresh) {
-                clearInterval(autoRefreshInterval);
+                stopLiveUpdates();
                 isAutoRefresh = false;
                 document.querySelector('button[onclick="toggleAutoRefresh()"]').textContent = '🚀 开始自动刷新';
                 document.getElementById('autoRefreshStatus').textContent = '已停止';
                 document.getElementById('autoRefreshStatus').className = 'status-value disconnected';
             } else {
-                autoRefreshInterval = setInterval(refreshData, 3000);
+                startLiveUpdates();
                 isAutoRefresh = true;
                 document.querySelector('button[onclick="toggleAutoRefresh()"]').textContent = '⏹️ 停止自动刷新';
-                document.getElementById('autoRefreshStatus').textContent = '每3秒刷新';
+                document.getElementById('autoRefreshStatus').textContent = '实时推送';
                 document.getElementById('autoRefreshStatus').className = 'status-value auto-refresh pulse';
             }
         }
@@ -949,18 +1893,15 @@ def create_templates():
         // 页面加载时初始化
         window.addEventListener('load', function() {
             initCharts();
-            refreshData();
             loadHistory();
             
-            // 启动自动刷新
-            autoRefreshInterval = setInterval(refreshData, 3000);
+            // 订阅实时推送（连接后服务器立即发送当前数据）
+            startLiveUpdates();
         });
         
         // 页面关闭时清理
         window.addEventListener('beforeunload', function() {
-            if (autoRefreshInterval) {
-                clearInterval(autoRefreshInterval);
-            }
+            stopLiveUpdates();
         });
     </script>
 </body>
@@ -976,11 +1917,73 @@ def create_templates():
         print(f"HTML模板文件已存在: {template_path}")
 
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='厨房空气质量监测系统 - Python Web服务器')
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help='从原始数据重建1分钟/1小时/1天汇总表后退出')
+    parser.add_argument('--apply-retention', type=float, metavar='DAYS',
+                        help='删除早于 DAYS 天的原始数据并增量整理数据库文件，报告回收字节数后退出')
+    parser.add_argument('--migrate-partitions', action='store_true',
+                        help='把主库中的原始数据迁移到分区文件后退出（需设置 KITCHEN_PARTITIONS）')
+    parser.add_argument('--archive', action='store_true',
+                        help='把已结束的时间段归档为列式文件后退出（需设置 KITCHEN_ARCHIVE）')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='把已有数据库切换为增量 VACUUM 模式（完整重写数据库文件，请先停止服务器）后退出')
+    args = parser.parse_args()
+
     # 初始化数据库
     init_database()
+
+    if args.rebuild_rollups:
+        rebuild_rollups()
+        raise SystemExit(0)
+
+    if args.migrate_partitions:
+        if partitions is None:
+            print("未启用分区存储，请设置环境变量 KITCHEN_PARTITIONS=day 或 week")
+            raise SystemExit(1)
+        print(f"迁移完成，共 {migrate_to_partitions()} 条，可运行 --apply-retention 或 --enable-incremental-vacuum 回收主库空间")
+        raise SystemExit(0)
+
+    if args.archive:
+        if archive is None:
+            print("未启用列式归档，请设置环境变量 KITCHEN_ARCHIVE=parquet 或 arrow 并安装 pyarrow")
+            raise SystemExit(1)
+        report = archive.run_once()
+        print(f"列式归档: {report}")
+        raise SystemExit(1 if report.get('error') else 0)
+
+    if args.enable_incremental_vacuum:
+        with db_pool.connection() as conn:
+            before, after = enable_incremental_vacuum(conn)
+        print(f"已切换为增量 VACUUM 模式: {before} -> {after} 字节")
+        raise SystemExit(0)
+
+    if args.apply_retention is not None:
+        retention.retention_days = args.apply_retention
+        if archive is not None:
+            # 先归档，删除检查要求过期数据已归档
+            print(f"列式归档: {archive.run_once()}")
+        report = retention.run_once()
+        print(f"数据保留: {report}")
+        raise SystemExit(1 if report.get('error') or report['skipped'] else 0)
     
     # 创建模板文件
     create_templates()
+
+    # 启动后台批量写入线程（退出时自动刷写剩余数据）
+    write_buffer.start()
+
+    # 行协议监听和串口：debug=True 时重载器会再启动一个子进程运行本脚本，只在实际处理请求的子进程中打开
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if LINE_PORT:
+            line_server.start()
+        serial_daemon.start()
+        if RETENTION_DAYS:
+            retention.start()
+        if archive is not None:
+            archive.start()
     
     print("=" * 60)
     print("厨房空气质量监测系统 - Python Web服务器（多传感器版本）")
@@ -995,9 +1998,23 @@ if __name__ == '__main__':
     print("Web界面访问地址: http://localhost:5001")
     print("API接口:")
     print("  - POST /api/sensor-data (Arduino发送数据)")
-    print("  - GET  /api/current-data (获取当前数据)")
+    print("  - POST /api/sensor-data/batch (批量上报，JSON数组或NDJSON)")
+    print("  - GET  /api/current-data (获取当前数据，可按 device_id 过滤)")
+    print("  - GET  /api/stream (SSE实时推送)")
+    print("  - GET  /api/devices (设备列表)")
     print("  - GET  /api/history (获取历史数据)")
     print("  - GET  /api/stats (获取统计信息)")
+    print("  - GET  /api/memory (内存热窗口占用)")
+    print("  - GET  /api/export (列式归档文件列表与下载)")
+    print("  - GET  /api/export.csv (流式导出原始数据为CSV)")
+    if LINE_PORT:
+        print(f"行协议上报: UDP/TCP {LINE_HOST}:{LINE_PORT}（CSV 或 InfluxDB 行协议，无认证）")
+    if SERIAL_PORTS:
+        print(f"串口上报: {', '.join(SERIAL_PORTS)}")
+    if RETENTION_DAYS:
+        print(f"数据保留: 原始数据保留 {RETENTION_DAYS:g} 天（汇总表保留全部）")
+    if archive is not None:
+        print(f"列式归档: {archive.fmt} 格式，每{'天' if archive.period == 'day' else '周'}一个文件，目录 {archive.directory}")
     print("=" * 60)
     
     # 启动Flask服务器
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量行协议上报 - UDP/TCP 监听
+功能：Arduino 不再需要拼 HTTP 请求和 JSON，每条读数一行文本发到 UDP 或 TCP 端口即可；
+解析后与 HTTP 上报走同一条入库路径（写后缓冲 + 内存状态），一个数据报/一次读取中的多行作为一批处理
+
+支持两种行格式（按行自动识别，空行和 # 开头的行忽略；第一个空格之后紧跟 name=value 字段的为 InfluxDB 行协议，
+其余按 CSV 解析，因此 CSV 的 device_id 中可以有空格）：
+  1. CSV，列顺序由服务器配置，例如厨房版：
+       kitchen_01,123456,23.4,56.7,12,88,31
+       （device_id,timestamp,temperature,humidity,co,air_quality,sound）
+  2. InfluxDB 行协议（不支持转义，标签和字段值中不能有空格、逗号）：
+       kitchen,device_id=kitchen_01 temperature=23.4,humidity=56.7,co=12i,air_quality=88,sound=31 123456
+       末尾的时间戳对应 timestamp 字段（设备的 millis()），也可以写成 timestamp=123456 字段
+"""
+
+import select
+import socket
+import socketserver
+import threading
+
+# UDP 一次最多合并处理的已到达数据报数
+UDP_DRAIN = 256
+
+
+class LineParser:
+    """把一行文本解析为与 HTTP 上报相同的读数字典"""
+
+    def __init__(self, fields, metrics, required_fields):
+        """初始化
+
+        Args:
+            fields: CSV 的列顺序，必须包含 device_id；其中 device_id 为字符串、timestamp 为整数，其余按浮点数解析
+            metrics: InfluxDB 行协议中接受的数值字段
+            required_fields: 解析结果必须包含的字段
+        """
+        self.fields = tuple(fields)
+        self.metrics = frozenset(metrics)
+        self.required_fields = tuple(required_fields)
+        self._converters = tuple(self._converter(name) for name in self.fields)
+
+    @staticmethod
+    def _converter(name):
+        if name == 'device_id':
+            return bytes.decode
+        if name == 'timestamp':
+            return int
+        return float
+
+    def parse_csv(self, line):
+        """CSV 快速路径：一次 split，数值直接由 bytes 转换，不经过正则和中间字符串"""
+        parts = line.split(b',')
+        if len(parts) != len(self.fields):
+            raise ValueError(f'Expected {len(self.fields)} columns, got {len(parts)}')
+        return {name: convert(value) for name, convert, value in zip(self.fields, self._converters, parts)}
+
+    def parse_influx(self, line):
+        """InfluxDB 行协议：measurement[,tag=value...] field=value[,field=value...] [timestamp]"""
+        parts = line.split()
+        if len(parts) not in (2, 3):
+            raise ValueError('Expected "measurement,tags fields [timestamp]"')
+
+        reading = {}
+        for tag in parts[0].split(b',')[1:]:
+            key, _, value = tag.partition(b'=')
+            if key == b'device_id':
+                reading['device_id'] = value.decode()
+
+        for field in parts[1].split(b','):
+            key, _, value = field.partition(b'=')
+            name = key.decode()
+            if name in self.metrics:
+                reading[name] = float(value.rstrip(b'i'))
+            elif name == 'timestamp':
+                reading[name] = int(value.rstrip(b'i'))
+            elif name == 'device_id':
+                reading[name] = value.strip(b'"').decode()
+
+        if len(parts) == 3:
+            reading['timestamp'] = int(parts[2])
+
+        for field in self.required_fields:
+            if field not in reading:
+                raise ValueError(f'Missing field: {field}')
+        return reading
+
+    def parse(self, line):
+        """解析一行（bytes，不含换行符）"""
+        _, space, rest = line.strip().partition(b' ')
+        if space and b'=' in rest.split(b',', 1)[0]:
+            return self.parse_influx(line)
+        return self.parse_csv(line)
+
+    def parse_many(self, data):
+        """解析多行文本，返回 (读数列表, 被拒绝的行数, 最后一个错误或None)"""
+        readings = []
+        rejected = 0
+        error = None
+        for line in data.splitlines():
+            line = line.strip()
+            if not line or line.startswith(b'#'):
+                continue
+            try:
+                readings.append(self.parse(line))
+            except (ValueError, UnicodeDecodeError) as e:
+                rejected += 1
+                error = f'{e}: {line[:80]!r}'
+        return readings, rejected, error
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _LineHandler(socketserver.BaseRequestHandler):
+    """一个 TCP 连接：按换行切分，每次 recv 得到的完整行作为一批"""
+
+    def handle(self):
+        ingest = self.server.ingest
+        pending = b''
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            data = pending + data
+            end = data.rfind(b'\n')
+            if end < 0:
+                pending = data
+                if len(pending) > ingest.max_line:
+                    ingest.record_error('Line too long, connection closed')
+                    break
+                continue
+            pending = data[end + 1:]
+            ingest.handle(data[:end])
+        if pending.strip():
+            ingest.handle(pending)
+
+
+class LineIngestServer:
+    """在同一端口号上监听 UDP 和 TCP 行协议上报"""
+
+    def __init__(self, parser, sink, host='127.0.0.1', port=5002, udp=True, tcp=True, max_line=4096):
+        """初始化
+
+        Args:
+            parser: LineParser
+            sink: 回调 sink(readings)，把一批读数送入入库路径，返回接受的条数
+            host: 监听地址；行协议没有认证，默认只监听本机，接收局域网设备时传 '0.0.0.0'
+            max_line: TCP 单行最大字节数，超过即断开连接
+        """
+        self.parser = parser
+        self.sink = sink
+        self.host = host
+        self.port = port
+        self.udp = udp
+        self.tcp = tcp
+        self.max_line = max_line
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._udp_socket = None
+        self._tcp_server = None
+        self._threads = []
+
+        self.batches = 0
+        self.lines = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.last_error = None
+
+    def handle(self, data):
+        """处理一段包含若干行的数据（UDP 数据报或 TCP 读取的完整行）"""
+        readings, rejected, error = self.parser.parse_many(data)
+        accepted = 0
+        if readings:
+            # 入库回调出错（如同步写库时数据库被锁）只拒绝这一批，不能让接收线程退出
+            try:
+                accepted = self.sink(readings)
+            except Exception as e:
+                print(f"行协议入库失败（{len(readings)} 条）: {e}")
+                error = f'Sink failed: {e}'
+        with self._lock:
+            self.batches += 1
+            self.lines += len(readings) + rejected
+            self.accepted += accepted
+            self.rejected += rejected + len(readings) - accepted
+            if error:
+                self.last_error = error
+
+    def record_error(self, error):
+        with self._lock:
+            self.last_error = error
+
+    def _serve_udp(self):
+        """UDP 接收循环：收到一个数据报后把已到达的其余数据报一并取出，合并为一批"""
+        sock = self._udp_socket
+        while not self._stop_event.is_set():
+            try:
+                readable, _, _ = select.select([sock], [], [], 0.5)
+            except (OSError, ValueError):
+                break
+            if not readable:
+                continue
+
+            chunks = []
+            while len(chunks) < UDP_DRAIN:
+                try:
+                    chunks.append(sock.recv(65535))
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionResetError:
+                    # Windows 上对端端口不可达会在下一次 recv 报 ConnectionResetError，忽略即可
+                    continue
+                except OSError:
+                    break
+            if chunks:
+                self.handle(b'\n'.join(chunks))
+
+    def start(self):
+        """绑定端口并启动后台线程"""
+        if self.udp:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            sock.bind((self.host, self.port))
+            sock.setblocking(False)
+            self._udp_socket = sock
+            thread = threading.Thread(target=self._serve_udp, name='line-ingest-udp', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        if self.tcp:
+            self._tcp_server = _TCPServer((self.host, self.port), _LineHandler)
+            self._tcp_server.ingest = self
+            thread = threading.Thread(target=self._tcp_server.serve_forever, name='line-ingest-tcp', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        protocols = '/'.join(p for p, enabled in (('UDP', self.udp), ('TCP', self.tcp)) if enabled)
+        print(f"行协议监听已启动: {protocols} {self.host}:{self.port}")
+
+    def stop(self):
+        """停止监听"""
+        self._stop_event.set()
+        if self._tcp_server is not None:
+            self._tcp_server.shutdown()
+            self._tcp_server.server_close()
+        for thread in self._threads:
+            thread.join(2)
+        if self._udp_socket is not None:
+            self._udp_socket.close()
+        self._threads = []
+
+    def stats(self):
+        """收包、解析、入库计数"""
+        with self._lock:
+            return {
+                'port': self.port,
+                'batches': self.batches,
+                'lines': self.lines,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'last_error': self.last_error
+            }
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务器内存状态（最新数据 + 每设备热窗口）的线程安全封装
+并发约定：
+  - 只有写入方修改窗口：ingest 与后台淘汰线程（每秒按时间淘汰一次，没有上报的设备窗口也会按时清空）
+    在同一把锁内串行执行，临界区只有 O(批量大小) 或 O(设备数)
+  - 最新数据和每个设备窗口的统计都采用写时复制：每次写入生成新的快照并整体替换引用，发布后不再修改，
+    读 current-data / 设备列表 / 统计 / 内存报告都无需加锁，不会阻塞写入，也不会读到写了一半的数据
+  - 写入时同时生成最新数据的 JSON 编码和 ETag（Snapshot），读接口直接返回字节串，无需每次序列化
+"""
+
+import os
+import threading
+import time
+
+import json_codec
+from hot_window import build_memory_report, summarize
+
+# 进程启动标识，避免服务器重启后版本号重新计数导致 ETag 与旧数据相同
+_BOOT_ID = f'{int(time.time()):x}{os.getpid():x}'
+
+# 后台按时间淘汰热窗口的间隔，秒（统计最多滞后这么久）
+EXPIRE_INTERVAL = 1.0
+
+
+class Snapshot:
+    """一份不可变的最新数据：原始字典 + 预编码的 JSON + ETag（含引号，可直接作为响应头）"""
+
+    __slots__ = ('data', 'text', 'body', 'etag')
+
+    def __init__(self, data, version):
+        self.data = data
+        self.body = json_codec.dumps_bytes(data)
+        self.text = self.body.decode('utf-8')
+        self.etag = f'"{_BOOT_ID}-{version}"'
+
+    def matches(self, if_none_match):
+        """If-None-Match 请求头是否命中本快照"""
+        if not if_none_match:
+            return False
+        return if_none_match.strip() == '*' or self.etag in if_none_match
+
+
+class LiveState:
+    """Flask 服务器共享的内存状态"""
+
+    def __init__(self, hot_windows, defaults, on_update=None):
+        """初始化
+
+        Args:
+            hot_windows: HotWindowSet，只能通过本对象访问
+            defaults: 还没有任何设备上报时 latest() 返回的数据
+            on_update: 回调 on_update(device_id, snapshot)，在写锁内按写入顺序调用，不能阻塞
+        """
+        self.hot_windows = hot_windows
+        self.on_update = on_update
+        self._lock = threading.Lock()
+        self.version = 0  # 每次写入加一，可用于判断数据是否变化
+        self._latest = Snapshot(dict(defaults), self.version)
+        self._device_latest = {}  # {device_id: Snapshot}
+        self._windows = {}  # {device_id: WindowSnapshot}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def ingest(self, readings, last_update, ts=None):
+        """写入一批读数（按上报顺序），每个设备的最新数据取本批最后一条
+
+        Args:
+            readings: 读数字典列表
+            last_update: 写入最新数据的 last_update 字符串
+            ts: 接收时间（秒），默认当前时间
+        """
+        if not readings:
+            return
+        ts = time.time() if ts is None else ts
+
+        last_by_device = {}
+        for data in readings:
+            last_by_device[data.get('device_id', '')] = data
+
+        with self._lock:
+            if self._thread is None:
+                self.start()
+            for data in readings:
+                self.hot_windows.append(data.get('device_id', ''), data, ts)
+            self._publish_windows(last_by_device)
+
+            self.version += 1
+            device_latest = dict(self._device_latest)
+            for device_id, data in last_by_device.items():
+                latest = dict(data)
+                latest['last_update'] = last_update
+                device_latest[device_id] = Snapshot(latest, self.version)
+
+            newest = dict(self._latest.data)
+            newest.update(readings[-1])
+            newest['last_update'] = last_update
+
+            # 整体替换引用，读线程看到的要么是旧快照要么是新快照
+            self._device_latest = device_latest
+            self._latest = Snapshot(newest, self.version)
+
+            if self.on_update:
+                for device_id in last_by_device:
+                    self.on_update(device_id, device_latest[device_id])
+
+    def _publish_windows(self, device_ids):
+        """重新生成这些设备的窗口快照并整体替换引用（在写锁内调用）"""
+        windows = dict(self._windows)
+        for device_id in device_ids:
+            windows[device_id] = self.hot_windows.windows[device_id].snapshot()
+        self._windows = windows
+
+    def expire(self, now=None):
+        """按时间淘汰所有设备窗口中的过期读数并发布，返回有读数被淘汰的设备列表"""
+        with self._lock:
+            changed = self.hot_windows.expire_all(now)
+            if changed:
+                self._publish_windows(changed)
+        return changed
+
+    def _run(self):
+        while not self._stop_event.wait(EXPIRE_INTERVAL):
+            self.expire()
+
+    def start(self):
+        """启动后台淘汰线程（第一次写入时自动启动）"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='live-state-expiry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台淘汰线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2)
+
+    def snapshot(self, device_id=None):
+        """最新数据的 Snapshot，指定的设备不存在时返回 None"""
+        if device_id is None:
+            return self._latest
+        return self._device_latest.get(device_id)
+
+    def latest(self, device_id=None):
+        """最新数据（只读字典），指定的设备不存在时返回 None"""
+        snapshot = self.snapshot(device_id)
+        return snapshot.data if snapshot else None
+
+    def device_latest(self):
+        """{device_id: 最新数据}（只读）"""
+        return {device_id: snap.data for device_id, snap in self._device_latest.items()}
+
+    def window_seconds_for(self, device_id):
+        """设备的热窗口时长"""
+        return self.hot_windows.window_seconds_for(device_id)
+
+    def stats(self, fields, device_id=None):
+        """统计热窗口（最近发布的快照，无需加锁），返回 (条数, {字段: {'avg', 'min', 'max', 'std'}})"""
+        windows = self._windows
+        if device_id is not None:
+            snapshots = [windows[device_id]] if device_id in windows else []
+        else:
+            snapshots = list(windows.values())
+        count = sum(snap.count for snap in snapshots)
+        return count, {f: summarize(snapshots, f) for f in fields}
+
+    def window_counts(self):
+        """每个设备热窗口内的读数条数"""
+        return {device_id: snap.count for device_id, snap in self._windows.items()}
+
+    def memory_report(self):
+        """热窗口内存占用报告"""
+        return build_memory_report(self._windows, self.hot_windows.window_seconds)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按时间分区的原始数据存储 - 每天（或每周）一个 SQLite 文件
+功能：写入时按 ts_ms 分到对应的分区文件，目录表（catalog.db）记录每个分区的时间范围、行数；
+查询只打开与时间范围重叠的分区，多个分区用线程池并行查询；删除过期数据即删除整个分区文件
+
+分区边界按 UTC 对齐（与汇总表的 1分钟/1小时/1天 桶一致，任何汇总桶都不会跨分区）。
+每个分区文件中的表结构与单库时的原始表相同，查询语句可以原样在分区上执行。
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+
+from db_pool import ConnectionPool
+
+# 分区周期（毫秒），都是 1 天的整数倍，与 1 天汇总桶对齐
+PERIODS = {
+    'day': 86400000,
+    'week': 7 * 86400000,
+}
+
+# 同时保持打开的写入连接池数（通常只有当天的分区在写入）
+MAX_WRITERS = 4
+
+
+class PartitionedStore:
+    """按时间分区的原始数据表"""
+
+    def __init__(self, directory, table, create_sqls, period='day', workers=4):
+        """初始化（不创建文件，见 open）
+
+        Args:
+            directory: 分区文件和目录表所在目录
+            table: 原始数据表名（每个分区文件中的表名相同，需包含 ts_ms 列）
+            create_sqls: 在新分区文件中建表、建索引的语句列表
+            period: 'day' 或 'week'
+            workers: 并行查询分区的线程数
+        """
+        if period not in PERIODS:
+            raise ValueError(f'Unknown partition period: {period}, expected one of {", ".join(PERIODS)}')
+        self.directory = directory
+        self.table = table
+        self.create_sqls = list(create_sqls)
+        self.period = period
+        self.period_ms = PERIODS[period]
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._catalog_pool = None
+        self._catalog = {}                 # start_ms -> [rows, min_ts, max_ts]
+        self._writers = OrderedDict()      # start_ms -> ConnectionPool
+        self._executor = None
+        self._pending_unlink = set()
+
+        self.dropped_partitions = 0
+        self.dropped_rows = 0
+        self.dropped_bytes = 0
+
+    def open(self):
+        """创建目录和目录表，载入分区列表"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._catalog_pool = ConnectionPool(os.path.join(self.directory, 'catalog.db'), size=2)
+        with self._catalog_pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS partitions (
+                    start_ms INTEGER PRIMARY KEY,
+                    file TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    min_ts INTEGER,
+                    max_ts INTEGER
+                )
+            ''')
+            rows = conn.execute('SELECT start_ms, rows, min_ts, max_ts FROM partitions').fetchall()
+        with self._lock:
+            self._catalog = {start: [count, min_ts, max_ts] for start, count, min_ts, max_ts in rows}
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='partition-query')
+
+    def close(self):
+        """关闭所有连接和查询线程"""
+        with self._write_lock:
+            for pool in self._writers.values():
+                pool.close()
+            self._writers.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._catalog_pool is not None:
+            self._catalog_pool.close()
+
+    def partition_start(self, ts_ms):
+        """ts_ms 所在分区的起始时间"""
+        return (ts_ms // self.period_ms) * self.period_ms
+
+    def file_name(self, start_ms):
+        """分区文件名，如 kitchen_sensor_data_20240131.db"""
+        day = datetime.fromtimestamp(start_ms / 1000, timezone.utc).strftime('%Y%m%d')
+        return f'{self.table}_{day}.db'
+
+    def path(self, start_ms):
+        return os.path.join(self.directory, self.file_name(start_ms))
+
+    def _writer(self, start_ms):
+        """分区的写入连接池（调用方持有 _write_lock），新分区在此创建文件和表"""
+        pool = self._writers.pop(start_ms, None)
+        if pool is None:
+            pool = ConnectionPool(self.path(start_ms), size=1)
+            with pool.transaction() as conn:
+                for sql in self.create_sqls:
+                    conn.execute(sql)
+            while len(self._writers) >= MAX_WRITERS:
+                _, evicted = self._writers.popitem(last=False)
+                evicted.close()
+        self._writers[start_ms] = pool
+        return pool
+
+    def insert(self, sql, rows, ts_index):
+        """把一批行写入各自的分区（每个分区一个事务），再更新目录表
+
+        Args:
+            sql: INSERT 语句（表名与分区中的表相同）
+            rows: 参数元组列表
+            ts_index: ts_ms 在参数元组中的位置；ts_ms 为空的行无法分区，不写入
+        Returns:
+            写入的行数
+        """
+        groups = {}
+        for row in rows:
+            ts_ms = row[ts_index]
+            if ts_ms is not None:
+                groups.setdefault(self.partition_start(ts_ms), []).append(row)
+
+        with self._write_lock:
+            for start_ms, group in groups.items():
+                with self._writer(start_ms).transaction() as conn:
+                    conn.executemany(sql, group)
+
+            updates = []
+            with self._lock:
+                for start_ms, group in groups.items():
+                    low = min(row[ts_index] for row in group)
+                    high = max(row[ts_index] for row in group)
+                    entry = self._catalog.get(start_ms)
+                    if entry is None:
+                        entry = self._catalog[start_ms] = [0, low, high]
+                    entry[0] += len(group)
+                    entry[1] = min(entry[1], low)
+                    entry[2] = max(entry[2], high)
+                    updates.append((start_ms, self.file_name(start_ms), *entry))
+            with self._catalog_pool.transaction() as conn:
+                conn.executemany('''
+                    INSERT INTO partitions (start_ms, file, rows, min_ts, max_ts) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(start_ms) DO UPDATE SET
+                        rows = excluded.rows, min_ts = excluded.min_ts, max_ts = excluded.max_ts
+                ''', updates)
+        return sum(len(group) for group in groups.values())
+
+    def partitions(self, start_ms=None, end_ms=None):
+        """与 [start_ms, end_ms] 重叠的分区起始时间（升序），按目录表中记录的实际数据范围筛选"""
+        with self._lock:
+            return sorted(
+                start for start, (_, min_ts, max_ts) in self._catalog.items()
+                if (start_ms is None or max_ts >= start_ms) and (end_ms is None or min_ts <= end_ms)
+            )
+
+    @contextmanager
+    def connection(self, start_ms):
+        """只读查询用的独立连接（分区已被删除时产出 None）
+
+        流式响应可能在不同线程中逐批读取同一个游标（如 ASGI 入口的线程池），因此不限制线程。
+        """
+        try:
+            conn = sqlite3.connect(f'file:{self.path(start_ms)}?mode=rw', uri=True, timeout=5,
+                                   check_same_thread=False)
+        except sqlite3.OperationalError:
+            yield None
+            return
+        with closing(conn):
+            yield conn
+
+    def _query_one(self, fn, start_ms):
+        with self.connection(start_ms) as conn:
+            return fn(conn, start_ms) if conn is not None else None
+
+    def map(self, fn, start_ms=None, end_ms=None, newest_first=False, enough=None):
+        """在重叠的分区上并行执行 fn(conn, partition_start)，按分区顺序返回结果列表
+
+        Args:
+            newest_first: 从最新的分区开始
+            enough: 可选，enough(已有结果列表) 为真时不再查询剩余分区；
+                    此时分区分组查询，第一组只有一个分区（多数请求只需最新的分区），之后每组加倍，
+                    不超过 workers 个，每组完成后检查一次
+        """
+        starts = self.partitions(start_ms, end_ms)
+        if newest_first:
+            starts.reverse()
+        wave = 1 if enough is not None else max(len(starts), 1)
+
+        results = []
+        i = 0
+        while i < len(starts):
+            chunk = starts[i:i + wave]
+            i += len(chunk)
+            if len(chunk) == 1:
+                values = [self._query_one(fn, chunk[0])]
+            else:
+                values = list(self._executor.map(lambda s: self._query_one(fn, s), chunk))
+            results.extend(v for v in values if v is not None)
+            if enough is not None and enough(results):
+                break
+            wave = min(wave * 2, self.workers)
+        return results
+
+    def _unlink(self, path):
+        """删除分区文件及其 WAL/SHM 文件，返回释放的字节数（文件仍被占用时留待下次重试）"""
+        freed = 0
+        for name in (path, path + '-wal', path + '-shm'):
+            try:
+                size = os.path.getsize(name)
+                os.remove(name)
+                freed += size
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self._pending_unlink.add(path)
+        return freed
+
+    def drop_before(self, cutoff_ms):
+        """删除整个分区都早于 cutoff_ms 的分区（先从目录表移除，再删除文件），返回 (分区数, 行数, 字节数)
+
+        跨越 cutoff_ms 的分区保留到其中的数据全部过期。
+        """
+        expired = []
+        with self._write_lock:
+            with self._lock:
+                for start in sorted(self._catalog):
+                    if start + self.period_ms <= cutoff_ms:
+                        expired.append((start, self._catalog.pop(start)[0]))
+            if expired:
+                with self._catalog_pool.transaction() as conn:
+                    conn.executemany('DELETE FROM partitions WHERE start_ms = ?', [(s,) for s, _ in expired])
+            for start, _ in expired:
+                pool = self._writers.pop(start, None)
+                if pool is not None:
+                    pool.close()
+
+            freed = 0
+            for path in list(self._pending_unlink):
+                self._pending_unlink.discard(path)
+                freed += self._unlink(path)
+            for start, _ in expired:
+                freed += self._unlink(self.path(start))
+
+        rows = sum(count for _, count in expired)
+        with self._lock:
+            self.dropped_partitions += len(expired)
+            self.dropped_rows += rows
+            self.dropped_bytes += freed
+        return len(expired), rows, freed
+
+    def stats(self):
+        """分区数、总行数、文件总字节数、时间范围"""
+        with self._lock:
+            starts = sorted(self._catalog)
+            rows = sum(entry[0] for entry in self._catalog.values())
+            dropped = (self.dropped_partitions, self.dropped_rows, self.dropped_bytes)
+        size = 0
+        for start in starts:
+            for name in (self.path(start), self.path(start) + '-wal'):
+                try:
+                    size += os.path.getsize(name)
+                except OSError:
+                    pass
+        return {
+            'period': self.period,
+            'directory': self.directory,
+            'partitions': len(starts),
+            'rows': rows,
+            'bytes': size,
+            'oldest': self.file_name(starts[0]) if starts else None,
+            'newest': self.file_name(starts[-1]) if starts else None,
+            'dropped_partitions': dropped[0],
+            'dropped_rows': dropped[1],
+            'dropped_bytes': dropped[2]
+        }
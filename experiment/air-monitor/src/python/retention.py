@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据保留策略与后台压缩
+功能：后台线程定期删除超过保留天数的原始数据，再用增量 VACUUM 把空闲页归还给文件系统，并报告回收的字节数
+
+不长时间占用写锁：
+  1. 删除边界用 id 二分查找确定（只读，按主键定位，时间列无需索引）；
+  2. 按 id 区间分小批删除，每批一个事务，批与批之间暂停，让上报请求拿到写锁；
+     单批耗时超过目标值时自动减小批量；
+  3. 增量 VACUUM 每次只整理少量页，同样逐步进行。
+增量 VACUUM 要求数据库为 auto_vacuum=INCREMENTAL：新建的数据库在创建时设置（见 ConnectionPool）；
+已有数据库需要离线执行一次 enable_incremental_vacuum()（完整 VACUUM，会重写整个文件），
+在此之前删除释放的空闲页只会被后续写入复用，文件不会变小。
+"""
+
+import threading
+import time
+from datetime import datetime
+
+
+def ms_time(seconds):
+    """保留截止时间 -> 整数毫秒时间列（如 ts_ms）的取值"""
+    return int(seconds * 1000)
+
+
+def utc_text_time(seconds):
+    """保留截止时间 -> CURRENT_TIMESTAMP 格式的 UTC 文本时间列（如 created_at）的取值"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+
+
+def enable_incremental_vacuum(conn):
+    """把已有数据库切换为 auto_vacuum=INCREMENTAL（完整 VACUUM，期间阻塞所有写入，应在停机时执行）
+
+    Returns:
+        (切换前字节数, 切换后字节数)
+    """
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    before = conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+    after = conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+    return before, after
+
+
+class RetentionEngine:
+    """单张原始数据表的保留策略：分批删除过期行 + 增量 VACUUM"""
+
+    def __init__(self, connect, table, time_column, retention_days, to_db_time=ms_time,
+                 guard=None, interval=3600, chunk_size=2000, target_lock_ms=50, pause=0.05,
+                 vacuum_pages=256, partitions=None):
+        """初始化
+
+        Args:
+            connect: 无参可调用对象，返回产出 sqlite3 连接的上下文管理器（如 ConnectionPool.connection）；
+                     每个小步骤借用一次，不长期占用连接
+            table: 原始数据表，需有自增主键 id，且 id 顺序与时间列顺序一致（按写入顺序）
+            time_column: 判断过期的时间列
+            retention_days: 保留天数，0 表示不删除（只做增量 VACUUM）
+            to_db_time: 把截止时间（epoch 秒）转换为时间列的取值
+            guard: 可选，guard(conn) 返回 None 表示可以删除，返回字符串表示本轮跳过删除的原因
+                   （如过期数据尚未汇总进汇总表）
+            interval: 两轮之间的间隔，秒
+            chunk_size: 每批删除的最大行数（初始值，随单批耗时自动调整）
+            target_lock_ms: 单批删除占用写锁的目标上限，毫秒
+            pause: 每批之间的暂停，秒
+            vacuum_pages: 每次增量 VACUUM 整理的页数
+            partitions: 可选，原始数据按时间分区存储时的 PartitionedStore：
+                        整个分区都已过期时直接删除分区文件，不逐行删除（time_column 需为毫秒时间）
+        """
+        self.connect = connect
+        self.table = table
+        self.time_column = time_column
+        self.retention_days = retention_days
+        self.to_db_time = to_db_time
+        self.guard = guard
+        self.interval = interval
+        self.max_chunk = chunk_size
+        self.chunk_size = chunk_size
+        self.target_lock_ms = target_lock_ms
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.partitions = partitions
+
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.deleted_rows = 0
+        self.reclaimed_bytes = 0
+        self.max_lock_ms = 0.0
+        self.last_run = None
+        self.last_report = None
+        self.last_error = None
+
+    def _boundary_id(self, conn, cutoff):
+        """二分查找第一条时间不早于 cutoff 的行的 id，返回 (最小 id, 边界 id)；表为空时返回 None"""
+        low, high = conn.execute(f'SELECT MIN(id), MAX(id) FROM {self.table}').fetchone()
+        if low is None:
+            return None
+        first = low
+        high += 1
+        probe = f'''
+            SELECT {self.time_column} FROM {self.table}
+            WHERE id >= ? AND {self.time_column} IS NOT NULL
+            ORDER BY id LIMIT 1
+        '''
+        while low < high:
+            mid = (low + high) // 2
+            row = conn.execute(probe, (mid,)).fetchone()
+            if row is None or row[0] >= cutoff:
+                high = mid
+            else:
+                low = mid + 1
+        return first, low
+
+    def _delete_expired(self, cutoff):
+        """分批删除 id 小于边界且时间早于 cutoff 的行，返回删除的行数"""
+        with self.connect() as conn:
+            bounds = self._boundary_id(conn, cutoff)
+        if bounds is None:
+            return 0
+
+        start, boundary = bounds
+        sql = f'DELETE FROM {self.table} WHERE id >= ? AND id < ? AND {self.time_column} < ?'
+        deleted = 0
+        while start < boundary and not self._stop_event.is_set():
+            end = min(start + self.chunk_size, boundary)
+            with self.connect() as conn:
+                began = time.perf_counter()
+                with conn:
+                    deleted += conn.execute(sql, (start, end, cutoff)).rowcount
+                lock_ms = (time.perf_counter() - began) * 1000
+            start = end
+
+            with self._lock:
+                self.max_lock_ms = max(self.max_lock_ms, lock_ms)
+            # 按单批耗时调整批量：超过目标减半，远低于目标加倍
+            if lock_ms > self.target_lock_ms:
+                self.chunk_size = max(100, self.chunk_size // 2)
+            elif lock_ms < self.target_lock_ms / 4:
+                self.chunk_size = min(self.max_chunk, self.chunk_size * 2)
+            self._stop_event.wait(self.pause)
+        return deleted
+
+    def _incremental_vacuum(self):
+        """逐步整理空闲页，返回 (回收的字节数, 仍空闲的字节数)"""
+        with self.connect() as conn:
+            mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            before = conn.execute('PRAGMA page_count').fetchone()[0]
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if mode != 2:
+            # 非 INCREMENTAL 模式：空闲页留给后续写入复用
+            return 0, free * page_size
+
+        while free and not self._stop_event.is_set():
+            with self.connect() as conn:
+                began = time.perf_counter()
+                # execute() 只单步执行一次（每次只释放一页），executescript() 才会执行到底
+                conn.executescript(f'PRAGMA incremental_vacuum({int(self.vacuum_pages)})')
+                lock_ms = (time.perf_counter() - began) * 1000
+                free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            with self._lock:
+                self.max_lock_ms = max(self.max_lock_ms, lock_ms)
+            self._stop_event.wait(self.pause)
+
+        with self.connect() as conn:
+            # PASSIVE 检查点不等待读者和写者，把 WAL 中的结果写回主文件，文件随之截短
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+            after = conn.execute('PRAGMA page_count').fetchone()[0]
+        return (before - after) * page_size, free * page_size
+
+    def run_once(self, now=None):
+        """执行一轮：删除过期数据并增量 VACUUM，返回本轮报告"""
+        with self._run_lock:
+            began = time.perf_counter()
+            now = time.time() if now is None else now
+            report = {'table': self.table, 'deleted_rows': 0, 'reclaimed_bytes': 0, 'free_bytes': 0, 'skipped': None}
+            dropped_bytes = 0
+            try:
+                if self.retention_days > 0:
+                    skipped = None
+                    if self.guard is not None:
+                        with self.connect() as conn:
+                            skipped = self.guard(conn)
+                    if skipped:
+                        report['skipped'] = skipped
+                    else:
+                        cutoff = self.to_db_time(now - self.retention_days * 86400)
+                        if self.partitions is not None:
+                            report['dropped_partitions'], report['deleted_rows'], dropped_bytes = \
+                                self.partitions.drop_before(cutoff)
+                        # 分区存储时主库中可能还有迁移前的旧数据，同样逐批删除
+                        report['deleted_rows'] += self._delete_expired(cutoff)
+                report['reclaimed_bytes'], report['free_bytes'] = self._incremental_vacuum()
+                report['reclaimed_bytes'] += dropped_bytes
+                error = None
+            except Exception as e:
+                error = str(e)
+                report['error'] = error
+            report['seconds'] = round(time.perf_counter() - began, 3)
+
+            with self._lock:
+                self.runs += 1
+                self.deleted_rows += report['deleted_rows']
+                self.reclaimed_bytes += report['reclaimed_bytes']
+                self.last_run = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                self.last_report = report
+                if error:
+                    self.last_error = error
+            return report
+
+    def _run(self, initial_delay):
+        if self._stop_event.wait(initial_delay):
+            return
+        while not self._stop_event.is_set():
+            report = self.run_once()
+            if report['deleted_rows'] or report['reclaimed_bytes'] or report.get('error') or report['skipped']:
+                print(f"数据保留 {self.table}: 删除 {report['deleted_rows']} 条，回收 {report['reclaimed_bytes']} 字节"
+                      + (f"，跳过删除: {report['skipped']}" if report['skipped'] else '')
+                      + (f"，错误: {report['error']}" if report.get('error') else ''))
+            self._stop_event.wait(self.interval)
+
+    def start(self, initial_delay=60):
+        """启动后台线程（首轮在 initial_delay 秒后执行，避开启动时的初始化）"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(initial_delay,),
+                                        name=f'retention-{self.table}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程（正在进行的一轮在当前小批完成后结束）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def stats(self):
+        """保留配置与累计删除、回收计数"""
+        with self._lock:
+            return {
+                'table': self.table,
+                'retention_days': self.retention_days,
+                'interval': self.interval,
+                'runs': self.runs,
+                'deleted_rows': self.deleted_rows,
+                'reclaimed_bytes': self.reclaimed_bytes,
+                'max_lock_ms': round(self.max_lock_ms, 1),
+                'chunk_size': self.chunk_size,
+                'last_run': self.last_run,
+                'last_report': self.last_report,
+                'last_error': self.last_error
+            }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定长列式环形缓冲区 - 替代 data_history 列表
+功能：每个数值指标一列 array('d')，外加一列接收时间戳；
+append 为 O(1)（覆盖最旧一条，不再 list.pop(0)），按时间窗口切片时返回 memoryview，不复制数据
+"""
+
+import sys
+from array import array
+from itertools import chain
+
+from stream_stats import to_float
+
+
+class ColumnarRingBuffer:
+    """固定容量的列式环形缓冲区"""
+
+    def __init__(self, capacity, fields, extra_fields=()):
+        """初始化
+
+        Args:
+            capacity: 最多保存的记录数
+            fields: 数值字段（存为 array('d')）
+            extra_fields: 非数值字段（如 device_id），存为普通列表
+        """
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self.fields = list(fields)
+        self.extra_fields = list(extra_fields)
+
+        self._ts = array('d', bytes(8 * capacity))
+        self._cols = {f: array('d', bytes(8 * capacity)) for f in self.fields}
+        self._extra = {f: [None] * capacity for f in self.extra_fields}
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def _pos(self, i):
+        """逻辑下标（0为最旧）转换为物理下标"""
+        return (self._start + i) % self.capacity
+
+    def record_at(self, i):
+        """按逻辑下标取出一条记录（dict）"""
+        p = self._pos(i)
+        record = {f: self._cols[f][p] for f in self.fields}
+        for f in self.extra_fields:
+            record[f] = self._extra[f][p]
+        return record
+
+    def values_at(self, i):
+        """按逻辑下标取出数值字段的元组（顺序与 fields 相同），不构造字典"""
+        p = self._pos(i)
+        return tuple(col[p] for col in self._cols.values())
+
+    def ts_at(self, i):
+        """按逻辑下标取出接收时间戳"""
+        return self._ts[self._pos(i)]
+
+    def append(self, ts, record):
+        """追加一条记录，缓冲区已满时覆盖最旧一条并将其返回，否则返回 None"""
+        evicted = None
+        if self._size == self.capacity:
+            evicted = self.record_at(0)
+            p = self._start
+            self._start = (self._start + 1) % self.capacity
+        else:
+            p = self._pos(self._size)
+            self._size += 1
+
+        self._ts[p] = ts
+        for f in self.fields:
+            self._cols[f][p] = to_float(record.get(f))
+        for f in self.extra_fields:
+            self._extra[f][p] = record.get(f)
+        return evicted
+
+    def pop_oldest(self):
+        """移除并返回最旧一条记录"""
+        if not self._size:
+            return None
+        record = self.record_at(0)
+        self.drop_oldest()
+        return record
+
+    def drop_oldest(self):
+        """移除最旧一条记录，不返回内容"""
+        if not self._size:
+            return
+        for f in self.extra_fields:
+            self._extra[f][self._start] = None
+        self._start = (self._start + 1) % self.capacity
+        self._size -= 1
+
+    def clear(self):
+        """清空缓冲区（不释放内存）"""
+        for f in self.extra_fields:
+            self._extra[f] = [None] * self.capacity
+        self._start = 0
+        self._size = 0
+
+    def index_at_or_after(self, ts):
+        """二分查找第一条接收时间 >= ts 的逻辑下标（时间戳按追加顺序递增）"""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts_at(mid) < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _segments(self, column, start, stop, step=1):
+        """逻辑区间 [start, stop) 中每隔 step 条对应的物理片段（最多两段）
+
+        array 列返回 memoryview 片段，不复制数据；extra 的列表列返回列表切片。
+        """
+        if start >= stop:
+            return []
+        view = memoryview(column) if isinstance(column, array) else column
+        p0 = self._pos(start)
+        length = stop - start
+        if p0 + length <= self.capacity:
+            return [view[p0:p0 + length:step]]
+        first = self.capacity - p0
+        # 第二段从下一个采样点开始，使跨越首尾的采样间隔保持为 step
+        offset = -first % step
+        return [view[p0::step], view[offset:length - first:step]]
+
+    def column_view(self, field, start=0, stop=None, step=1):
+        """数值列在逻辑区间上（每隔 step 条）的零拷贝视图，返回 memoryview 片段列表"""
+        stop = self._size if stop is None else min(stop, self._size)
+        return self._segments(self._cols[field], start, stop, max(step, 1))
+
+    def window(self, since_ts, until_ts=None):
+        """时间窗口对应的逻辑区间 (start, stop)"""
+        start = self.index_at_or_after(since_ts)
+        stop = self._size if until_ts is None else self.index_at_or_after(until_ts)
+        return start, max(start, stop)
+
+    def records(self, start=0, stop=None, step=1):
+        """把逻辑区间（每隔 step 条）展开为 dict 列表（用于 JSON 输出）
+
+        按列取出：数值列经 column_view 的跨步视图整列读取，再按行组装，不逐条计算物理下标。
+        """
+        stop = self._size if stop is None else min(stop, self._size)
+        step = max(step, 1)
+        names = self.fields + self.extra_fields
+        columns = [list(chain.from_iterable(self.column_view(f, start, stop, step))) for f in self.fields]
+        columns += [list(chain.from_iterable(self._segments(self._extra[f], start, stop, step)))
+                    for f in self.extra_fields]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+    def memory_bytes(self):
+        """缓冲区占用的内存（字节，不含 extra 字段引用的对象本身）"""
+        total = sys.getsizeof(self._ts)
+        total += sum(sys.getsizeof(col) for col in self._cols.values())
+        total += sum(sys.getsizeof(col) for col in self._extra.values())
+        return total
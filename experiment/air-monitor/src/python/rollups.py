@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多分辨率汇总表（rollup）- 1分钟 / 1小时 / 1天
+功能：每个时间桶、每个设备保存各指标的 count/sum/min/max/sumsq，
+入库时增量更新（UPSERT），长时间范围查询直接读汇总表而不是扫描原始数据
+"""
+
+# (名称, 桶大小毫秒)，从细到粗
+ROLLUP_LEVELS = [
+    ('1m', 60000),
+    ('1h', 3600000),
+    ('1d', 86400000),
+]
+
+
+class RollupManager:
+    """维护一组按时间桶聚合的汇总表"""
+
+    def __init__(self, source_table, metrics, prefix=None, levels=ROLLUP_LEVELS):
+        """初始化
+
+        Args:
+            source_table: 原始数据表（需包含 ts_ms、device_id 列）
+            metrics: 需要汇总的数值列
+            prefix: 汇总表名前缀，默认 <source_table>_rollup
+            levels: [(名称, 桶大小毫秒), ...]
+        """
+        self.source_table = source_table
+        self.metrics = list(metrics)
+        self.prefix = prefix or f'{source_table}_rollup'
+        self.levels = list(levels)
+        self._upsert_sql = {name: self._build_upsert_sql(name) for name, _ in self.levels}
+
+    def table_name(self, level_name):
+        """汇总表表名"""
+        return f'{self.prefix}_{level_name}'
+
+    def _metric_columns(self):
+        """每个指标对应的汇总列"""
+        columns = []
+        for m in self.metrics:
+            columns.extend([f'{m}_sum', f'{m}_min', f'{m}_max', f'{m}_sumsq'])
+        return columns
+
+    def _build_upsert_sql(self, level_name):
+        """生成增量合并的 UPSERT 语句"""
+        columns = ['bucket_ms', 'device_id', 'count'] + self._metric_columns()
+        updates = ['count = count + excluded.count']
+        for m in self.metrics:
+            updates.append(f'{m}_sum = {m}_sum + excluded.{m}_sum')
+            updates.append(f'{m}_min = MIN({m}_min, excluded.{m}_min)')
+            updates.append(f'{m}_max = MAX({m}_max, excluded.{m}_max)')
+            updates.append(f'{m}_sumsq = {m}_sumsq + excluded.{m}_sumsq')
+        return f'''
+            INSERT INTO {self.table_name(level_name)} ({', '.join(columns)})
+            VALUES ({', '.join('?' for _ in columns)})
+            ON CONFLICT(bucket_ms, device_id) DO UPDATE SET {', '.join(updates)}
+        '''
+
+    def create_tables(self, conn):
+        """创建汇总表（已存在则跳过）"""
+        metric_defs = ', '.join(f'{c} REAL' for c in self._metric_columns())
+        for name, _ in self.levels:
+            table = self.table_name(name)
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    bucket_ms INTEGER NOT NULL,
+                    device_id TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    {metric_defs},
+                    PRIMARY KEY (bucket_ms, device_id)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_device ON {table} (device_id, bucket_ms)')
+
+    def update(self, conn, readings):
+        """把一批读数合并进所有汇总表（调用方负责事务）
+
+        Args:
+            readings: [(ts_ms, device_id, (指标值, ...)), ...]，指标值顺序与 metrics 一致；
+                      含非数值指标的读数不参与汇总
+        """
+        for name, size in self.levels:
+            buckets = {}
+            for ts_ms, device_id, values in readings:
+                try:
+                    values = [float(v) for v in values]
+                except (TypeError, ValueError):
+                    continue
+                key = ((ts_ms // size) * size, device_id or '')
+                acc = buckets.get(key)
+                if acc is None:
+                    acc = [0]
+                    for v in values:
+                        acc.extend([0.0, v, v, 0.0])
+                    buckets[key] = acc
+                acc[0] += 1
+                for i, v in enumerate(values):
+                    base = 1 + i * 4
+                    acc[base] += v
+                    if v < acc[base + 1]:
+                        acc[base + 1] = v
+                    if v > acc[base + 2]:
+                        acc[base + 2] = v
+                    acc[base + 3] += v * v
+
+            if buckets:
+                conn.executemany(
+                    self._upsert_sql[name],
+                    [(bucket, device, *acc) for (bucket, device), acc in buckets.items()]
+                )
+
+    def clear(self, conn):
+        """清空所有汇总表（调用方负责事务）"""
+        for name, _ in self.levels:
+            conn.execute(f'DELETE FROM {self.table_name(name)}')
+
+    def rebuild(self, conn, level_name=None):
+        """从原始表全量重建汇总表（用于回填或修复），返回每个级别写入的桶数"""
+        sums = ', '.join(
+            f'SUM({m}), MIN({m}), MAX({m}), SUM({m} * {m})' for m in self.metrics
+        )
+        not_null = ' AND '.join(f'{m} IS NOT NULL' for m in self.metrics)
+        result = {}
+        for name, size in self.levels:
+            if level_name and name != level_name:
+                continue
+            table = self.table_name(name)
+            conn.execute(f'DELETE FROM {table}')
+            cursor = conn.execute(f'''
+                INSERT INTO {table}
+                SELECT (ts_ms / {size}) * {size}, COALESCE(device_id, ''), COUNT(*), {sums}
+                FROM {self.source_table}
+                WHERE ts_ms IS NOT NULL AND {not_null}
+                GROUP BY 1, 2
+            ''')
+            result[name] = cursor.rowcount
+        return result
+
+    def covers_source(self, conn):
+        """汇总表是否覆盖了原始表最早的数据（汇总表建立前的历史数据需先 rebuild 回填）"""
+        first_raw = conn.execute(f'SELECT MIN(ts_ms) FROM {self.source_table}').fetchone()[0]
+        if first_raw is None:
+            return True
+        name, size = self.levels[0]
+        first_bucket = conn.execute(f'SELECT MIN(bucket_ms) FROM {self.table_name(name)}').fetchone()[0]
+        return first_bucket is not None and first_bucket <= (first_raw // size) * size
+
+    def pick_level(self, bucket_ms):
+        """选择能精确拼出 bucket_ms 的最粗汇总级别，没有则返回 None（需查原始表）"""
+        chosen = None
+        for name, size in self.levels:
+            if bucket_ms >= size and bucket_ms % size == 0:
+                chosen = (name, size)
+        return chosen
+
+    def query(self, conn, level_name, bucket_ms, start_ms=None, end_ms=None, device_id=None):
+        """从汇总表按 bucket_ms 重新聚合
+
+        返回行格式：(bucket_start, count, 指标1 avg, min, max, 指标2 avg, min, max, ...)
+        """
+        size = dict(self.levels)[level_name]
+        aggregates = ', '.join(
+            f'SUM({m}_sum) / SUM(count), MIN({m}_min), MAX({m}_max)' for m in self.metrics
+        )
+        sql = f'''
+            SELECT (bucket_ms / ?) * ? AS bucket_start, SUM(count), {aggregates}
+            FROM {self.table_name(level_name)}
+            WHERE 1 = 1
+        '''
+        params = [bucket_ms, bucket_ms]
+
+        if device_id:
+            sql += ' AND device_id = ?'
+            params.append(device_id)
+
+        if start_ms is not None:
+            sql += ' AND bucket_ms >= ?'
+            params.append((start_ms // size) * size)
+
+        if end_ms is not None:
+            sql += ' AND bucket_ms <= ?'
+            params.append(end_ms)
+
+        sql += ' GROUP BY bucket_start ORDER BY bucket_start'
+        return conn.execute(sql, params).fetchall()
+
+    def totals(self, conn, level_name, start_ms=None, end_ms=None, device_id=None):
+        """汇总表上的区间统计，返回 {'count': n, 指标: {'avg', 'min', 'max', 'std'}}"""
+        size = dict(self.levels)[level_name]
+        aggregates = ', '.join(
+            f'SUM({m}_sum), MIN({m}_min), MAX({m}_max), SUM({m}_sumsq)' for m in self.metrics
+        )
+        sql = f'SELECT SUM(count), {aggregates} FROM {self.table_name(level_name)} WHERE 1 = 1'
+        params = []
+
+        if device_id:
+            sql += ' AND device_id = ?'
+            params.append(device_id)
+
+        if start_ms is not None:
+            sql += ' AND bucket_ms >= ?'
+            params.append((start_ms // size) * size)
+
+        if end_ms is not None:
+            sql += ' AND bucket_ms <= ?'
+            params.append(end_ms)
+
+        row = conn.execute(sql, params).fetchone()
+        n = row[0] or 0
+        result = {'count': n}
+        for i, m in enumerate(self.metrics):
+            total, min_value, max_value, sumsq = row[1 + i * 4:5 + i * 4]
+            if not n:
+                result[m] = {'avg': 0.0, 'min': 0.0, 'max': 0.0, 'std': 0.0}
+                continue
+            mean = total / n
+            variance = max(sumsq / n - mean * mean, 0.0)
+            result[m] = {'avg': mean, 'min': min_value, 'max': max_value, 'std': variance ** 0.5}
+        return result
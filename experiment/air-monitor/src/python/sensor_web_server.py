@@ -5,7 +5,7 @@ DHT11温湿度监控系统 - Python Web服务器
 功能：接收Arduino数据，提供Web界面和API
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
 import json
 import time
@@ -13,12 +13,23 @@ from datetime import datetime
 import threading
 import sqlite3
 import os
+from contextlib import closing
+
+from batch_ingest import read_batch, validate_batch, BatchTooLarge, ReadingSchema
+from hot_window import HotWindowSet
+from live_state import LiveState
+from json_codec import FastJSONProvider
+from line_ingest import LineParser, LineIngestServer
+from retention import RetentionEngine, utc_text_time
+from json_stream import negotiate_encoding, iter_json_array, iter_cursor, compress_chunks
+from csv_export import EXPORT_FETCH_SIZE, parse_columns, parse_time, csv_line_sql, iter_csv
 
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
+app.json = FastJSONProvider(app)  # jsonify / get_json 使用更快的JSON实现（装有 orjson 时）
 
-# 全局变量存储最新数据
-latest_data = {
+# 尚无设备上报时 /api/current-data 返回的默认数据
+DEFAULT_DATA = {
     'temperature': 0.0,
     'humidity': 0.0,
     'timestamp': 0,
@@ -26,15 +37,41 @@ latest_data = {
     'last_update': None
 }
 
-# 数据存储
-data_history = []
-max_history = 1000  # 最多保存1000条记录
+# 上报数据必须包含的字段
+REQUIRED_FIELDS = ['temperature', 'humidity', 'timestamp', 'device_id']
+
+# 参与统计的指标
+STATS_FIELDS = ['temperature', 'humidity']
+
+# 上报数据的类型：指标为数值，timestamp 为整数，device_id 为字符串
+READING_SCHEMA = ReadingSchema(REQUIRED_FIELDS, STATS_FIELDS, ['timestamp'], ['device_id'])
+
+# 内存热数据窗口：按时间划定（默认15分钟），每个设备一个，可按设备单独配置
+HOT_WINDOW_SECONDS = int(os.environ.get('DHT11_HOT_WINDOW_SECONDS', 15 * 60))
+DEVICE_WINDOW_SECONDS = json.loads(os.environ.get('DHT11_DEVICE_WINDOWS', '{}'))  # 例如 {"arduino_dht11_001": 3600}
+
+# 读数已在入库时写入SQLite，离开窗口时无需再落盘
+hot_windows = HotWindowSet(
+    STATS_FIELDS, ['timestamp', 'device_id'],
+    window_seconds=HOT_WINDOW_SECONDS,
+    device_windows=DEVICE_WINDOW_SECONDS
+)
+
+# 最新数据与热窗口的并发访问统一经过 state（写入加锁，最新数据写时复制）
+state = LiveState(hot_windows, DEFAULT_DATA)
+
+def update_state(readings):
+    """更新最新数据并追加到设备的内存热窗口，过期或超出容量的读数自动淘汰"""
+    state.ingest(readings, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
 # 数据库初始化
 def init_database():
     """初始化SQLite数据库"""
     conn = sqlite3.connect('sensor_data.db')
     cursor = conn.cursor()
+
+    # 只对新建的数据库生效，便于数据保留删除后增量回收空间
+    cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS sensor_data (
@@ -65,33 +102,98 @@ def save_to_database(data):
     conn.commit()
     conn.close()
 
-# 从数据库获取历史数据
-def get_history_from_db(limit=100):
-    """从数据库获取历史数据"""
+# 批量保存数据到数据库
+def save_batch_to_database(rows):
+    """在一个事务中批量写入多条数据"""
     conn = sqlite3.connect('sensor_data.db')
     cursor = conn.cursor()
     
-    cursor.execute('''
-        SELECT temperature, humidity, timestamp, device_id, created_at
-        FROM sensor_data
-        ORDER BY created_at DESC
-        LIMIT ?
-    ''', (limit,))
+    cursor.executemany('''
+        INSERT INTO sensor_data (temperature, humidity, timestamp, device_id)
+        VALUES (?, ?, ?, ?)
+    ''', [(d['temperature'], d['humidity'], d['timestamp'], d['device_id']) for d in rows])
     
-    results = cursor.fetchall()
+    conn.commit()
     conn.close()
-    
-    history = []
-    for row in results:
-        history.append({
-            'temperature': row[0],
-            'humidity': row[1],
-            'timestamp': row[2],
-            'device_id': row[3],
-            'created_at': row[4]
-        })
-    
-    return history
+
+def ingest_readings(readings):
+    """行协议监听的入库：一批读数一个事务写入并更新内存状态，返回接受的条数"""
+    save_batch_to_database(readings)
+    update_state(readings)
+    return len(readings)
+
+# UDP/TCP 行协议上报，CSV 列顺序：device_id,timestamp,temperature,humidity
+# 行协议没有认证，默认不启用；设备改用行协议时设置 DHT11_LINE_PORT=5003
+LINE_PORT = int(os.environ.get('DHT11_LINE_PORT', 0))  # 0 表示不启用
+LINE_HOST = os.environ.get('DHT11_LINE_HOST', '0.0.0.0')
+line_server = LineIngestServer(
+    LineParser(['device_id', 'timestamp'] + STATS_FIELDS, STATS_FIELDS, REQUIRED_FIELDS),
+    ingest_readings, host=LINE_HOST, port=LINE_PORT
+)
+
+# 数据保留：超过保留天数的数据分批删除（本服务器没有汇总表，删除即不再保留），0 表示不删除
+RETENTION_DAYS = float(os.environ.get('DHT11_RETENTION_DAYS', 0))
+retention = RetentionEngine(
+    lambda: closing(sqlite3.connect('sensor_data.db', timeout=5)),
+    'sensor_data', 'created_at', RETENTION_DAYS, to_db_time=utc_text_time,
+    interval=int(os.environ.get('DHT11_RETENTION_INTERVAL', 3600))
+)
+
+# 历史数据的字段，与查询列一一对应
+HISTORY_COLUMNS = ['temperature', 'humidity', 'timestamp', 'device_id', 'created_at']
+
+# 从数据库获取历史数据
+def iter_history_from_db(limit=100):
+    """按时间倒序逐批产出最近 limit 条历史数据（元组），供流式响应使用
+
+    结果不在内存中整体构造；生成器关闭（如客户端断开）时游标和连接随即关闭。
+    """
+    conn = sqlite3.connect('sensor_data.db')
+    try:
+        cursor = conn.execute('''
+            SELECT temperature, humidity, timestamp, device_id, created_at
+            FROM sensor_data
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''', (limit,))
+        yield from iter_cursor(cursor)
+    finally:
+        conn.close()
+
+def history_row_to_item(row):
+    """把查询结果元组转换为字典"""
+    return dict(zip(HISTORY_COLUMNS, row))
+
+# /api/export.csv 可导出的列（created_at 为 UTC 时间）
+EXPORT_COLUMNS = ['id', 'created_at', 'device_id', 'temperature', 'humidity', 'timestamp']
+EXPORT_DEFAULT_COLUMNS = ['created_at', 'device_id', 'temperature', 'humidity', 'timestamp']
+
+def iter_export_lines(columns, start_time_utc=None, end_time_utc=None, device_id=None, batch_rows=EXPORT_FETCH_SIZE):
+    """按写入顺序（即时间顺序）逐批产出原始数据的 CSV 行（在 SQL 中拼接好的单列元组，列顺序与 columns 一致），不限行数
+
+    按主键顺序读取，不需要排序；生成器关闭（如客户端断开）时游标和连接随即关闭。
+    """
+    conditions = []
+    params = []
+    if device_id:
+        conditions.append('device_id = ?')
+        params.append(device_id)
+    if start_time_utc:
+        conditions.append('created_at >= ?')
+        params.append(start_time_utc.strftime('%Y-%m-%d %H:%M:%S'))
+    if end_time_utc:
+        conditions.append('created_at <= ?')
+        params.append(end_time_utc.strftime('%Y-%m-%d %H:%M:%S'))
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+    conn = sqlite3.connect('sensor_data.db', check_same_thread=False)
+    try:
+        cursor = conn.execute(
+            f'SELECT {csv_line_sql(columns, quoted=("device_id",))} FROM sensor_data{where} ORDER BY id', params
+        )
+        yield from iter_cursor(cursor, batch_rows)
+    finally:
+        conn.close()
 
 @app.route('/')
 def index():
@@ -107,21 +209,14 @@ def receive_sensor_data():
         if not data:
             return jsonify({'error': 'No data received'}), 400
         
-        # 验证数据格式
-        required_fields = ['temperature', 'humidity', 'timestamp', 'device_id']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing field: {field}'}), 400
-        
-        # 更新全局数据
-        global latest_data
-        latest_data.update(data)
-        latest_data['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 验证字段与类型（device_id 作为内存状态的键，必须是字符串）
+        try:
+            data = READING_SCHEMA.normalize(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # 添加到历史数据
-        data_history.append(data.copy())
-        if len(data_history) > max_history:
-            data_history.pop(0)
+        # 更新最新数据和内存热窗口
+        update_state([data])
         
         # 保存到数据库
         save_to_database(data)
@@ -138,22 +233,94 @@ def receive_sensor_data():
         print(f"处理数据时出错: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/sensor-data/batch', methods=['POST'])
+def receive_sensor_data_batch():
+    """批量接收传感器数据（JSON数组或NDJSON），一个事务写入"""
+    try:
+        try:
+            items = read_batch(request)
+        except BatchTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        valid, errors = validate_batch(items, READING_SCHEMA)
+
+        if valid:
+            save_batch_to_database(valid)
+            update_state(valid)
+
+        print(f"批量收到数据: 接受 {len(valid)} 条, 拒绝 {len(errors)} 条")
+
+        return jsonify({
+            'status': 'success' if valid else 'error',
+            'accepted': len(valid),
+            'rejected': len(errors),
+            'errors': errors,
+            'timestamp': int(time.time())
+        }), 200 if valid else 400
+
+    except Exception as e:
+        print(f"处理批量数据时出错: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def snapshot_response(snapshot):
+    """直接返回预编码的最新数据；客户端 If-None-Match 与 ETag 一致时返回 304"""
+    # no-cache：允许浏览器缓存，但每次都要带 ETag 向服务器验证
+    headers = [('ETag', snapshot.etag), ('Cache-Control', 'no-cache')]
+    if snapshot.matches(request.headers.get('If-None-Match')):
+        return Response(status=304, headers=headers)
+    return Response(snapshot.body, mimetype='application/json', headers=headers)
+
 @app.route('/api/current-data')
 def get_current_data():
-    """获取当前最新数据"""
-    return jsonify(latest_data)
+    """获取当前最新数据（入库时已编码好，支持 ETag / If-None-Match）"""
+    return snapshot_response(state.snapshot())
 
 @app.route('/api/history')
 def get_history():
     """获取历史数据"""
     limit = request.args.get('limit', 100, type=int)
-    history = get_history_from_db(limit)
-    return jsonify(history)
+    rows = iter_history_from_db(limit)
+    return stream_json_response(iter_json_array(rows, history_row_to_item))
+
+@app.route('/api/export.csv')
+def export_csv():
+    """流式导出原始数据为 CSV（按时间升序，不限行数，内存占用与行数无关）
+
+    start、end 为 UTC 日期 YYYY-MM-DD 或 ISO 8601 时间（含两端），device_id 过滤设备，
+    columns 为逗号分隔的列名（可选列见 EXPORT_COLUMNS）。
+    """
+    try:
+        columns = parse_columns(request.args.get('columns'), EXPORT_COLUMNS, EXPORT_DEFAULT_COLUMNS)
+        start_time_utc = parse_time(request.args.get('start'))
+        end_time_utc = parse_time(request.args.get('end'), end=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    device_id = request.args.get('device_id', default=None, type=str)
+
+    rows = iter_export_lines(columns, start_time_utc, end_time_utc, device_id)
+    return stream_response(iter_csv(columns, rows), 'text/csv',
+                           [('Content-Disposition', 'attachment; filename=sensor_data.csv')])
+
+def stream_json_response(chunks):
+    """流式输出JSON片段，按 Accept-Encoding 边生成边压缩（分块传输，无 Content-Length）"""
+    return stream_response(chunks, 'application/json')
+
+def stream_response(chunks, mimetype, headers=None):
+    """流式输出 bytes 片段，按 Accept-Encoding 边生成边压缩（分块传输，无 Content-Length）"""
+    headers = list(headers or []) + [('Vary', 'Accept-Encoding')]
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding:
+        chunks = compress_chunks(chunks, encoding)
+        headers.append(('Content-Encoding', encoding))
+    return Response(chunks, mimetype=mimetype, headers=headers)
 
 @app.route('/api/stats')
 def get_stats():
-    """获取统计信息"""
-    if not data_history:
+    """获取统计信息（最近 HOT_WINDOW_SECONDS 秒内的读数）"""
+    count, summaries = state.stats(STATS_FIELDS)
+    if not count:
         return jsonify({
             'total_records': 0,
             'avg_temperature': 0,
@@ -161,20 +328,30 @@ def get_stats():
             'uptime': 0
         })
     
-    temperatures = [d['temperature'] for d in data_history]
-    humidities = [d['humidity'] for d in data_history]
-    
+    temperature = summaries['temperature']
+    humidity = summaries['humidity']
     return jsonify({
-        'total_records': len(data_history),
-        'avg_temperature': round(sum(temperatures) / len(temperatures), 2),
-        'avg_humidity': round(sum(humidities) / len(humidities), 2),
-        'min_temperature': round(min(temperatures), 2),
-        'max_temperature': round(max(temperatures), 2),
-        'min_humidity': round(min(humidities), 2),
-        'max_humidity': round(max(humidities), 2),
-        'last_update': latest_data.get('last_update', 'Never')
+        'total_records': count,
+        'avg_temperature': round(temperature['avg'], 2),
+        'avg_humidity': round(humidity['avg'], 2),
+        'min_temperature': round(temperature['min'], 2),
+        'max_temperature': round(temperature['max'], 2),
+        'min_humidity': round(humidity['min'], 2),
+        'max_humidity': round(humidity['max'], 2),
+        'std_temperature': round(temperature['std'], 2),
+        'std_humidity': round(humidity['std'], 2),
+        'window_seconds': HOT_WINDOW_SECONDS,
+        'last_update': state.latest().get('last_update', 'Never')
     })
 
+@app.route('/api/memory')
+def get_memory():
+    """内存热窗口的占用情况（每个设备的条数、容量、字节数）"""
+    report = state.memory_report()
+    report['line_ingest'] = line_server.stats()
+    report['retention'] = retention.stats()
+    return jsonify(report)
+
 # 创建模板目录和文件
 def create_templates():
     """创建HTML模板文件"""
@@ -656,6 +833,13 @@ if __name__ == '__main__':
     
     # 创建模板文件
     create_templates()
+
+    # 行协议监听和数据保留：debug=True 时重载器会再启动一个子进程运行本脚本，只在实际处理请求的子进程中启动
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if LINE_PORT:
+            line_server.start()
+        if RETENTION_DAYS:
+            retention.start()
     
     print("=" * 50)
     print("DHT11温湿度监控系统 - Python Web服务器")
@@ -664,9 +848,16 @@ if __name__ == '__main__':
     print("Web界面访问地址: http://localhost:5000")
     print("API接口:")
     print("  - POST /api/sensor-data (Arduino发送数据)")
+    print("  - POST /api/sensor-data/batch (批量上报，JSON数组或NDJSON)")
     print("  - GET  /api/current-data (获取当前数据)")
     print("  - GET  /api/history (获取历史数据)")
     print("  - GET  /api/stats (获取统计信息)")
+    print("  - GET  /api/memory (内存热窗口占用)")
+    print("  - GET  /api/export.csv (流式导出原始数据为CSV)")
+    if LINE_PORT:
+        print(f"行协议上报: UDP/TCP {LINE_HOST}:{LINE_PORT}（CSV 或 InfluxDB 行协议，无认证）")
+    if RETENTION_DAYS:
+        print(f"数据保留: {RETENTION_DAYS:g} 天")
     print("=" * 50)
     
     # 启动Flask服务器
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+串口上报 - 没有 WiFi 的开发板通过 USB 串口上报读数
+功能：每个串口一个后台线程，按换行切分数据帧，用与 UDP/TCP 相同的行协议解析（CSV 或 InfluxDB 行协议），
+按"条数或时间"攒成一批送入入库路径；串口断开（拔线、开发板复位）后自动重连
+
+开发板在串口上输出的调试信息（如"WiFi连接成功！"）解析失败时只计数，不影响后续读数。
+
+单独运行（不启动 Web 服务器，直接写入厨房版数据库）：
+    python serial_ingest.py /dev/ttyUSB0 /dev/ttyACM0 --baud 115200
+也可以随厨房版服务器一起启动：设置环境变量 KITCHEN_SERIAL_PORTS=/dev/ttyUSB0,/dev/ttyACM0
+"""
+
+import argparse
+import threading
+import time
+
+import serial
+
+# 单行最大字节数，超过后丢弃（串口接错波特率时会收到没有换行的乱码）
+MAX_LINE = 4096
+
+
+class SerialReader:
+    """读取一个串口：分帧、解析、攒批"""
+
+    def __init__(self, port, parser, sink, baudrate=115200, batch_size=100, batch_interval=0.5,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0):
+        """初始化
+
+        Args:
+            port: 串口设备路径（如 /dev/ttyUSB0、COM3），也可以是 pyserial 支持的 URL（如 loop://）
+            parser: line_ingest.LineParser
+            sink: 回调 sink(readings)，把一批读数送入入库路径，返回接受的条数
+            batch_size: 攒够多少条提交一次
+            batch_interval: 第一条读数最多等待多久提交，秒
+            reconnect_delay: 打开失败或断开后首次重试的间隔，之后每次翻倍，不超过 max_reconnect_delay
+        """
+        self.port = port
+        self.parser = parser
+        self.sink = sink
+        self.baudrate = baudrate
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._serial = None
+
+        self.connected = False
+        self.reconnects = 0
+        self.lines = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def _open(self):
+        return serial.serial_for_url(self.port, baudrate=self.baudrate, timeout=min(self.batch_interval, 0.2))
+
+    def _submit(self, readings):
+        """提交一批读数；写后缓冲已满时 sink 接受的条数会少于提交的条数
+
+        sink 出错（如同步写库时数据库被锁）时整批计为丢弃，不让读取线程退出。
+        """
+        try:
+            accepted = self.sink(readings)
+        except Exception as e:
+            print(f"串口读数入库失败: {self.port}（{len(readings)} 条）: {e}")
+            accepted = 0
+            with self._lock:
+                self.last_error = f'Sink failed: {e}'
+        with self._lock:
+            self.accepted += accepted
+            self.dropped += len(readings) - accepted
+
+    def _record_lines(self, data):
+        """解析若干完整的行，返回读数列表"""
+        readings, rejected, error = self.parser.parse_many(data)
+        with self._lock:
+            self.lines += len(readings) + rejected
+            self.rejected += rejected
+            if error:
+                self.last_error = error
+        return readings
+
+    def _read_loop(self, ser):
+        """已打开串口上的读取循环，串口出错时抛出异常由外层重连"""
+        pending = b''
+        batch = []
+        batch_started = 0.0
+        try:
+            while not self._stop_event.is_set():
+                data = ser.read(ser.in_waiting or 1)
+                if data:
+                    data = pending + data
+                    end = data.rfind(b'\n')
+                    if end < 0:
+                        pending = data
+                    else:
+                        pending = data[end + 1:]
+                        readings = self._record_lines(data[:end])
+                        if readings:
+                            if not batch:
+                                batch_started = time.monotonic()
+                            batch.extend(readings)
+                    if len(pending) > MAX_LINE:
+                        with self._lock:
+                            self.rejected += 1
+                            self.last_error = f'Line longer than {MAX_LINE} bytes discarded (wrong baud rate?)'
+                        pending = b''
+
+                if batch and (len(batch) >= self.batch_size or time.monotonic() - batch_started >= self.batch_interval):
+                    self._submit(batch)
+                    batch = []
+        finally:
+            # 断开时也提交已解析的读数
+            if batch:
+                self._submit(batch)
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop_event.is_set():
+            try:
+                ser = self._open()
+            except (serial.SerialException, OSError) as e:
+                with self._lock:
+                    self.last_error = f'Open failed: {e}'
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            self._serial = ser
+            self.connected = True
+            delay = self.reconnect_delay
+            print(f"串口已连接: {self.port} ({self.baudrate} baud)")
+            try:
+                self._read_loop(ser)
+            except (serial.SerialException, OSError, TypeError) as e:
+                # 拔线时 pyserial 可能抛出 SerialException，也可能在已关闭的句柄上抛出 TypeError
+                with self._lock:
+                    self.last_error = f'Disconnected: {e}'
+                    self.reconnects += 1
+                if not self._stop_event.is_set():
+                    print(f"串口断开: {self.port}，{delay:.0f} 秒后重连")
+            finally:
+                self.connected = False
+                self._serial = None
+                ser.close()
+            self._stop_event.wait(delay)
+
+    def start(self):
+        """启动后台读取线程（串口暂时不存在时线程会持续重试）"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f'serial-ingest-{self.port}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止读取，提交已攒下的读数"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+    def stats(self):
+        """行数、入库、拒绝、丢弃计数"""
+        with self._lock:
+            return {
+                'port': self.port,
+                'connected': self.connected,
+                'reconnects': self.reconnects,
+                'lines': self.lines,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'dropped': self.dropped,
+                'last_error': self.last_error
+            }
+
+
+class SerialIngestDaemon:
+    """同时读取多个串口，每个串口一个线程"""
+
+    def __init__(self, ports, parser, sink, **reader_options):
+        """初始化
+
+        Args:
+            ports: 串口列表
+            parser, sink: 传给每个 SerialReader
+            reader_options: SerialReader 的其余参数（baudrate、batch_size 等）
+        """
+        self.readers = [SerialReader(port, parser, sink, **reader_options) for port in ports]
+
+    def start(self):
+        for reader in self.readers:
+            reader.start()
+        if self.readers:
+            print(f"串口上报已启动: {', '.join(reader.port for reader in self.readers)}")
+
+    def stop(self):
+        for reader in self.readers:
+            reader.stop()
+
+    def stats(self):
+        return [reader.stats() for reader in self.readers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='串口上报守护进程（写入厨房版数据库）')
+    parser.add_argument('ports', nargs='+', help='串口设备，如 /dev/ttyUSB0 或 COM3')
+    parser.add_argument('--baud', type=int, default=115200, help='波特率')
+    parser.add_argument('--stats-interval', type=float, default=60, help='打印计数的间隔，秒（0 不打印）')
+    args = parser.parse_args()
+
+    import kitchen_web_server as kitchen
+
+    kitchen.init_database()
+    kitchen.write_buffer.start()
+    daemon = SerialIngestDaemon(args.ports, kitchen.line_server.parser, kitchen.ingest_readings, baudrate=args.baud)
+    daemon.start()
+    print(f"数据库: {kitchen.DB_PATH}")
+    print("按 Ctrl+C 停止")
+    try:
+        while True:
+            time.sleep(args.stats_interval or 3600)
+            if args.stats_interval:
+                for stats in daemon.stats():
+                    print(stats)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        kitchen.write_buffer.stop()
+
+
+if __name__ == '__main__':
+    main()
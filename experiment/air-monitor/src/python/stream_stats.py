@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滑动窗口增量统计
+功能：数据进入窗口时 push、离开窗口时 pop，均值/方差（Welford）、最小/最大值（单调队列）
+都是均摊 O(1) 更新、O(1) 查询，不再每次请求都遍历整个历史列表
+"""
+
+import sys
+from collections import deque
+
+
+def to_float(value):
+    """把上报值转换为浮点数，无法转换时按 0 处理（push/pop 必须使用同一规则）"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class _FieldStats:
+    """单个指标的窗口统计"""
+
+    __slots__ = ('mean', 'm2', 'total', 'min_q', 'max_q')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.min_q = deque()  # (序号, 值)，值单调递增
+        self.max_q = deque()  # (序号, 值)，值单调递减
+
+
+class SlidingStats:
+    """先进先出滑动窗口上的多指标统计"""
+
+    def __init__(self, fields):
+        """初始化
+
+        Args:
+            fields: 需要统计的字段名列表
+        """
+        self.fields = list(fields)
+        self._stats = {f: _FieldStats() for f in self.fields}
+        self._head = 0  # 窗口中最旧一条的序号
+        self._tail = 0  # 下一条的序号
+
+    @property
+    def count(self):
+        """窗口内记录条数"""
+        return self._tail - self._head
+
+    def push(self, record):
+        """新记录进入窗口"""
+        seq = self._tail
+        self._tail += 1
+        n = self._tail - self._head
+
+        for field in self.fields:
+            x = to_float(record.get(field))
+            st = self._stats[field]
+
+            st.total += x
+            delta = x - st.mean
+            st.mean += delta / n
+            st.m2 += delta * (x - st.mean)
+
+            while st.min_q and st.min_q[-1][1] >= x:
+                st.min_q.pop()
+            st.min_q.append((seq, x))
+
+            while st.max_q and st.max_q[-1][1] <= x:
+                st.max_q.pop()
+            st.max_q.append((seq, x))
+
+    def pop(self, record):
+        """最旧的记录离开窗口（record 必须是最早 push 且尚未 pop 的那条）"""
+        self.pop_values([to_float(record.get(field)) for field in self.fields])
+
+    def pop_values(self, values):
+        """同 pop，但直接传入各字段的浮点值（顺序与 fields 相同），如列式缓冲区中的一行"""
+        if self.count == 0:
+            return
+        seq = self._head
+        self._head += 1
+        n = self._tail - self._head
+
+        for field, x in zip(self.fields, values):
+            st = self._stats[field]
+
+            if n == 0:
+                st.mean = 0.0
+                st.m2 = 0.0
+                st.total = 0.0
+            else:
+                st.total -= x
+                delta = x - st.mean
+                st.mean -= delta / n
+                st.m2 -= delta * (x - st.mean)
+                if st.m2 < 0:
+                    st.m2 = 0.0
+
+            if st.min_q and st.min_q[0][0] == seq:
+                st.min_q.popleft()
+            if st.max_q and st.max_q[0][0] == seq:
+                st.max_q.popleft()
+
+    def clear(self):
+        """清空窗口"""
+        self._stats = {f: _FieldStats() for f in self.fields}
+        self._head = self._tail = 0
+
+    def mean(self, field):
+        """窗口均值（直接由运行总和计算）"""
+        n = self.count
+        return self._stats[field].total / n if n else 0.0
+
+    def min(self, field):
+        """窗口最小值"""
+        q = self._stats[field].min_q
+        return q[0][1] if q else 0.0
+
+    def max(self, field):
+        """窗口最大值"""
+        q = self._stats[field].max_q
+        return q[0][1] if q else 0.0
+
+    def variance(self, field):
+        """窗口总体方差"""
+        n = self.count
+        return self._stats[field].m2 / n if n else 0.0
+
+    def std(self, field):
+        """窗口总体标准差"""
+        return self.variance(field) ** 0.5
+
+    def moments(self, field):
+        """返回 (条数, 总和, M2, 最小值, 最大值)，用于合并多个窗口"""
+        st = self._stats[field]
+        return self.count, st.total, st.m2, self.min(field), self.max(field)
+
+    def memory_bytes(self):
+        """单调队列占用的内存估算（字节）"""
+        total = 0
+        for st in self._stats.values():
+            for q in (st.min_q, st.max_q):
+                # deque 本身 + 每个元素的 (序号, 值) 元组与浮点数
+                total += sys.getsizeof(q) + len(q) * 80
+        return total
+
+    def summary(self, field):
+        """单个指标的完整统计"""
+        return {
+            'avg': self.mean(field),
+            'min': self.min(field),
+            'max': self.max(field),
+            'std': self.std(field)
+        }
+
+
+def combine_moments(moments):
+    """合并多个窗口的 (条数, 总和, M2, 最小值, 最大值)，返回 {'count', 'avg', 'min', 'max', 'std'}
+
+    方差按 Chan 并行算法合并：M2 = Σ(M2_i + n_i × (mean_i − mean)²)
+    """
+    moments = [m for m in moments if m[0]]
+    n = sum(m[0] for m in moments)
+    if not n:
+        return {'count': 0, 'avg': 0.0, 'min': 0.0, 'max': 0.0, 'std': 0.0}
+
+    mean = sum(m[1] for m in moments) / n
+    m2 = sum(m2_i + n_i * (total_i / n_i - mean) ** 2 for n_i, total_i, m2_i, _, _ in moments)
+    return {
+        'count': n,
+        'avg': mean,
+        'min': min(m[3] for m in moments),
+        'max': max(m[4] for m in moments),
+        'std': max(m2 / n, 0.0) ** 0.5
+    }
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写后缓冲（group commit）- 批量落库
+功能：请求线程只负责入队，后台线程按"条数或时间"触发批量写入，
+队列满时拒绝写入（由调用方返回429），进程退出前保证全部落库
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+
+# 可恢复的写入错误（数据库被锁、磁盘暂时不可用等）：保留整批稍后重试；
+# 其他错误（参数类型不支持、整数溢出等）说明批中有坏行，逐行写入找出并丢弃
+TRANSIENT_ERRORS = (sqlite3.OperationalError, OSError)
+
+
+class WriteBehindBuffer:
+    """有界写后缓冲队列 + 后台批量刷写线程"""
+
+    def __init__(self, flush_fn, max_batch=500, flush_interval=0.5, max_pending=10000,
+                 transient_errors=TRANSIENT_ERRORS):
+        """初始化缓冲区
+
+        Args:
+            flush_fn: 批量写入函数，接收一个行列表，在一个事务中写入
+            max_batch: 单次批量写入的最大条数（条数触发）
+            flush_interval: 最长等待时间，秒（时间触发）
+            max_pending: 容量上限（队列中与写入失败待重试的条数之和），超过后 submit 返回 False
+            transient_errors: 视为可恢复、整批保留重试的异常类型
+        """
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.transient_errors = transient_errors
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._failed = []
+
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.rejected_rows = 0
+        self.dropped_rows = 0
+
+    @property
+    def pending(self):
+        """尚未落库的条数"""
+        return self._queue.qsize() + len(self._failed)
+
+    def start(self):
+        """启动后台刷写线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, row):
+        """提交一行数据，队列已满时返回 False（背压信号）
+
+        写入失败待重试的行也计入容量：数据库不可用期间缓冲区不会无限增长，而是及时拒绝新数据。
+        """
+        if self._thread is None:
+            self.start()
+        if self.pending >= self.max_pending:
+            self.rejected_rows += 1
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.rejected_rows += 1
+            return False
+
+        if self._queue.qsize() >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    def _drain(self):
+        """从队列中取出至多 max_batch 条"""
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """写入一批数据：可恢复的错误保留整批以便下次重试，其他错误退回逐行写入"""
+        if self._failed:
+            batch = self._failed + batch
+            self._failed = []
+        if not batch:
+            return
+        try:
+            self.flush_fn(batch)
+            self.flushed_rows += len(batch)
+            self.flushed_batches += 1
+        except self.transient_errors as e:
+            print(f"批量写入失败，稍后重试（{len(batch)} 条）: {e}")
+            self._failed = batch
+        except Exception as e:
+            print(f"批量写入失败，逐行写入以找出坏行（{len(batch)} 条）: {e}")
+            self._write_rows(batch)
+
+    def _write_rows(self, batch):
+        """逐行写入：丢弃并记录写不进去的行，遇到可恢复的错误时保留剩余的行稍后重试"""
+        for i, row in enumerate(batch):
+            try:
+                self.flush_fn([row])
+            except self.transient_errors as e:
+                print(f"逐行写入失败，稍后重试（{len(batch) - i} 条）: {e}")
+                self._failed = batch[i:]
+                return
+            except Exception as e:
+                self.dropped_rows += 1
+                print(f"丢弃无法写入的行: {e}: {str(row)[:200]}")
+                continue
+            self.flushed_rows += 1
+        self.flushed_batches += 1
+
+    def _run(self):
+        """后台线程主循环：攒够一批被唤醒，或每隔 flush_interval 定时写入"""
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """同步写入当前队列中的全部数据"""
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch and not self._failed:
+                    break
+                self._write(batch)
+                if self._failed:
+                    break
+
+    def stop(self, timeout=5.0):
+        """停止后台线程并把剩余数据全部落库"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()